@@ -3,23 +3,95 @@
 from flask import Blueprint, request, jsonify
 import pandas as pd
 import io
+import os
 import numpy as np
 import logging
+import functools
+import threading
 
 # Use absolute import based on the project structure
-from backend.core.backtesting import run_backtest
+from backend.core.backtesting import run_backtest, run_panel_backtest, OUTPUT_MODES
+from backend.core.strategy_batch import run_strategy_batch
+from backend.core.strategy_spec import spec_to_code
+from backend.core.intraday import run_intraday_files, DEFAULT_CHUNK_ROWS, INTRADAY_DATA_DIR
+from backend.core.result_cache import get_backtest_cache
+from backend.core.data_store import load_ohlcv
+from backend.core.feature_store import load_features
+from backend.core.run_history import record_run, summarize_trades, get_run
+from backend.core.monte_carlo import monte_carlo_trades
+from backend.api.strategy_manager import list_strategy_names, load_strategy_code
 
 backtest_bp = Blueprint("backtest", __name__)
 
+# Single-ticker backtests run in the request threads; beyond this many at once they queue
+BACKTEST_MAX_CONCURRENCY = int(os.getenv("BACKTEST_MAX_CONCURRENCY", "0")) or os.cpu_count() or 4
+# Seconds a request waits for a free slot before it is turned away with 503 + Retry-After
+BACKTEST_QUEUE_TIMEOUT = float(os.getenv("BACKTEST_QUEUE_TIMEOUT", "10"))
+
+_backtest_slots = threading.BoundedSemaphore(BACKTEST_MAX_CONCURRENCY)
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def limit_concurrency(view):
+    """Runs `view` only while one of the BACKTEST_MAX_CONCURRENCY backtest slots is free."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        global _in_flight
+        if not _backtest_slots.acquire(timeout=BACKTEST_QUEUE_TIMEOUT):
+            response = jsonify({"error": "Backtest capacity is exhausted, retry shortly"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+        with _in_flight_lock:
+            _in_flight += 1
+        try:
+            return view(*args, **kwargs)
+        finally:
+            with _in_flight_lock:
+                _in_flight -= 1
+            _backtest_slots.release()
+    return wrapper
+
+
+@backtest_bp.route("/capacity", methods=["GET"])
+def get_capacity():
+    """Advertises how many single-ticker backtests the server runs concurrently.
+    Clients fanning out over many tickers size their worker pools from this.
+    Returns:
+        JSON: {"max_concurrent_backtests", "in_flight", "available", "cpu_count", "queue_timeout_s"}
+    """
+    with _in_flight_lock:
+        in_flight = _in_flight
+    return jsonify({
+        "max_concurrent_backtests": BACKTEST_MAX_CONCURRENCY,
+        "in_flight": in_flight,
+        "available": max(BACKTEST_MAX_CONCURRENCY - in_flight, 0),
+        "cpu_count": os.cpu_count(),
+        "queue_timeout_s": BACKTEST_QUEUE_TIMEOUT,
+    }), 200
+
+
 @backtest_bp.route("/backtest", methods=["POST"])
+@limit_concurrency
 def execute_backtest():
     """Executes a backtest based on provided data and strategy code.
     Request Body (JSON):
         data (dict): Stock data in JSON format (e.g., from df.to_dict(orient=\"index\")).
         strategy_code (str, optional): Python code string for the strategy.
+        strategy_spec (dict, optional): Declarative rule spec (core/strategy_spec.py), used
+                                        instead of strategy_code.
         initial_capital (float, optional): Starting capital, defaults to 10000.0.
+        strategy_params (dict, optional): Keyword arguments for generate_signals.
+        ticker (str, optional): Ticker of the data; lets cached results be dropped when
+                                that ticker's data is updated.
+        use_cache (bool, optional): Reuse cached signals/results, defaults to true.
+        strategy_name (str, optional): Saved strategy name, recorded in the run history.
+        save_history (bool, optional): Persist the run to the run history, defaults to true.
+        result_handle (bool, optional): Return only metrics, trade counts and run_id; trades are
+                                        then paged through GET /runs/<run_id>/trades.
+                                        Implies save_history. Defaults to false.
     Returns:
-        JSON: Backtest results (trades, metrics) or error message.
+        JSON: Backtest results (trades, metrics, run_id, indicator_source) or error message.
     """
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
@@ -27,13 +99,22 @@ def execute_backtest():
     req_data = request.get_json()
     stock_data_dict = req_data.get("data")
     
-    strategy_code = req_data.get("strategy_code") # Can be None
+    strategy_code = req_data.get("strategy_code") or spec_to_code(req_data.get("strategy_spec")) # Can be None
     # print(f"받은 name 파라미터: {strategy_code}", flush=True)
     
     initial_capital = float(req_data.get("initial_capital", 1000000.0))
     stop_loss_pct = float(req_data.get("stop_loss_pct", 5.0))
     trade_fee_pct = float(req_data.get("trade_fee_pct", 0.001))
     sell_tax_pct = float(req_data.get("sell_tax_pct", 0.2))
+    strategy_params = req_data.get("strategy_params") or None
+    ticker = req_data.get("ticker")
+    cache = get_backtest_cache() if req_data.get("use_cache", True) else None
+    strategy_name = req_data.get("strategy_name")
+    result_handle = bool(req_data.get("result_handle", False))
+    save_history = req_data.get("save_history", True) or result_handle
+
+    if strategy_params is not None and not isinstance(strategy_params, dict):
+        return jsonify({"error": "strategy_params must be an object"}), 400
 
     # print("trade_fee_pct:", trade_fee_pct, flush=True)
     # print("sell_tax_pct:", sell_tax_pct, flush=True)
@@ -43,16 +124,7 @@ def execute_backtest():
         return jsonify({"error": "Missing stock data in request body"}), 400
 
     try:
-        # Convert the dictionary back to DataFrame
-        # Assuming the format is {date_str: {col: value, ...}}
-        data_df = pd.DataFrame.from_dict(stock_data_dict, orient="index")
-        data_df.index = pd.to_datetime(data_df.index)
-        # Ensure columns are numeric where expected (e.g., Close)
-        for col in ["Open", "High", "Low", "Close", "Volume"]:
-             if col in data_df.columns:
-                 data_df[col] = pd.to_numeric(data_df[col])
-        data_df.sort_index(inplace=True) # Ensure data is sorted by date
-
+        data_df = parse_stock_data(stock_data_dict)
     except Exception as e:
         return jsonify({"error": f"Failed to parse stock data: {e}"}), 400
 
@@ -60,6 +132,8 @@ def execute_backtest():
         return jsonify({"error": "Provided stock data is empty"}), 400
 
     try:
+        # Precomputed at ingest when the store covers the data (the source is reported, see load_features)
+        indicators, indicator_source = load_features(ticker, data_df, return_source=True)
         # Run the backtest using the core logic
         results = run_backtest(
             data_df,
@@ -67,12 +141,50 @@ def execute_backtest():
             initial_capital,
             stop_loss_pct,
             trade_fee_pct,
-            sell_tax_pct
+            sell_tax_pct,
+            indicators=indicators,
+            strategy_params=strategy_params,
+            cache=cache,
+            ticker=ticker,
+            return_equity=save_history
         )
         
         results = convert_numpy_types(results)
         if "error" in results:
              return jsonify(results), 400 # Propagate error from backtest engine
+        results["indicator_source"] = indicator_source
+
+        if save_history and "error" not in results.get("metrics", {}):
+            try:
+                results["run_id"] = record_run(
+                    results,
+                    ticker=ticker,
+                    strategy_name=strategy_name,
+                    strategy_code=strategy_code,
+                    engine_params={
+                        "initial_capital": initial_capital,
+                        "stop_loss_pct": stop_loss_pct,
+                        "trade_fee_pct": trade_fee_pct,
+                        "sell_tax_pct": sell_tax_pct,
+                    },
+                    strategy_params=strategy_params,
+                    start_date=data_df.index[0],
+                    end_date=data_df.index[-1],
+                    indicator_source=indicator_source
+                )
+            except Exception as e:
+                print(f"Error saving run history: {e}") # Log the error, the result is still returned
+                if result_handle:
+                    return jsonify({"error": f"Failed to store result for the result handle: {e}"}), 500
+            results.pop("equity_curve", None)
+
+        if result_handle:
+            return jsonify({
+                "run_id": results.get("run_id"),
+                "metrics": results.get("metrics", {}),
+                "trade_summary": summarize_trades(results.get("trades", [])),
+                "indicator_source": indicator_source,
+            }), 200
 
         return jsonify(results), 200
 
@@ -80,6 +192,262 @@ def execute_backtest():
         print(f"Error during backtest execution: {e}") # Log the error
         return jsonify({"error": f"An unexpected error occurred during backtesting: {str(e)}"}), 500
 
+@backtest_bp.route("/backtest/panel", methods=["POST"])
+def execute_panel_backtest():
+    """Executes one strategy across several tickers in panel mode.
+    Request Body (JSON):
+        data (dict): {ticker: stock data in the same format as /backtest}.
+        strategy_code (str, optional): Python code string for the strategy. Strategies that
+                                       define `generate_panel_signals(data)` are evaluated once
+                                       for all tickers; others run once per ticker.
+        strategy_spec (dict, optional): Declarative rule spec (core/strategy_spec.py), used
+                                        instead of strategy_code. Always runs in panel mode.
+        initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct: As in /backtest.
+    Returns:
+        JSON: {"results": {ticker: backtest result or error}} or error message.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    req_data = request.get_json()
+    panel_data_dict = req_data.get("data")
+    strategy_code = req_data.get("strategy_code") or spec_to_code(req_data.get("strategy_spec"))
+
+    initial_capital = float(req_data.get("initial_capital", 1000000.0))
+    stop_loss_pct = float(req_data.get("stop_loss_pct", 5.0))
+    trade_fee_pct = float(req_data.get("trade_fee_pct", 0.001))
+    sell_tax_pct = float(req_data.get("sell_tax_pct", 0.2))
+
+    if not panel_data_dict or not isinstance(panel_data_dict, dict):
+        return jsonify({"error": "Missing stock data in request body"}), 400
+
+    try:
+        data_by_ticker = {
+            ticker: parse_stock_data(stock_data_dict)
+            for ticker, stock_data_dict in panel_data_dict.items()
+        }
+    except Exception as e:
+        return jsonify({"error": f"Failed to parse stock data: {e}"}), 400
+
+    try:
+        results = run_panel_backtest(
+            data_by_ticker,
+            strategy_code,
+            initial_capital,
+            stop_loss_pct,
+            trade_fee_pct,
+            sell_tax_pct
+        )
+
+        results = convert_numpy_types(results)
+        if "error" in results:
+             return jsonify(results), 400
+
+        return jsonify({"results": results}), 200
+
+    except Exception as e:
+        print(f"Error during panel backtest execution: {e}") # Log the error
+        return jsonify({"error": f"An unexpected error occurred during backtesting: {str(e)}"}), 500
+
+@backtest_bp.route("/backtest/batch", methods=["POST"])
+def execute_strategy_batch():
+    """Runs several saved strategies against one ticker in a single call.
+    Request Body (JSON):
+        strategies (list or str): Saved strategy names, or "all" for every saved strategy.
+        ticker (str, optional): Ticker code whose bars are read from the local data store.
+        start_date (str, optional): Start date in "YYYY-MM-DD" format (with ticker).
+        end_date (str, optional): End date in "YYYY-MM-DD" format (with ticker).
+        data (dict, optional): Stock data in the same format as /backtest (instead of ticker).
+        max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+        initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct: As in /backtest.
+        output (str, optional): "full" (default, with trade lists) or "metrics" (metrics only, faster).
+    Returns:
+        JSON: {"comparison": [metrics per strategy], "results": {name: {metrics[, trades]}},
+               "indicator_source": "feature_store" or "computed"} or error message.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    req_data = request.get_json()
+    requested = req_data.get("strategies", "all")
+    try:
+        engine_args = (
+            float(req_data.get("initial_capital", 1000000.0)),
+            float(req_data.get("stop_loss_pct", 5.0)),
+            float(req_data.get("trade_fee_pct", 0.001)),
+            float(req_data.get("sell_tax_pct", 0.2)),
+        )
+        max_workers = int(req_data["max_workers"]) if req_data.get("max_workers") else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid numeric parameter: {e}"}), 400
+    output = req_data.get("output", "full")
+    if output not in OUTPUT_MODES:
+        return jsonify({"error": f"output must be one of {OUTPUT_MODES}"}), 400
+
+    if requested == "all":
+        names = sorted(list_strategy_names())
+    elif isinstance(requested, list) and requested:
+        names = requested
+    else:
+        return jsonify({"error": "strategies must be a non-empty list of names or \"all\""}), 400
+
+    strategies = {}
+    for name in names:
+        code = load_strategy_code(name)
+        if code is None:
+            return jsonify({"error": f"Strategy not found: {name}"}), 404
+        strategies[name] = code
+    if not strategies:
+        return jsonify({"error": "No saved strategies to run."}), 404
+
+    try:
+        if req_data.get("data"):
+            data_df = parse_stock_data(req_data["data"])
+        elif req_data.get("ticker"):
+            data_df = load_ohlcv(req_data["ticker"], req_data.get("start_date"), req_data.get("end_date"))
+        else:
+            return jsonify({"error": "Missing ticker or stock data in request body"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Failed to load stock data: {e}"}), 400
+
+    if data_df.empty:
+        return jsonify({"error": "Provided stock data is empty"}), 400
+
+    try:
+        indicators, indicator_source = load_features(req_data.get("ticker"), data_df, return_source=True)
+        results = run_strategy_batch(data_df, strategies, engine_args, max_workers, output, indicators)
+        results["indicator_source"] = indicator_source
+        return jsonify(convert_numpy_types(results)), 200
+    except Exception as e:
+        print(f"Error during strategy batch execution: {e}") # Log the error
+        return jsonify({"error": f"An unexpected error occurred during backtesting: {str(e)}"}), 500
+
+@backtest_bp.route("/backtest/intraday", methods=["POST"])
+def execute_intraday_backtest():
+    """Backtests minute-bar files from the server's intraday data directory in fixed-memory chunks.
+    Request Body (JSON):
+        files (list): CSV/Parquet file names relative to INTRADAY_DATA_DIR. Each file needs a
+                      timestamp column (datetime/timestamp/time/date, or date + time) and
+                      open/high/low/close/volume.
+        strategy_code (str, optional): Python code string for the strategy, or
+        strategy_name (str, optional): Name of a saved strategy.
+        strategy_spec (dict, optional): Declarative rule spec (core/strategy_spec.py), used
+                                        instead of strategy_code.
+        ticker_column (str, optional): Column with the ticker when a file holds many names.
+        chunk_rows (int, optional): Rows read per chunk, defaults to 250000.
+        lookback (int, optional): Bars of history carried into each chunk (estimated from the code if omitted).
+        max_workers (int, optional): Size of the process pool (one file per task).
+        initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct: As in /backtest.
+    Returns:
+        JSON: {"results": {ticker: {metrics, bars, start, end, periods_per_year} or error}} or error message.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    req_data = request.get_json()
+    files = req_data.get("files")
+    if not files or not isinstance(files, list):
+        return jsonify({"error": "files must be a non-empty list of file names"}), 400
+
+    strategy_code = req_data.get("strategy_code") or spec_to_code(req_data.get("strategy_spec"))
+    if not strategy_code and req_data.get("strategy_name"):
+        strategy_code = load_strategy_code(req_data["strategy_name"])
+        if strategy_code is None:
+            return jsonify({"error": f"Strategy not found: {req_data['strategy_name']}"}), 404
+
+    try:
+        engine_args = (
+            float(req_data.get("initial_capital", 1000000.0)),
+            float(req_data.get("stop_loss_pct", 5.0)),
+            float(req_data.get("trade_fee_pct", 0.001)),
+            float(req_data.get("sell_tax_pct", 0.2)),
+        )
+        chunk_rows = int(req_data.get("chunk_rows", DEFAULT_CHUNK_ROWS))
+        lookback = int(req_data["lookback"]) if req_data.get("lookback") else None
+        max_workers = int(req_data["max_workers"]) if req_data.get("max_workers") else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid numeric parameter: {e}"}), 400
+
+    data_dir = os.path.realpath(INTRADAY_DATA_DIR)
+    paths = []
+    for name in files:
+        path = os.path.realpath(os.path.join(data_dir, str(name)))
+        if not path.startswith(data_dir + os.sep):
+            return jsonify({"error": f"Invalid file name: {name}"}), 400
+        if not os.path.isfile(path):
+            return jsonify({"error": f"File not found: {name}"}), 404
+        paths.append(path)
+
+    try:
+        results = run_intraday_files(paths, strategy_code, engine_args, req_data.get("ticker_column"),
+                                     chunk_rows, lookback, max_workers)
+        return jsonify({"results": convert_numpy_types(results)}), 200
+    except Exception as e:
+        print(f"Error during intraday backtest execution: {e}") # Log the error
+        return jsonify({"error": f"An unexpected error occurred during backtesting: {str(e)}"}), 500
+
+@backtest_bp.route("/backtest/monte_carlo", methods=["POST"])
+def execute_monte_carlo():
+    """Resamples a backtest's trade returns for confidence bands on its metrics.
+    Request Body (JSON):
+        run_id (int, optional): Stored run whose trades are resampled.
+        trades (list, optional): Trade list as returned by /backtest (instead of run_id).
+        initial_capital (float, optional): Starting equity; taken from the run when run_id is given.
+        simulations (int, optional): Number of resampled sequences, defaults to 10000.
+        method (str, optional): "bootstrap" (default, with replacement) or "permutation" (reordering).
+        ruin_threshold_pct (float, optional): Loss from the initial capital (%) counted as ruin, defaults to 50.
+        seed (int, optional): Seed for reproducible draws.
+    Returns:
+        JSON: Percentile bands for final equity, total return and max drawdown, probability of
+              ruin and equity bands along the trade sequence, or error message.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    req_data = request.get_json()
+    initial_capital = req_data.get("initial_capital")
+    if req_data.get("run_id") is not None:
+        try:
+            run = get_run(int(req_data["run_id"]), include_trades=True, include_equity=False)
+        except (TypeError, ValueError):
+            return jsonify({"error": "run_id must be an integer"}), 400
+        if run is None:
+            return jsonify({"error": f"Run {req_data['run_id']} not found"}), 404
+        trades = run["trades"]
+        initial_capital = initial_capital or run["initial_capital"]
+    else:
+        trades = req_data.get("trades")
+        if not isinstance(trades, list):
+            return jsonify({"error": "Missing run_id or trades in request body"}), 400
+
+    try:
+        results = monte_carlo_trades(
+            [trade["return_pct"] for trade in trades],
+            float(initial_capital or 1000000.0),
+            int(req_data.get("simulations", 10000)),
+            req_data.get("method", "bootstrap"),
+            float(req_data.get("ruin_threshold_pct", 50.0)),
+            int(req_data["seed"]) if req_data.get("seed") is not None else None,
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid Monte Carlo request: {e}"}), 400
+    except Exception as e:
+        print(f"Error during Monte Carlo simulation: {e}") # Log the error
+        return jsonify({"error": f"An unexpected error occurred during the simulation: {str(e)}"}), 500
+    return jsonify(results), 200
+
+
+def parse_stock_data(stock_data_dict):
+    """Converts {date_str: {col: value, ...}} back into a sorted OHLCV DataFrame."""
+    data_df = pd.DataFrame.from_dict(stock_data_dict, orient="index")
+    data_df.index = pd.to_datetime(data_df.index)
+    # Ensure columns are numeric where expected (e.g., Close)
+    for col in ["Open", "High", "Low", "Close", "Volume"]:
+         if col in data_df.columns:
+             data_df[col] = pd.to_numeric(data_df[col])
+    data_df.sort_index(inplace=True) # Ensure data is sorted by date
+    return data_df
+
 def convert_numpy_types(obj):
     if isinstance(obj, dict):
         return {k: convert_numpy_types(v) for k, v in obj.items()}
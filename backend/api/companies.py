@@ -0,0 +1,63 @@
+# /home/ubuntu/backtest_app/backend/api/companies.py
+
+from flask import Blueprint, request, jsonify
+
+# Use absolute import based on the project structure
+from backend.core.company_index import (
+    get_company_index, refresh_company_index, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT,
+)
+
+companies_bp = Blueprint("companies", __name__)
+
+
+@companies_bp.route("/companies/search", methods=["GET"])
+def search_companies():
+    """Searches listed companies by name, ticker code or Korean initial consonants.
+    Query Parameters:
+        q (str): Query, e.g. "삼성", "005930", "ㅅㅅㅈㅈ".
+        limit (int, optional): Maximum number of results, defaults to 20 (max 200).
+    Returns:
+        JSON: {"query", "results": [{"code", "company", "match"}]} or error message.
+    """
+    query = request.args.get("q", "")
+    try:
+        limit = min(int(request.args.get("limit", DEFAULT_SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        results = get_company_index().search(query, limit)
+    except Exception as e:
+        print(f"Error searching companies: {e}") # Log the error
+        return jsonify({"error": f"Failed to search companies: {e}"}), 500
+    return jsonify({"query": query, "results": results}), 200
+
+
+@companies_bp.route("/companies/<code>", methods=["GET"])
+def get_company(code):
+    """Looks up one company by its ticker code.
+    Returns:
+        JSON: {"code", "company"} or error message.
+    """
+    try:
+        company = get_company_index().get(code)
+    except Exception as e:
+        print(f"Error looking up company {code}: {e}") # Log the error
+        return jsonify({"error": f"Failed to look up company: {e}"}), 500
+    if company is None:
+        return jsonify({"error": f"Company not found: {code}"}), 404
+    return jsonify(company), 200
+
+
+@companies_bp.route("/companies/refresh", methods=["POST"])
+def refresh_companies():
+    """Rebuilds the company search index from company_info (called by DBUpdater.update_comp_info).
+    Returns:
+        JSON: {"message", "count"} or error message.
+    """
+    try:
+        count = refresh_company_index()
+    except Exception as e:
+        print(f"Error refreshing the company index: {e}") # Log the error
+        return jsonify({"error": f"Failed to refresh the company index: {e}"}), 500
+    return jsonify({"message": "Company index refreshed.", "count": count}), 200
@@ -1,13 +1,71 @@
 # /home/ubuntu/backtest_app/backend/api/llm_chat.py
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 import base64
+import itertools
+import json
 
 # Use absolute import based on the project structure
-from backend.core.llm_service import get_llm_response
+from backend.core.llm_service import get_llm_response, stream_llm_response
 
 llm_chat_bp = Blueprint("llm_chat", __name__)
 
+
+def _parse_chat_request():
+    """Validates the chat request shared by /llm_chat and /llm_chat/stream.
+
+    Accepts JSON (image as base64) or multipart/form-data with the raw image file, which avoids
+    the ~33% base64 overhead: fields `message`, `history` (JSON string) and file `image`.
+
+    Returns:
+        tuple: ((history, message, image_data), None) or (None, error response).
+    """
+    image_data = None
+    if request.is_json:
+        req_data = request.get_json()
+        chat_history = req_data.get("history", [])
+        user_message = req_data.get("message")
+        base64_image_string = req_data.get("image") # Optional base64 image string
+        if base64_image_string:
+            try:
+                # Decode the base64 string to bytes
+                image_data = base64.b64decode(base64_image_string)
+            except Exception as e:
+                return None, (jsonify({"error": f"Invalid base64 image data: {e}"}), 400)
+    elif request.mimetype == "multipart/form-data":
+        user_message = request.form.get("message")
+        try:
+            chat_history = json.loads(request.form.get("history") or "[]")
+        except ValueError:
+            return None, (jsonify({"error": "Invalid chat history format"}), 400)
+        image_file = request.files.get("image") # Optional raw image file
+        if image_file:
+            image_data = image_file.read()
+    else:
+        return None, (jsonify({"error": "Request must be JSON or multipart/form-data"}), 400)
+
+    if not user_message:
+        return None, (jsonify({"error": "Missing user message"}), 400)
+
+    # Validate history format (simple check)
+    if not isinstance(chat_history, list):
+        return None, (jsonify({"error": "Invalid chat history format"}), 400)
+
+    return (chat_history, user_message, image_data), None
+
+
+def _error_status(error: str) -> int:
+    """HTTP status for an LLM service error message."""
+    # Propagate specific errors if needed, otherwise return 500 for internal errors
+    if "API key" in error or "authentication failed" in error:
+        return 503 # Service Unavailable or similar
+    if "rate limit" in error:
+        return 429 # Too Many Requests
+    if "image data" in error:
+        return 400
+    return 500 # Internal Server Error for other LLM issues
+
+
 @llm_chat_bp.route("/llm_chat", methods=["POST"])
 def handle_chat():
     """Handles chat interactions with the LLM.
@@ -15,44 +73,21 @@ def handle_chat():
         history (list): List of previous chat messages.
         message (str): The latest user message.
         image (str, optional): Base64 encoded image string.
+    Request Body (multipart/form-data):
+        message, history (JSON string) and image (file, optional) - the raw image without base64.
     Returns:
-        JSON: LLM response or error message.
+        JSON: {"response", "usage", "latency_ms", "context"} or error message.
     """
-    if not request.is_json:
-        return jsonify({"error": "Request must be JSON"}), 400
-
-    req_data = request.get_json()
-    chat_history = req_data.get("history", [])
-    user_message = req_data.get("message")
-    base64_image_string = req_data.get("image") # Optional base64 image string
-
-    if not user_message:
-        return jsonify({"error": "Missing user message"}), 400
-    
-    # Validate history format (simple check)
-    if not isinstance(chat_history, list):
-        return jsonify({"error": "Invalid chat history format"}), 400
-
-    image_data = None
-    if base64_image_string:
-        try:
-            # Decode the base64 string to bytes
-            image_data = base64.b64decode(base64_image_string)
-        except Exception as e:
-            return jsonify({"error": f"Invalid base64 image data: {e}"}), 400
+    chat_request, error_response = _parse_chat_request()
+    if error_response:
+        return error_response
 
     try:
         # Call the LLM service function
-        result = get_llm_response(chat_history, user_message, image_data)
+        result = get_llm_response(*chat_request)
 
         if "error" in result:
-            # Propagate specific errors if needed, otherwise return 500 for internal errors
-            if "API key" in result["error"] or "authentication failed" in result["error"]:
-                 return jsonify(result), 503 # Service Unavailable or similar
-            elif "rate limit" in result["error"]:
-                 return jsonify(result), 429 # Too Many Requests
-            else:
-                 return jsonify(result), 500 # Internal Server Error for other LLM issues
+            return jsonify(result), _error_status(result["error"])
         
         return jsonify(result), 200
 
@@ -60,3 +95,35 @@ def handle_chat():
         print(f"Error processing LLM chat request: {e}") # Log the error
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+
+@llm_chat_bp.route("/llm_chat/stream", methods=["POST"])
+def handle_chat_stream():
+    """Streams the LLM response as server-sent events while it is generated.
+    Request Body (JSON or multipart/form-data):
+        Same as /llm_chat.
+    Returns:
+        Stream (text/event-stream): "delta" events ({"text"}) as tokens arrive, then a "done"
+                event ({"response", "usage", "ttft_ms", "elapsed_ms", "context"}) or an "error" event ({"error"}).
+        JSON: Error message with a status code if the request fails before the first token.
+    """
+    chat_request, error_response = _parse_chat_request()
+    if error_response:
+        return error_response
+
+    events = stream_llm_response(*chat_request)
+    # Wait for the first event so failures before any token (bad key, rate limit) keep their status code
+    try:
+        first_event = next(events)
+    except Exception as e:
+        print(f"Error processing LLM chat stream request: {e}") # Log the error
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+    if first_event["type"] == "error":
+        return jsonify({"error": first_event["error"]}), _error_status(first_event["error"])
+
+    def generate():
+        for event in itertools.chain([first_event], events):
+            payload = {key: value for key, value in event.items() if key != "type"}
+            yield f"event: {event['type']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,105 @@
+# /home/ubuntu/backtest_app/backend/api/optimizer.py
+
+from flask import Blueprint, request, jsonify
+
+# Use absolute import based on the project structure
+from backend.core.optimizer import optimize_strategy
+from backend.core.data_store import load_ohlcv
+from backend.core.strategy_spec import is_strategy_spec
+from backend.api.strategy_manager import load_strategy_code
+from backend.api.backtest_runner import parse_stock_data, convert_numpy_types
+
+optimizer_bp = Blueprint("optimizer", __name__)
+
+
+@optimizer_bp.route("/optimize", methods=["POST"])
+def optimize_parameters():
+    """Tunes a strategy's keyword parameters with successive halving and a TPE sampler.
+    Request Body (JSON):
+        strategy_code (str, optional): Python code string whose generate_signals takes the parameters.
+        strategy_name (str, optional): Name of a saved strategy (used if strategy_code is absent).
+        params (dict): Search space, e.g. {"n_range_period": [10, 60],
+                       "pullback_tolerance_factor": {"type": "float", "low": 0.001, "high": 0.03, "log": true},
+                       "mode": {"type": "choice", "values": ["a", "b"]}}.
+        ticker (str, optional): Ticker code whose bars are read from the local data store.
+        start_date (str, optional): Start date in "YYYY-MM-DD" format (with ticker).
+        end_date (str, optional): End date in "YYYY-MM-DD" format (with ticker).
+        data (dict, optional): Stock data in the same format as /backtest (instead of ticker).
+        objective (str, optional): Metric to optimize, defaults to "total_return"
+                                   ("max_drawdown_pct" is minimized).
+        budget (int, optional): Total backtests over all rungs, defaults to 60.
+        eta (int, optional): Halving rate, defaults to 3.
+        min_fraction (float, optional): Shortest sub-period as a fraction of the history, defaults to 0.1.
+        max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+        seed (int, optional): Seed for reproducible sampling.
+        initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct: As in /backtest.
+    Returns:
+        JSON: {"best", "pareto" (total_return vs max_drawdown_pct), "trials", "evaluations",
+               "rungs", "objective"} or error message.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    req_data = request.get_json()
+    strategy_code = req_data.get("strategy_code")
+    if not strategy_code and req_data.get("strategy_name"):
+        strategy_code = load_strategy_code(req_data["strategy_name"])
+        if strategy_code is None:
+            return jsonify({"error": f"Strategy not found: {req_data['strategy_name']}"}), 404
+    if not strategy_code:
+        return jsonify({"error": "Missing strategy_code or strategy_name in request body"}), 400
+    if is_strategy_spec(strategy_code):
+        return jsonify({"error": "Declarative strategy specs take no parameters; use Python strategy code."}), 400
+    if not req_data.get("params"):
+        return jsonify({"error": "Missing params (search space) in request body"}), 400
+
+    try:
+        engine_args = (
+            float(req_data.get("initial_capital", 1000000.0)),
+            float(req_data.get("stop_loss_pct", 5.0)),
+            float(req_data.get("trade_fee_pct", 0.001)),
+            float(req_data.get("sell_tax_pct", 0.2)),
+        )
+        budget = int(req_data.get("budget", 60))
+        eta = int(req_data.get("eta", 3))
+        min_fraction = float(req_data.get("min_fraction", 0.1))
+        max_workers = int(req_data["max_workers"]) if req_data.get("max_workers") else None
+        seed = int(req_data["seed"]) if req_data.get("seed") is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid numeric parameter: {e}"}), 400
+
+    try:
+        if req_data.get("data"):
+            data_df = parse_stock_data(req_data["data"])
+        elif req_data.get("ticker"):
+            data_df = load_ohlcv(req_data["ticker"], req_data.get("start_date"), req_data.get("end_date"))
+        else:
+            return jsonify({"error": "Missing ticker or stock data in request body"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Failed to load stock data: {e}"}), 400
+
+    if data_df.empty:
+        return jsonify({"error": "Provided stock data is empty"}), 400
+
+    try:
+        results = optimize_strategy(
+            data_df,
+            strategy_code,
+            req_data["params"],
+            engine_args,
+            objective=req_data.get("objective", "total_return"),
+            budget=budget,
+            eta=eta,
+            min_fraction=min_fraction,
+            max_workers=max_workers,
+            seed=seed,
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except Exception as e:
+        print(f"Error during parameter optimization: {e}") # Log the error
+        return jsonify({"error": f"An unexpected error occurred during optimization: {str(e)}"}), 500
+
+    if "error" in results:
+        return jsonify(results), 400
+    return jsonify(convert_numpy_types(results)), 200
@@ -0,0 +1,103 @@
+# /home/ubuntu/backtest_app/backend/api/run_history.py
+
+from flask import Blueprint, request, jsonify
+
+# Use absolute import based on the project structure
+from backend.core.run_history import query_runs, get_run, get_run_trades, delete_run
+
+run_history_bp = Blueprint("run_history", __name__)
+
+
+@run_history_bp.route("/runs", methods=["GET"])
+def list_runs():
+    """Lists stored backtest runs without re-simulating them.
+    Query Parameters:
+        strategy (str, optional): Filter by strategy name.
+        ticker (str, optional): Filter by ticker.
+        strategy_hash (str, optional): Filter by strategy code hash.
+        sort_by (str, optional): "created_at" (default) or a metric (e.g. "sharpe_ratio").
+        order (str, optional): "desc" (default) or "asc".
+        limit (int, optional): Maximum number of runs, defaults to 50.
+    Returns:
+        JSON: {"runs": [...]} (metrics only) or error message.
+    """
+    try:
+        runs = query_runs(
+            request.args.get("strategy"),
+            request.args.get("ticker"),
+            request.args.get("strategy_hash"),
+            request.args.get("sort_by", "created_at"),
+            request.args.get("order", "desc").lower() == "asc",
+            int(request.args.get("limit", 50)),
+        )
+        return jsonify({"runs": runs}), 200
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except Exception as e:
+        print(f"Error querying run history: {e}") # Log the error
+        return jsonify({"error": f"Failed to query run history: {e}"}), 500
+
+
+@run_history_bp.route("/runs/<int:run_id>", methods=["GET"])
+def get_run_detail(run_id):
+    """Returns one stored run.
+    Query Parameters:
+        include_trades (bool, optional): Include the trade list, defaults to true.
+        include_equity (bool, optional): Include the equity curve, defaults to true.
+    Returns:
+        JSON: Run metrics, trades and equity curve, or error message.
+    """
+    include_trades = request.args.get("include_trades", "true").lower() != "false"
+    include_equity = request.args.get("include_equity", "true").lower() != "false"
+    try:
+        run = get_run(run_id, include_trades, include_equity)
+    except Exception as e:
+        print(f"Error reading run {run_id}: {e}") # Log the error
+        return jsonify({"error": f"Failed to read run: {e}"}), 500
+    if run is None:
+        return jsonify({"error": f"Run {run_id} not found"}), 404
+    return jsonify(run), 200
+
+
+@run_history_bp.route("/runs/<int:run_id>/trades", methods=["GET"])
+def get_run_trade_page(run_id):
+    """Returns one page of a stored run's trades in columnar form.
+    Query Parameters:
+        page (int, optional): 1-based page number, defaults to 1.
+        page_size (int, optional): Trades per page, defaults to 100 (max 5000).
+        sort_by (str, optional): Trade column to sort by (e.g. "return_pct", "sell_date").
+        order (str, optional): "asc" (default) or "desc".
+        exit_type (str, optional): "signal", "stop_loss" or "final_close".
+        outcome (str, optional): "winners" or "losers".
+    Returns:
+        JSON: {"total", "page", "page_size", "pages", "columns", "data": {column: [...]}}
+              or error message.
+    """
+    try:
+        page = int(request.args.get("page", 1))
+        page_size = min(int(request.args.get("page_size", 100)), 5000)
+        trades = get_run_trades(
+            run_id,
+            page,
+            page_size,
+            request.args.get("sort_by"),
+            request.args.get("order", "asc").lower() != "desc",
+            request.args.get("exit_type"),
+            request.args.get("outcome"),
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except Exception as e:
+        print(f"Error reading trades of run {run_id}: {e}") # Log the error
+        return jsonify({"error": f"Failed to read trades: {e}"}), 500
+    if trades is None:
+        return jsonify({"error": f"Run {run_id} not found"}), 404
+    return jsonify({"run_id": run_id, **trades}), 200
+
+
+@run_history_bp.route("/runs/<int:run_id>", methods=["DELETE"])
+def delete_run_entry(run_id):
+    """Deletes one stored run."""
+    if not delete_run(run_id):
+        return jsonify({"error": f"Run {run_id} not found"}), 404
+    return jsonify({"message": f"Run {run_id} deleted."}), 200
@@ -0,0 +1,115 @@
+# /home/ubuntu/backtest_app/backend/api/signal_scan.py
+
+import threading
+import pandas as pd
+from flask import Blueprint, request, jsonify
+
+# Use absolute import based on the project structure
+from backend.core.signal_scanner import run_signal_scan, query_signals
+from backend.core.data_store import load_company_list, register_update_listener
+from backend.api.strategy_manager import list_strategy_names, load_strategy_code
+
+signal_scan_bp = Blueprint("signal_scan", __name__)
+
+# State of the most recent background scan (one scan runs at a time). "pending": new data
+# arrived while a scan was running, so the latest date is scanned again when it finishes.
+_scan_state = {"status": "idle", "last_result": None, "pending": False}
+_scan_lock = threading.Lock()
+
+
+def _run_scan_job(as_of=None):
+    try:
+        strategies = {name: load_strategy_code(name) for name in list_strategy_names()}
+        strategies = {name: code for name, code in strategies.items() if code}
+        tickers = load_company_list()["code"].tolist()
+        result = run_signal_scan(strategies, tickers, as_of)
+    except Exception as e:
+        print(f"Error during signal scan: {e}") # Log the error
+        result = {"error": str(e)}
+    _scan_state["last_result"] = result
+    _scan_state["status"] = "idle"
+    _scan_lock.release()
+    # Checked after the release, so an update arriving in between either sees the lock free or leaves the flag set
+    if _scan_state["pending"]:
+        start_signal_scan()
+
+
+def start_signal_scan(as_of=None) -> bool:
+    """Starts a background scan of all saved strategies. Returns False if one is already running."""
+    if not _scan_lock.acquire(blocking=False):
+        return False
+    _scan_state["status"] = "running"
+    _scan_state["pending"] = False # This scan reads the data that is in daily_price now
+    threading.Thread(target=_run_scan_job, args=(as_of,), daemon=True).start()
+    return True
+
+
+def _on_data_updated(tickers):
+    # The latest bar changed: re-scan the whole universe once the daily update finishes.
+    # If a scan is already running it may have read the old bars, so queue a rerun.
+    _scan_state["pending"] = True
+    start_signal_scan()
+
+
+register_update_listener(_on_data_updated)
+
+
+@signal_scan_bp.route("/signals/scan", methods=["POST"])
+def trigger_signal_scan():
+    """Starts a "signals firing today" scan in the background.
+    Request Body (JSON, optional):
+        date (str, optional): Bar date to evaluate ("YYYY-MM-DD"), defaults to the latest date in daily_price.
+    Returns:
+        JSON: Acceptance message (202), an error for an invalid date (400) or if a scan is already running (409).
+    """
+    req_data = request.get_json(silent=True) or {}
+    as_of = req_data.get("date")
+    if as_of is not None:
+        try:
+            # Parsed here so a bad date is a 400 instead of an error inside the background scan
+            as_of = pd.Timestamp(str(as_of))
+        except ValueError:
+            as_of = pd.NaT
+        if pd.isna(as_of):
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+        as_of = as_of.normalize()
+    if not start_signal_scan(as_of):
+        return jsonify({"error": "A signal scan is already running."}), 409
+    return jsonify({"message": "Signal scan started."}), 202
+
+
+@signal_scan_bp.route("/signals/scan", methods=["GET"])
+def get_signal_scan_status():
+    """Returns whether a scan is running and the summary of the last finished scan."""
+    return jsonify(_scan_state), 200
+
+
+@signal_scan_bp.route("/signals", methods=["GET"])
+def get_signals():
+    """Queries stored scan results.
+    Query Parameters:
+        date (str, optional): Scan date ("YYYY-MM-DD"), defaults to the latest scanned date.
+        strategy (str, optional): Filter by strategy name.
+        signal (str, optional): "buy" or "sell".
+        code (str, optional): Filter by ticker code.
+        limit (int, optional): Maximum number of rows, defaults to 1000.
+    Returns:
+        JSON: {"signals": [...]} or error message.
+    """
+    signal = request.args.get("signal")
+    if signal and signal not in ("buy", "sell"):
+        return jsonify({"error": "signal must be 'buy' or 'sell'"}), 400
+    try:
+        rows = query_signals(
+            request.args.get("date"),
+            request.args.get("strategy"),
+            signal,
+            request.args.get("code"),
+            int(request.args.get("limit", 1000)),
+        )
+        return jsonify({"signals": rows}), 200
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except Exception as e:
+        print(f"Error querying signals: {e}") # Log the error
+        return jsonify({"error": f"Failed to query signals: {e}"}), 500
@@ -3,6 +3,10 @@ import pandas as pd
 from pykrx import stock # Replaces yfinance for this function
 import FinanceDataReader as fdr
 
+from backend.core.data_store import notify_data_updated
+from backend.core.feature_store import load_features
+from backend.core.indicators import parse_indicator_specs
+
 stock_data_bp = Blueprint("stock_data", __name__)
 
 @stock_data_bp.route("/stock_data", methods=["GET"])
@@ -12,8 +16,10 @@ def get_stock_data():
         ticker (str): The stock ticker symbol for a Korean stock (e.g., "005930").
         start_date (str): Start date in "YYYY-MM-DD" format.
         end_date (str): End date in "YYYY-MM-DD" format.
+        features (str, optional): Indicator columns to include, e.g. "SMA:20,SMA:60,SMA:120".
+                                  Read from the feature store when it covers the range.
     Returns:
-        JSON: OHLCV data as JSON string or error message.
+        JSON: OHLCV data (plus requested indicator columns) as JSON string or error message.
     """
     ticker = request.args.get("ticker")
     start_date_str = request.args.get("start_date")
@@ -22,6 +28,11 @@ def get_stock_data():
     if not all([ticker, start_date_str, end_date_str]):
         return jsonify({"error": "Missing required parameters: ticker, start_date, end_date"}), 400
 
+    try:
+        feature_specs = parse_indicator_specs(request.args.get("features", ""))
+    except ValueError:
+        return jsonify({"error": "Invalid features. Use e.g. SMA:20,EMA:12,RSI:14,DC:20."}), 400
+
     try:
         # Validate and parse dates
         start_date_dt = pd.to_datetime(start_date_str)
@@ -65,6 +76,11 @@ def get_stock_data():
             
         data_df = data_df[columns_to_include]
 
+        if feature_specs and "Close" in data_df.columns:
+            features = load_features(ticker, data_df, feature_specs)
+            # NaN (indicator warm-up) is sent as null
+            data_df = data_df.join(features.astype(object).where(features.notna(), None))
+
         # Convert Timestamp index to string "YYYY-MM-DD" for JSON serialization
         data_df.index = data_df.index.strftime("%Y-%m-%d")
 
@@ -84,3 +100,18 @@ def get_stock_data():
         print(f"Error fetching data for {ticker} using pykrx: {e}") # Log the error
         return jsonify({"error": f"An unexpected error occurred while fetching data using pykrx: {str(e)}"}), 500
 
+@stock_data_bp.route("/data/updated", methods=["POST"])
+def data_updated():
+    """Notifies the backend that DBUpdater has written new bars to the local data store.
+    Request Body (JSON, optional):
+        tickers (list, optional): Codes that received new bars. Omit for "everything".
+    Returns:
+        JSON: Acknowledgement, including errors from any update hook that failed.
+    """
+    req_data = request.get_json(silent=True) or {}
+    tickers = req_data.get("tickers")
+    if tickers is not None and not isinstance(tickers, list):
+        return jsonify({"error": "tickers must be a list of ticker codes"}), 400
+
+    errors = notify_data_updated(tickers)
+    return jsonify({"message": "Update hooks executed.", "errors": errors}), 200
@@ -5,6 +5,8 @@ import re
 from flask import Blueprint, request, jsonify
 import  unicodedata
 
+from backend.core.strategy_spec import is_strategy_spec
+
 # Assuming backtesting_service exists, adjust import if needed
 # from backend.services.backtesting_service import run_backtest
 
@@ -19,6 +21,8 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 STRATEGY_DIR = os.path.join(CURRENT_DIR, '..', 'strategies') # Go up one level and into 'strategies'
 # Ensure the directory exists
 os.makedirs(STRATEGY_DIR, exist_ok=True)
+# Python strategies and declarative specs (core/strategy_spec.py)
+STRATEGY_EXTENSIONS = (".py", ".json", ".yaml", ".yml")
 
 def is_safe_filename(filename):
     """Check if the filename is safe (alphanumeric, underscores, hyphens)."""
@@ -29,6 +33,35 @@ def is_safe_filename(filename):
     filename = unicodedata.normalize("NFC", filename)  # Normalize to avoid 조합형 깨짐
     return re.match(r"^[\uAC00-\uD7A3a-zA-Z0-9_-]+$", filename) is not None
 
+def list_strategy_names():
+    """Returns the names of all saved strategy files (without the .py extension)."""
+    PLACEHOLDER = "직접 코드 입력/생성"
+
+    return [
+        os.path.splitext(f)[0] for f in os.listdir(STRATEGY_DIR)
+        if f.endswith(STRATEGY_EXTENSIONS)
+        and os.path.isfile(os.path.join(STRATEGY_DIR, f))
+        and os.path.splitext(f)[0] != PLACEHOLDER        # ⬅️ 필터
+    ]
+
+def strategy_file_path(name):
+    """Path of a saved strategy (Python code or declarative spec), or None if there is none."""
+    for ext in STRATEGY_EXTENSIONS:
+        file_path = os.path.join(STRATEGY_DIR, f"{name}{ext}")
+        if os.path.isfile(file_path):
+            return file_path
+    return None
+
+def load_strategy_code(name):
+    """Reads a saved strategy's code by name. Returns None if the name is invalid or missing."""
+    if not is_safe_filename(name):
+        return None
+    file_path = strategy_file_path(name)
+    if file_path is None:
+        return None
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
 @strategy_bp.route("/strategies", methods=["GET"])
 def list_or_load_strategies():
     """Lists saved strategies or loads a specific strategy code.
@@ -47,10 +80,10 @@ def list_or_load_strategies():
             # print(f"Invalid strategy name format: {strategy_name}", flush=True)
             return jsonify({"error": "Invalid strategy name format."}), 400
         
-        file_path = os.path.join(STRATEGY_DIR, f"{strategy_name}.py")
+        file_path = strategy_file_path(strategy_name)
         # print(f"2. file_path 파라미터: {file_path}", flush=True)
 
-        if os.path.isfile(file_path):
+        if file_path is not None:
             try:
                 with open(file_path, "r", encoding="utf-8") as f:
                     strategy_code = f.read()
@@ -61,20 +94,13 @@ def list_or_load_strategies():
                 # print(f"Error reading strategy file {file_path}: {e}")
                 return jsonify({"error": f"Failed to read strategy file: {e}"}), 500
         else:
-            print(f"else Strategy file {file_path} not found.")
+            print(f"else Strategy file {strategy_name} not found.")
             return jsonify({"error": "Strategy not found."}), 404
     else:
         # List all strategies
         # print(f"Listing all strategies in {strategy_name}", flush=True)
         try:
-            PLACEHOLDER = "직접 코드 입력/생성"
-
-            strategy_files = [
-                f[:-3] for f in os.listdir(STRATEGY_DIR)
-                if f.endswith(".py")
-                and os.path.isfile(os.path.join(STRATEGY_DIR, f))
-                and f[:-3] != PLACEHOLDER        # ⬅️ 필터
-            ]
+            strategy_files = list_strategy_names()
             # strategy_files = [f[:-3] for f in os.listdir(STRATEGY_DIR) if f.endswith(".py") and os.path.isfile(os.path.join(STRATEGY_DIR, f))]
             return jsonify({"strategies": strategy_files}), 200
         except Exception as e:
@@ -86,7 +112,7 @@ def save_strategy():
     """Saves a new strategy or overwrites an existing one.
     Request Body (JSON):
         name (str): The name for the strategy.
-        code (str): The Python code for the strategy.
+        code (str): The Python code for the strategy, or a declarative JSON/YAML spec.
     Returns:
         JSON: Success message or error message.
     """
@@ -103,11 +129,20 @@ def save_strategy():
     if not is_safe_filename(strategy_name):
         return jsonify({"error": "Invalid strategy name format. Use only letters, numbers, underscores, hyphens."}), 400
 
-    file_path = os.path.join(STRATEGY_DIR, f"{strategy_name}.py")
+    # 선언형 전략 스펙은 .json/.yaml로, 그 외는 파이썬 코드(.py)로 저장
+    if is_strategy_spec(strategy_code):
+        ext = ".json" if strategy_code.lstrip().startswith("{") else ".yaml"
+    else:
+        ext = ".py"
+    file_path = os.path.join(STRATEGY_DIR, f"{strategy_name}{ext}")
 
     try:
+        # A name can only be saved in one form; drop the previous file if its type changed
+        previous_path = strategy_file_path(strategy_name)
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(strategy_code)
+        if previous_path is not None and previous_path != file_path:
+            os.remove(previous_path)
         return jsonify({"message": f"Strategy 	\"{strategy_name}\" saved successfully."}), 201 # 201 Created (or 200 OK if overwriting)
     except Exception as e:
         print(f"Error writing strategy file {file_path}: {e}")
@@ -124,9 +159,9 @@ def delete_strategy(name):
     if not is_safe_filename(name):
         return jsonify({"error": "Invalid strategy name format."}), 400
 
-    file_path = os.path.join(STRATEGY_DIR, f"{name}.py")
+    file_path = strategy_file_path(name)
 
-    if os.path.isfile(file_path):
+    if file_path is not None:
         try:
             os.remove(file_path)
             return jsonify({"message": f"Strategy 	\"{name}\" deleted successfully."}), 200
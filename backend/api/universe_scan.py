@@ -0,0 +1,121 @@
+# /home/ubuntu/backtest_app/backend/api/universe_scan.py
+
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+# Use absolute import based on the project structure
+from backend.core.universe_scan import create_scan, get_scan, iter_scan_results
+from backend.core.strategy_spec import spec_to_code
+from backend.api.strategy_manager import load_strategy_code
+from backend.api.backtest_runner import convert_numpy_types
+
+universe_scan_bp = Blueprint("universe_scan", __name__)
+
+@universe_scan_bp.route("/universe_scan", methods=["POST"])
+def start_universe_scan():
+    """Backtests one strategy across every ticker in company_info, streaming results.
+    Request Body (JSON):
+        strategy_code (str, optional): Python code string for the strategy.
+        strategy_name (str, optional): Name of a saved strategy (used if strategy_code is absent).
+        strategy_spec (dict, optional): Declarative rule spec (core/strategy_spec.py), used
+                                        instead of strategy_code.
+        start_date (str, optional): Start date in "YYYY-MM-DD" format.
+        end_date (str, optional): End date in "YYYY-MM-DD" format.
+        tickers (list, optional): Restrict the scan to these codes instead of the whole universe.
+        max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+        initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct: As in /backtest.
+    Query Parameters:
+        format (str, optional): "ndjson" (default) or "sse".
+    Returns:
+        Stream: A "start" event with the scan_id, one "result" event per ticker as it
+                completes, and a final "done" event with the scan summary.
+    """
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 400
+
+    req_data = request.get_json()
+    strategy_code = req_data.get("strategy_code") or spec_to_code(req_data.get("strategy_spec"))
+    strategy_name = req_data.get("strategy_name")
+    if not strategy_code and strategy_name:
+        strategy_code = load_strategy_code(strategy_name)
+        if strategy_code is None:
+            return jsonify({"error": "Strategy not found."}), 404
+
+    tickers = req_data.get("tickers")
+    if tickers is not None and not isinstance(tickers, list):
+        return jsonify({"error": "tickers must be a list of ticker codes"}), 400
+
+    try:
+        engine_args = (
+            float(req_data.get("initial_capital", 1000000.0)),
+            float(req_data.get("stop_loss_pct", 5.0)),
+            float(req_data.get("trade_fee_pct", 0.001)),
+            float(req_data.get("sell_tax_pct", 0.2)),
+        )
+        max_workers = int(req_data["max_workers"]) if req_data.get("max_workers") else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid numeric parameter: {e}"}), 400
+
+    try:
+        scan = create_scan(req_data.get("start_date"), req_data.get("end_date"),
+                           strategy_code, engine_args, tickers)
+    except Exception as e:
+        print(f"Error loading ticker universe: {e}") # Log the error
+        return jsonify({"error": f"Failed to load ticker list from company_info: {e}"}), 500
+
+    use_sse = request.args.get("format") == "sse" or \
+        "text/event-stream" in request.headers.get("Accept", "")
+
+    def encode(event, payload):
+        payload = convert_numpy_types(payload)
+        if use_sse:
+            return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        return json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+
+    def generate():
+        yield encode("start", scan.summary())
+        try:
+            for row in iter_scan_results(scan, max_workers):
+                yield encode("result", row)
+        except Exception as e:
+            print(f"Error during universe scan {scan.scan_id}: {e}") # Log the error
+            yield encode("error", {"scan_id": scan.scan_id, "error": str(e)})
+            return
+        yield encode("done", scan.summary())
+
+    mimetype = "text/event-stream" if use_sse else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@universe_scan_bp.route("/universe_scan/<string:scan_id>", methods=["GET"])
+def get_universe_scan_status(scan_id):
+    """Returns progress counters for a scan."""
+    scan = get_scan(scan_id)
+    if scan is None:
+        return jsonify({"error": "Scan not found."}), 404
+    return jsonify(scan.summary()), 200
+
+@universe_scan_bp.route("/universe_scan/<string:scan_id>/leaderboard", methods=["GET"])
+def get_universe_scan_leaderboard(scan_id):
+    """Returns the aggregated leaderboard of a (finished or running) scan.
+    Query Parameters:
+        sort_by (str, optional): Any calculate_metrics key, defaults to "total_return".
+        ascending (str, optional): "true"/"false". Defaults to ascending only for max_drawdown_pct.
+        limit (int, optional): Number of rows to return, defaults to 50 (0 for all).
+    Returns:
+        JSON: Scan summary plus the sorted "leaderboard" rows, or error message.
+    """
+    scan = get_scan(scan_id)
+    if scan is None:
+        return jsonify({"error": "Scan not found."}), 404
+
+    sort_by = request.args.get("sort_by", "total_return")
+    ascending_arg = request.args.get("ascending")
+    ascending = None if ascending_arg is None else ascending_arg.lower() in ("1", "true", "yes")
+    try:
+        limit = int(request.args.get("limit", 50))
+        leaderboard = scan.leaderboard(sort_by, ascending, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(convert_numpy_types({**scan.summary(), "sort_by": sort_by, "leaderboard": leaderboard})), 200
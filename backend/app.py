@@ -22,11 +22,21 @@ from backend.api.stock_data import stock_data_bp
 from backend.api.backtest_runner import backtest_bp # Import backtest blueprint
 from backend.api.llm_chat import llm_chat_bp # Import LLM chat blueprint
 from backend.api.strategy_manager import strategy_bp # Import strategy manager blueprint
+from backend.api.universe_scan import universe_scan_bp # Import universe scan blueprint
+from backend.api.signal_scan import signal_scan_bp # Import daily signal scanner blueprint
+from backend.api.run_history import run_history_bp # Import run history blueprint
+from backend.api.optimizer import optimizer_bp # Import parameter optimizer blueprint
+from backend.api.companies import companies_bp # Import company search blueprint
 
 app.register_blueprint(stock_data_bp, url_prefix="/api")
 app.register_blueprint(backtest_bp, url_prefix="/api") # Register backtest blueprint
 app.register_blueprint(llm_chat_bp, url_prefix="/api") # Register LLM chat blueprint
 app.register_blueprint(strategy_bp, url_prefix="/api") # Register strategy manager blueprint
+app.register_blueprint(universe_scan_bp, url_prefix="/api") # Register universe scan blueprint
+app.register_blueprint(signal_scan_bp, url_prefix="/api") # Register daily signal scanner blueprint
+app.register_blueprint(run_history_bp, url_prefix="/api") # Register run history blueprint
+app.register_blueprint(optimizer_bp, url_prefix="/api") # Register parameter optimizer blueprint
+app.register_blueprint(companies_bp, url_prefix="/api") # Register company search blueprint
 
 @app.route("/")
 def index():
@@ -3,7 +3,26 @@ import numpy as np
 import traceback # For detailed error logging
 import logging
 
-def calculate_metrics(trades: list, equity_curve: pd.Series, initial_capital: float = 10000.0, risk_free_rate: float = 0.02) -> dict:
+from backend.core.strategy_spec import is_strategy_spec, compile_strategy_spec
+
+logger = logging.getLogger(__name__)
+
+# Bar-frequency annualization: trading sessions per year and minutes in a KRX regular
+# session (09:00-15:30); see annualization_factor
+TRADING_DAYS_PER_YEAR = 252
+KRX_SESSION_MINUTES = 390
+
+# run_backtest output modes: "full" returns trade dicts, "metrics" only the metrics
+# (no trade materialization, date formatting, rounding or logging; used by scans and sweeps)
+OUTPUT_MODES = ("full", "metrics")
+
+# Keys produced by calculate_metrics (e.g. for sorting leaderboards)
+METRIC_KEYS = [
+    "total_return", "win_rate", "profit_loss_ratio", "max_drawdown_pct",
+    "num_trades", "final_asset", "sqn", "sharpe_ratio"
+]
+
+def calculate_metrics(trades: list, equity_curve: pd.Series, initial_capital: float = 10000.0, risk_free_rate: float = 0.02, periods_per_year: float = None) -> dict:
     """Calculates performance metrics from a list of trades.
 
     Args:
@@ -12,326 +31,502 @@ def calculate_metrics(trades: list, equity_curve: pd.Series, initial_capital: fl
                         \"sell_date\": \"YYYY-MM-DD\", \"sell_price\": float, 
                         \"profit_loss\": float, \"return_pct\": float}].
         initial_capital (float): The starting capital for calculating total return.
+        periods_per_year (float, optional): Bars per year used to annualize the Sharpe ratio.
+                                            Inferred from the equity curve's index if None
+                                            (252 for daily bars, see annualization_factor).
 
     Returns:
         dict: Dictionary containing total_return (%), win_rate (%), profit_loss_ratio.
     """
-    # if not trades:
-    #     return {"total_return": 0.0, "win_rate": 0.0, "profit_loss_ratio": 0.0, "num_trades": 0}
-
-    # Basic stats even if no trades
     try:
-        metrics = {"num_trades": len(trades)}
-        if not trades:
-            # compute drawdown on flat equity curve
-            drawdown = (equity_curve / equity_curve.cummax() - 1).min() * 100
-            metrics.update({
-                "total_return": round((equity_curve.iloc[-1] / initial_capital - 1) * 100, 2),
-                "win_rate": 0.0,
-                "profit_loss_ratio": 0.0,
-                "max_drawdown_pct": 0.0,
-                "final_asset": float(equity_curve.iloc[-1]),
-                "sqn": None,
-                "sharpe_ratio": None
-            })
-            return metrics
-
-        # Calculate total profit/loss based on individual trade profit_loss
-        total_profit_loss = sum(trade["profit_loss"
-                                    ] for trade in trades)
-        # Calculate total return based on initial capital
-        # Note: This assumes profit_loss is absolute value. If it's per share, calculation needs adjustment.
-        # Let's assume profit_loss is the total profit for that trade based on initial capital allocation per trade (or fixed shares)
-        # A more accurate total return would track portfolio value over time.
-        # For simplicity, let's calculate return based on sum of trade returns if available, or use profit/loss.
-        # If using profit_loss sum:
-        
-        # total_return_pct = (total_profit_loss / initial_capital) * 100 
-        total_return_pct = (equity_curve.iloc[-1] / initial_capital - 1) * 100
-
-        
-        # If using average return_pct (less accurate for portfolio):
-        # avg_return = np.mean([trade["return_pct"] for trade in trades])
+        return _metrics_from_arrays(
+            [trade["profit_loss"] for trade in trades],
+            [trade["return_pct"] for trade in trades],
+            equity_curve.to_numpy(dtype=float),
+            initial_capital,
+            risk_free_rate,
+            periods_per_year or annualization_factor(equity_curve.index)
+        )
+    except Exception as e:
+        return {"error": f"run_backtest error: {type(e).__name__}: {e}"}
 
-        num_trades = len(trades)
-        winning_trades = [trade for trade in trades if trade["profit_loss"] > 0]
-        losing_trades = [trade for trade in trades if trade["profit_loss"] < 0]
 
-        num_winning_trades = len(winning_trades)
-        num_losing_trades = len(losing_trades)
+def annualization_factor(index) -> float:
+    """Number of bars in a trading year for the bar frequency of `index`.
 
-        win_rate = (num_winning_trades / num_trades) * 100 if num_trades > 0 else 0.0
+    Daily (or coarser) bars give TRADING_DAYS_PER_YEAR. Intraday bars are detected from the
+    median spacing between consecutive bars of the same session, and a year is then
+    TRADING_DAYS_PER_YEAR sessions of KRX_SESSION_MINUTES / bar minutes bars each
+    (e.g. 252 x 390 for 1-minute bars).
+    """
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 2:
+        return TRADING_DAYS_PER_YEAR
+    stamps = index.asi8
+    sessions = index.normalize().asi8
+    gaps = np.diff(stamps)[(sessions[1:] == sessions[:-1]) & (np.diff(stamps) > 0)]
+    if len(gaps) == 0:
+        return TRADING_DAYS_PER_YEAR
+    bar_minutes = np.median(gaps) / 60e9
+    return TRADING_DAYS_PER_YEAR * max(1, round(KRX_SESSION_MINUTES / bar_minutes))
 
-        avg_profit = sum(trade["profit_loss"] for trade in winning_trades) / num_winning_trades if num_winning_trades > 0 else 0
-        # Use absolute value for average loss
-        avg_loss = abs(sum(trade["profit_loss"] for trade in losing_trades) / num_losing_trades) if num_losing_trades > 0 else 0
 
-        profit_loss_ratio = avg_profit / avg_loss if avg_loss > 0 else np.inf # Handle division by zero
-        if profit_loss_ratio == np.inf and num_winning_trades > 0:
-            profit_loss_ratio = 100.0 # Assign a large number if no losses but profits exist
-        elif num_winning_trades == 0:
-            profit_loss_ratio = 0.0 # Assign 0 if no profits
-        elif profit_loss_ratio == np.inf: # Case where avg_loss is 0 and avg_profit is 0
-            profit_loss_ratio = 0.0
+def _date_format(index) -> str:
+    # Intraday trades keep the bar time so they can be matched to chart bars
+    return "%Y-%m-%d" if annualization_factor(index) == TRADING_DAYS_PER_YEAR else "%Y-%m-%d %H:%M"
 
-        dd_series = (equity_curve / equity_curve.cummax()) - 1
-        max_drawdown = dd_series.min() * 100  # will be negative or zero
 
-        returns = [trade["return_pct"] for trade in trades]
+def _metrics_from_arrays(profit_losses: list, returns: list, equity: np.ndarray, initial_capital: float, risk_free_rate: float = 0.02, periods_per_year: float = None) -> dict:
+    """Computes the calculate_metrics dictionary from per-trade P/L and return lists and the equity values.
 
-        if num_trades > 1 and np.std(returns) != 0:
-            sqn = (np.mean(returns) / np.std(returns)) * np.sqrt(num_trades)
-            sqn = round(sqn, 2)
-        else:
-            sqn = None  # 또는 0
+    Shared by calculate_metrics (full output) and the metrics-only engine, which never builds trade dicts.
+    """
+    periods_per_year = periods_per_year or TRADING_DAYS_PER_YEAR
+    try:
+        dd_series = (equity / np.maximum.accumulate(equity)) - 1
+        max_drawdown = dd_series.min() * 100  # will be negative or zero
 
         # Sharpe Ratio 계산
-        returns = equity_curve.pct_change().dropna()  # 1일 단순 수익률
-        excess_returns = returns - risk_free_rate / 252  # 일별 무위험수익률(예: 연 1% → 일 1/252)
-        mean_excess_return = excess_returns.mean()
-        std_excess_return = excess_returns.std()
+        bar_returns = equity[1:] / equity[:-1] - 1  # 봉 단위 단순 수익률
+        bar_returns = bar_returns[~np.isnan(bar_returns)]
         sharpe_ratio = np.nan
-        if std_excess_return != 0:
-            sharpe_ratio = mean_excess_return / std_excess_return
-            # 연율화: 일간 수익률이면 × sqrt(252)
-            sharpe_ratio = sharpe_ratio * np.sqrt(252)
-
-        return {
-            "total_return": round(total_return_pct, 2),
-            "win_rate": round(win_rate, 2),
-            "profit_loss_ratio": (
-                round(profit_loss_ratio, 2)
-                if profit_loss_ratio not in (np.inf, float("inf")) else "inf"
-            ),
-            "max_drawdown_pct": round(abs(max_drawdown), 2),
-            "num_trades": num_trades,
-            "final_asset": float(equity_curve.iloc[-1]),
-            "sqn": sqn,
-            "sharpe_ratio": round(sharpe_ratio, 3) if not np.isnan(sharpe_ratio) else None
-        }
+        if len(bar_returns) > 1:
+            excess_returns = bar_returns - risk_free_rate / periods_per_year  # 봉 단위 무위험수익률(예: 일봉이면 연 수익률 / 252)
+            mean_excess_return = excess_returns.mean()
+            std_excess_return = excess_returns.std(ddof=1)
+            if std_excess_return != 0:
+                sharpe_ratio = mean_excess_return / std_excess_return
+                # 연율화: 일봉이면 × sqrt(252), 분봉이면 × sqrt(연간 봉 수)
+                sharpe_ratio = sharpe_ratio * np.sqrt(periods_per_year)
+
+        return _build_metrics(profit_losses, returns, equity[-1], initial_capital, max_drawdown, sharpe_ratio)
     except Exception as e:
         # print("===== run_backtest에서 예외 발생 =====")
         # traceback.print_exc()
         return {"error": f"run_backtest error: {type(e).__name__}: {e}"}
+
+
+def _build_metrics(profit_losses: list, returns: list, final_equity, initial_capital: float, max_drawdown, sharpe_ratio) -> dict:
+    """Assembles the metrics dictionary once drawdown (%) and Sharpe ratio are known.
+
+    Split out so the chunked intraday engine (core/intraday.py), which tracks drawdown and
+    return moments incrementally, reports exactly the same keys and rounding.
+    """
+    # if not trades:
+    #     return {"total_return": 0.0, "win_rate": 0.0, "profit_loss_ratio": 0.0, "num_trades": 0}
+
+    # Basic stats even if no trades
+    num_trades = len(profit_losses)
+    if not num_trades:
+        return {
+            "num_trades": 0,
+            "total_return": round((final_equity / initial_capital - 1) * 100, 2),
+            "win_rate": 0.0,
+            "profit_loss_ratio": 0.0,
+            "max_drawdown_pct": 0.0,
+            "final_asset": float(final_equity),
+            "sqn": None,
+            "sharpe_ratio": None
+        }
+
+    # Total return is based on the final portfolio value, not the sum of trade P/L
+    total_return_pct = (final_equity / initial_capital - 1) * 100
+
+    winning_trades = [pl for pl in profit_losses if pl > 0]
+    losing_trades = [pl for pl in profit_losses if pl < 0]
+
+    num_winning_trades = len(winning_trades)
+    num_losing_trades = len(losing_trades)
+
+    win_rate = (num_winning_trades / num_trades) * 100 if num_trades > 0 else 0.0
+
+    avg_profit = sum(winning_trades) / num_winning_trades if num_winning_trades > 0 else 0
+    # Use absolute value for average loss
+    avg_loss = abs(sum(losing_trades) / num_losing_trades) if num_losing_trades > 0 else 0
+
+    profit_loss_ratio = avg_profit / avg_loss if avg_loss > 0 else np.inf # Handle division by zero
+    if profit_loss_ratio == np.inf and num_winning_trades > 0:
+        profit_loss_ratio = 100.0 # Assign a large number if no losses but profits exist
+    elif num_winning_trades == 0:
+        profit_loss_ratio = 0.0 # Assign 0 if no profits
+    elif profit_loss_ratio == np.inf: # Case where avg_loss is 0 and avg_profit is 0
+        profit_loss_ratio = 0.0
+
+    if num_trades > 1 and np.std(returns) != 0:
+        sqn = (np.mean(returns) / np.std(returns)) * np.sqrt(num_trades)
+        sqn = round(sqn, 2)
+    else:
+        sqn = None  # 또는 0
+
+    return {
+        "total_return": round(total_return_pct, 2),
+        "win_rate": round(win_rate, 2),
+        "profit_loss_ratio": (
+            round(profit_loss_ratio, 2)
+            if profit_loss_ratio not in (np.inf, float("inf")) else "inf"
+        ),
+        "max_drawdown_pct": round(abs(max_drawdown), 2),
+        "num_trades": num_trades,
+        "final_asset": float(final_equity),
+        "sqn": sqn,
+        "sharpe_ratio": round(sharpe_ratio, 3) if not np.isnan(sharpe_ratio) else None
+    }
     
-def run_backtest(data: pd.DataFrame, strategy_code: str = None, initial_capital: float = 1000000.0, stop_loss_pct: float = 5.0, trade_fee_pct: float = 0.001, sell_tax_pct: float = 0.2) -> dict:
+# Columns handed to panel-mode strategies, one wide (dates x tickers) DataFrame each.
+PANEL_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+VALID_SIGNALS = {"buy", "sell", "hold"}
+
+
+def _exec_strategy_code(strategy_code: str, data, indicators: pd.DataFrame = None) -> dict:
+    """Executes strategy code in a restricted environment and returns the names it defines.
+
+    Args:
+        strategy_code (str): Python code string defining the strategy.
+        data: Object exposed to the code as the global `data` (a DataFrame copy or a panel dict).
+        indicators (pd.DataFrame, optional): Precomputed indicator columns exposed as the
+                                             global `indicators` (None if not provided).
+
+    Returns:
+        dict: Local namespace produced by the code (e.g. `generate_signals`).
+    """
+    # Define a restricted environment for exec()
+    # Allow pandas, numpy, and the data itself
+    # WARNING: exec() is inherently risky. A proper sandbox is needed for production.
+    # For this context, we restrict builtins and available modules.
+    safe_globals = {
+        "pd": pd,
+        "np": np,
+        "data": data,
+        "indicators": indicators,
+        "__builtins__": {
+            "print": print, # Allow printing for debugging within strategy
+            "range": range,
+            "len": len,
+            "abs": abs,
+            "round": round,
+            "sum": sum,
+            "min": min,
+            "max": max,
+            "True": True,
+            "False": False,
+            "None": None,
+            # Add other safe builtins if necessary
+        }
+    }
+    exec_locals = {}
+
+    # Execute the strategy code
+    exec(strategy_code, safe_globals, exec_locals)
+    return exec_locals
+
+
+class StrategyError(Exception):
+    """Raised when strategy code fails to run or returns invalid signals."""
+
+
+def generate_signal_series(data: pd.DataFrame, strategy_code: str, indicators: pd.DataFrame = None, strategy_params: dict = None) -> pd.Series:
+    """Executes strategy code and returns its validated 'buy'/'sell'/'hold' signals.
+
+    Args:
+        data (pd.DataFrame): DataFrame with OHLCV data and DatetimeIndex.
+        strategy_code (str): Python code string defining `generate_signals(data)`, or a
+                             declarative JSON/YAML spec (see core/strategy_spec.py).
+        indicators (pd.DataFrame, optional): Exposed to the code as the global `indicators`.
+        strategy_params (dict, optional): Keyword arguments for `generate_signals`
+                                          (e.g. {"period": 14} for RSI_14.py).
+
+    Returns:
+        pd.Series: Signals indexed like `data`.
+
+    Raises:
+        StrategyError: With the message run_backtest reports as its 'error'.
+    """
+    if is_strategy_spec(strategy_code):
+        # Declarative spec (core/strategy_spec.py): compiled once, evaluated without exec
+        try:
+            return compile_strategy_spec(strategy_code).signals(data)
+        except Exception as e:
+            raise StrategyError(f"Error evaluating strategy spec: {e}")
+
+    try:
+        exec_locals = _exec_strategy_code(strategy_code, data.copy(), indicators) # Pass a copy to prevent modification
+
+        # Check if the required function is defined
+        if "generate_signals" not in exec_locals or not callable(exec_locals["generate_signals"]):
+            raise StrategyError("Strategy code must define a function named 'generate_signals(data)'.")
+
+        # Call the user-defined function
+        generated_signals = exec_locals["generate_signals"](data.copy(), **(strategy_params or {})) # Pass data copy
+    except StrategyError:
+        raise
+    except Exception as e:
+        # print(f"Error executing strategy code: {traceback.format_exc()}")
+        raise StrategyError(f"Error executing strategy code: {e}")
+
+    # Validate signals format (should be Series or list matching data length)
+    if not (isinstance(generated_signals, (pd.Series, list)) and len(generated_signals) == len(data)):
+        raise StrategyError("'generate_signals' function must return a pandas Series or list with the same length as the input data.")
+    try:
+        signals = pd.Series(generated_signals, index=data.index)
+        # Ensure signals are valid ("buy", "sell", "hold")
+        valid = all(s in VALID_SIGNALS for s in signals.unique())
+    except Exception as e:
+        raise StrategyError(f"Error executing strategy code: {e}")
+    if not valid:
+        raise StrategyError("Generated signals must be \'buy\', \'sell\', or \'hold\'.")
+    return signals
+
+
+def run_backtest(data: pd.DataFrame, strategy_code: str = None, initial_capital: float = 1000000.0, stop_loss_pct: float = 5.0, trade_fee_pct: float = 0.001, sell_tax_pct: float = 0.2, indicators: pd.DataFrame = None, strategy_params: dict = None, cache=None, ticker: str = None, return_equity: bool = False, output: str = "full") -> dict:
     """Runs a backtest simulation on the provided data using the given strategy.
     Args:
         data (pd.DataFrame): DataFrame with OHLCV data and DatetimeIndex.
         strategy_code (str, optional): Python code string defining the strategy.
                                        Must define a function `generate_signals(data)`.
+                                       A declarative JSON/YAML spec is accepted as well
+                                       (see core/strategy_spec.py).
                                        If None or empty, uses a default buy-and-hold strategy.
         initial_capital (float): Starting capital for the simulation.
         stop_loss_pct:
         trade_fee_pct:
         sell_tax_pct:
+        indicators (pd.DataFrame, optional): Shared indicators (see core/indicators.py) computed
+                                             once by the caller; strategies may read them
+                                             through the global `indicators`.
+        strategy_params (dict, optional): Keyword arguments passed to `generate_signals`.
+        cache (TieredBacktestCache, optional): Result cache (see core/result_cache.py). Signals
+                                               are reused across engine settings and whole
+                                               results across identical runs.
+        ticker (str, optional): Ticker of `data`, used to invalidate cache entries when the
+                                ticker's data is updated.
+        return_equity (bool): Also return the daily equity curve as
+                              {"dates": [...], "values": [...]} under 'equity_curve'.
+        output (str): "full" (default) or "metrics". "metrics" skips building the trade list
+                      and returns only {'metrics': ...}; use it for scans and sweeps.
 
     Returns:
         dict: Contains \'trades\' list and \'metrics\' dictionary.
               Returns {\'error\': message} if an error occurs.
     """
     try:
-        trades = []
-        position_open = False
-        buy_price = 0
-        buy_date = None
-        # For simplicity, assume we invest the full capital in the first trade
-        # A more complex simulation would handle capital allocation per trade.
-        shares_held = 0
-
-        # print("===== run_backtest: pct verification =====", flush=True)
-        # 퍼센트 단위 → 소수 단위 변환 (필수!!)
-        # print(f"Before trade_fee_pct: {trade_fee_pct}, sell_tax_pct: {sell_tax_pct}", flush=True)
-        trade_fee_pct = trade_fee_pct / 100
-        sell_tax_pct = sell_tax_pct / 100
-        # print(f"After trade_fee_pct: {trade_fee_pct}, sell_tax_pct: {sell_tax_pct}", flush=True)
-
         # --- Data Validation ---
         if data.empty:
             return {"error": "Input data is empty."}
-
-        signals = pd.Series("hold", index=data.index) # Default to hold
+        if output not in OUTPUT_MODES:
+            return {"error": f"output must be one of {OUTPUT_MODES}"}
+
+        # --- Cache Lookup (full result first, then signals) ---
+        signals = None
+        if cache is not None:
+            signals_key = cache.signals_key(data, strategy_code, strategy_params, indicators)
+            result_key = cache.result_key(signals_key, initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct, output=output)
+            cached_result = cache.get_result(result_key)
+            if cached_result is not None:
+                return _finalize_result(cached_result, return_equity)
+            signals = cache.get_signals(signals_key, data.index)
 
         # --- Strategy Code Execution --- 
-        if strategy_code:
-            print(f"--- Executing Provided Strategy Code ---")
+        if signals is None and strategy_code:
+            if output == "full":
+                logger.debug("Executing provided strategy code")
             try:
-                # Define a restricted environment for exec()
-                # Allow pandas, numpy, and the data itself
-                # WARNING: exec() is inherently risky. A proper sandbox is needed for production.
-                # For this context, we restrict builtins and available modules.
-                safe_globals = {
-                    "pd": pd,
-                    "np": np,
-                    "data": data.copy(), # Pass a copy to prevent modification
-                    "__builtins__": {
-                        "print": print, # Allow printing for debugging within strategy
-                        "range": range,
-                        "len": len,
-                        "abs": abs,
-                        "round": round,
-                        "sum": sum,
-                        "min": min,
-                        "max": max,
-                        "True": True,
-                        "False": False,
-                        "None": None,
-                        # Add other safe builtins if necessary
-                    }
-                }
-                exec_locals = {}
-                
-                # Execute the strategy code
-                exec(strategy_code, safe_globals, exec_locals)
-                
-                # Check if the required function is defined
-                if "generate_signals" not in exec_locals or not callable(exec_locals["generate_signals"]):
-                    return {"error": "Strategy code must define a function named 'generate_signals(data)'."}
-                
-                # Call the user-defined function
-                generated_signals = exec_locals["generate_signals"](data.copy()) # Pass data copy
-
-                # Validate signals format (should be Series or list matching data length)
-                if isinstance(generated_signals, (pd.Series, list)) and len(generated_signals) == len(data):
-                    signals = pd.Series(generated_signals, index=data.index)
-                    # Ensure signals are valid ("buy", "sell", "hold")
-                    valid_signals = {"buy", "sell", "hold"}
-                    if not all(s in valid_signals for s in signals.unique()):
-                        return {"error": "Generated signals must be \'buy\', \'sell\', or \'hold\'."}
-                else:
-                    return {"error": "'generate_signals' function must return a pandas Series or list with the same length as the input data."}
-
-            except Exception as e:
-                # print(f"Error executing strategy code: {traceback.format_exc()}")
-                return {"error": f"Error executing strategy code: {e}"} 
-        else:
+                signals = generate_signal_series(data, strategy_code, indicators, strategy_params)
+            except StrategyError as e:
+                return {"error": str(e)}
+        elif signals is None:
             # Default Strategy: Buy and Hold
             # print("--- Using Default Buy and Hold Strategy ---")
+            signals = pd.Series("hold", index=data.index) # Default to hold
             signals.iloc[0] = "buy"
             # No explicit sell signal needed for buy & hold, handled at the end.
 
-        # --- Simulate Trades based on signals --- 
-        # Prepare to record equity over time
-        equity_curve = pd.Series(index=data.index, dtype=float)
-        cash = initial_capital
-        shares_held = 0
+        if cache is not None:
+            cache.put_signals(signals_key, signals, ticker)
 
-        for i in range(len(data)):
-            current_date = data.index[i]
-            current_price = data["Close"].iloc[i]
-            # current_price = data.loc[current_date, "Close"]
-            signal = signals.iloc[i]
-            # next_open = data["Open"].iloc[i + 1]
-            # next_open = data.loc[current_date+1, "Open"] if i < len(data) - 1 else data, "Low"
-
-            # Update equity before taking action
-            if shares_held > 0:
-                equity_curve.iloc[i] = shares_held * current_price
-            else:
-                equity_curve.iloc[i] = cash
-
-            if pd.isna(current_price):
-                equity_curve.iloc[i] = equity_curve.iloc[i - 1] if i > 0 else initial_capital            
-                continue # Skip days with missing price data
-
-            # ===== Stop Loss Check (추가) =====
-            stop_loss_triggered = False
-            if position_open and current_price <= buy_price * (1 - stop_loss_pct / 100):
-                stop_loss_triggered = True
-                # print("Stop Loss Trigger")
-
-            # --- Buy Logic (Long Only) ---
-            if signal == "buy" and not position_open:
-                position_open = True
-                buy_price = current_price
-                buy_date = current_date
-
-                # 계산: 매수에 드는 전체 금액 = 주식매수금액 + 매수수수료
-                # 1) 수수료 포함해서 최대 매수 가능한 주식 수 계산
-                max_shares = int(cash // (buy_price * (1 + trade_fee_pct)))
-                if max_shares == 0:
-                    continue # 살 수 없음
-
-                shares_held = max_shares
-                # 매수수수료
-                buy_fee = buy_price * shares_held * trade_fee_pct
-
-                # 매수금액(수수료포함)
-                total_buy_amount = buy_price * shares_held + buy_fee
-
-                # 매수시 현금 보유액 감소
-                cash -= total_buy_amount
-
-                # print(f"{buy_date.strftime('%Y-%m-%d')}: Buy at {buy_price:.2f}")
-
-            # --- Sell Logic (Long Only) ---
-            elif (signal == "sell" or stop_loss_triggered) and position_open:
-                sell_price = current_price
-                sell_date = current_date
-
-                # 매도수수료
-                sell_fee = sell_price * shares_held * trade_fee_pct
-
-                # 매도세금
-                sell_tax = sell_price * shares_held * sell_tax_pct
-
-                # 매도금액(수수료·세금 차감)
-                total_sell_amount = sell_price * shares_held - sell_fee - sell_tax
-
-                # 매도시 실제 수령 금액 = (매도단가 × 수량) × (1 - trade_fee_pct - sell_tax_pct)
-                profit_loss = total_sell_amount - total_buy_amount
-
-                # 실수익률(%)
-                return_pct = (profit_loss / total_buy_amount) * 100 if total_buy_amount > 0 else 0
-                
-                # 보유기간(총 일수 = 매도일 − 매수일)
-                holding_period = (sell_date - buy_date).days
-
-                if stop_loss_triggered:
-                    exit_type = 'stop_loss' 
-                else:
-                    exit_type = 'signal'
-
-                trades.append({
-                    "buy_date": buy_date.strftime("%Y-%m-%d"),
-                    "buy_price": round(buy_price, 2),
-                    "sell_date": sell_date.strftime("%Y-%m-%d"),
-                    "sell_price": round(sell_price, 2),
-                    "profit_loss": round(profit_loss, 2),
-                    "return_pct": round(return_pct, 2),
-                    "stop_loss": stop_loss_triggered,
-                    "buy_qty": shares_held,
-                    "buy_fee": round(buy_fee, 2),
-                    "total_buy_amount": round(total_buy_amount, 2),
-                    "sell_fee": round(sell_fee, 2),
-                    "sell_tax": round(sell_tax, 2),
-                    "total_sell_amount": round(total_sell_amount, 2),
-                    "exit_type": exit_type,
-                    "holding_period": holding_period
-                })
-
-                # print("===== run_backtest에서 예외 발생 =====")
-                # print("===== trades =====", trades, flush=True)
-                # print("DEBUG sample trade keys:", trades[0].keys() if trades else "NO TRADES")
-
-                # settle the trade
-                # 매도(청산) 시, 현금 보유액 증가
-                cash += total_sell_amount
-                shares_held = 0
-                position_open = False
-                buy_price = 0
-                buy_fee = 0
-                total_buy_amount = 0
-                sell_fee = 0
-                sell_tax = 0
-                buy_date = None
-                # For simplicity, don't reinvest capital after selling in this basic model
-
-        # --- Handle Open Position at the End (for Buy & Hold or if strategy leaves position open) ---
-        if position_open:
-            # Close position on the last day
-            sell_price = data["Close"].iloc[-1]
-            sell_date = data.index[-1]
+        simulate = _simulate_trades if output == "full" else _simulate_metrics
+        results = simulate(data, signals, initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct)
+        if cache is not None and "error" not in results.get("metrics", {}):
+            cache.put_result(result_key, results, ticker)
+        return _finalize_result(results, return_equity)
+    except Exception as e:
+        # print("===== run_backtest에서 예외 발생 =====")
+        # traceback.print_exc()
+        return {"error": f"run_backtest error: {type(e).__name__}: {e}"}
+
+
+def run_panel_backtest(data_by_ticker: dict, strategy_code: str = None, initial_capital: float = 1000000.0, stop_loss_pct: float = 5.0, trade_fee_pct: float = 0.001, sell_tax_pct: float = 0.2, output: str = "full") -> dict:
+    """Runs one strategy over many tickers, evaluating panel-capable strategies in a single call.
+
+    A strategy opts into panel mode by defining `generate_panel_signals(data)`; declarative
+    specs (core/strategy_spec.py) always run in panel mode. It receives
+    a dict of wide DataFrames (dates x tickers) keyed by "Open", "High", "Low", "Close"
+    and "Volume", and must return a wide DataFrame of 'buy'/'sell'/'hold' with the same
+    index and columns as `data["Close"]`. Tickers are grouped by their trading dates and each
+    group gets its own gap-free panel, so a ticker with a trading halt or a later listing is
+    evaluated on its own bars only and gets the same signals as from `run_backtest`.
+    Strategies without `generate_panel_signals` (and the default buy-and-hold) fall back
+    to one `run_backtest` call per ticker.
+
+    Args:
+        data_by_ticker (dict): {ticker: DataFrame with OHLCV data and DatetimeIndex}.
+        strategy_code (str, optional): Python code string defining the strategy.
+        initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct, output: As in `run_backtest`.
+
+    Returns:
+        dict: {ticker: result} where each result has the same shape as `run_backtest`'s,
+              or {'error': message} if the panel evaluation itself fails.
+    """
+    engine_args = (initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct)
+    if not data_by_ticker:
+        return {"error": "Input data is empty."}
+    if output not in OUTPUT_MODES:
+        return {"error": f"output must be one of {OUTPUT_MODES}"}
+
+    panel_fn = None
+    if is_strategy_spec(strategy_code):
+        try:
+            panel_fn = compile_strategy_spec(strategy_code).panel_signals
+        except Exception as e:
+            return {"error": f"Error evaluating strategy spec: {e}"}
+    elif strategy_code:
+        try:
+            exec_locals = _exec_strategy_code(strategy_code, None)
+        except Exception as e:
+            return {"error": f"Error executing strategy code: {e}"}
+        panel_fn = exec_locals.get("generate_panel_signals")
+        if not callable(panel_fn):
+            panel_fn = None
+
+    if panel_fn is None:
+        return {
+            ticker: run_backtest(df, strategy_code, *engine_args, output=output)
+            for ticker, df in data_by_ticker.items()
+        }
+
+    tickers = [t for t, df in data_by_ticker.items() if not df.empty]
+    results = {t: {"error": "Input data is empty."} for t, df in data_by_ticker.items() if df.empty}
+    if not tickers:
+        return results
+
+    # Tickers sharing the same dates form one panel; NaN-padding a halted or newly listed
+    # ticker would let its rolling windows span other tickers' dates
+    calendars = {}
+    for ticker in tickers:
+        index = pd.DatetimeIndex(data_by_ticker[ticker].index).sort_values()
+        calendars.setdefault(index.asi8.tobytes(), []).append(ticker)
+
+    signals_by_ticker = {}
+    try:
+        for group in calendars.values():
+            panel = {
+                col: pd.concat({t: data_by_ticker[t][col] for t in group}, axis=1).sort_index()
+                for col in PANEL_COLUMNS
+            }
+            wide_signals = panel_fn({col: frame.copy() for col, frame in panel.items()})
+
+            close = panel["Close"]
+            if not isinstance(wide_signals, pd.DataFrame) or wide_signals.shape != close.shape:
+                return {"error": "'generate_panel_signals' function must return a DataFrame with the same shape as data['Close']."}
+            if not wide_signals.index.equals(close.index) or not wide_signals.columns.equals(close.columns):
+                return {"error": "'generate_panel_signals' must return a DataFrame indexed like data['Close'] (dates x tickers)."}
+            if not all(s in VALID_SIGNALS for s in pd.unique(wide_signals.to_numpy().ravel())):
+                return {"error": "Generated signals must be \'buy\', \'sell\', or \'hold\'."}
+            signals_by_ticker.update({t: wide_signals[t] for t in group})
+    except Exception as e:
+        return {"error": f"Error executing strategy code: {e}"}
+
+    simulate = _simulate_trades if output == "full" else _simulate_metrics
+    for ticker in tickers:
+        data = data_by_ticker[ticker]
+        try:
+            signals = signals_by_ticker[ticker].reindex(data.index)
+            results[ticker] = _finalize_result(simulate(data, signals, *engine_args), False)
+        except Exception as e:
+            results[ticker] = {"error": f"run_backtest error: {type(e).__name__}: {e}"}
+    return results
+
+
+def _simulate_trades(data: pd.DataFrame, signals: pd.Series, initial_capital: float, stop_loss_pct: float, trade_fee_pct: float, sell_tax_pct: float) -> dict:
+    """Simulates long-only trades for one ticker from a validated signal series.
+
+    Returns:
+        dict: Contains 'trades' list, 'metrics' dictionary and the 'equity_curve' Series.
+    """
+    trades = []
+    position_open = False
+    buy_price = 0
+    buy_date = None
+    buy_bar = None
+    date_format = _date_format(data.index)
+    # For simplicity, assume we invest the full capital in the first trade
+    # A more complex simulation would handle capital allocation per trade.
+    shares_held = 0
+
+    # print("===== run_backtest: pct verification =====", flush=True)
+    # 퍼센트 단위 → 소수 단위 변환 (필수!!)
+    # print(f"Before trade_fee_pct: {trade_fee_pct}, sell_tax_pct: {sell_tax_pct}", flush=True)
+    trade_fee_pct = trade_fee_pct / 100
+    sell_tax_pct = sell_tax_pct / 100
+    # print(f"After trade_fee_pct: {trade_fee_pct}, sell_tax_pct: {sell_tax_pct}", flush=True)
+
+    # --- Simulate Trades based on signals --- 
+    # Prepare to record equity over time
+    equity_curve = pd.Series(index=data.index, dtype=float)
+    cash = initial_capital
+    shares_held = 0
+
+    for i in range(len(data)):
+        current_date = data.index[i]
+        current_price = data["Close"].iloc[i]
+        # current_price = data.loc[current_date, "Close"]
+        signal = signals.iloc[i]
+        # next_open = data["Open"].iloc[i + 1]
+        # next_open = data.loc[current_date+1, "Open"] if i < len(data) - 1 else data, "Low"
+
+        # Update equity before taking action
+        if shares_held > 0:
+            equity_curve.iloc[i] = shares_held * current_price
+        else:
+            equity_curve.iloc[i] = cash
+
+        if pd.isna(current_price):
+            equity_curve.iloc[i] = equity_curve.iloc[i - 1] if i > 0 else initial_capital            
+            continue # Skip days with missing price data
+
+        # ===== Stop Loss Check (추가) =====
+        stop_loss_triggered = False
+        if position_open and current_price <= buy_price * (1 - stop_loss_pct / 100):
+            stop_loss_triggered = True
+            # print("Stop Loss Trigger")
+
+        # --- Buy Logic (Long Only) ---
+        if signal == "buy" and not position_open:
+            position_open = True
+            buy_price = current_price
+            buy_date = current_date
+            buy_bar = i
+
+            # 계산: 매수에 드는 전체 금액 = 주식매수금액 + 매수수수료
+            # 1) 수수료 포함해서 최대 매수 가능한 주식 수 계산
+            max_shares = int(cash // (buy_price * (1 + trade_fee_pct)))
+            if max_shares == 0:
+                continue # 살 수 없음
+
+            shares_held = max_shares
+            # 매수수수료
+            buy_fee = buy_price * shares_held * trade_fee_pct
+
+            # 매수금액(수수료포함)
+            total_buy_amount = buy_price * shares_held + buy_fee
+
+            # 매수시 현금 보유액 감소
+            cash -= total_buy_amount
+
+            # print(f"{buy_date.strftime('%Y-%m-%d')}: Buy at {buy_price:.2f}")
+
+        # --- Sell Logic (Long Only) ---
+        elif (signal == "sell" or stop_loss_triggered) and position_open:
+            sell_price = current_price
+            sell_date = current_date
 
             # 매도수수료
             sell_fee = sell_price * shares_held * trade_fee_pct
@@ -342,24 +537,29 @@ def run_backtest(data: pd.DataFrame, strategy_code: str = None, initial_capital:
             # 매도금액(수수료·세금 차감)
             total_sell_amount = sell_price * shares_held - sell_fee - sell_tax
 
+            # 매도시 실제 수령 금액 = (매도단가 × 수량) × (1 - trade_fee_pct - sell_tax_pct)
             profit_loss = total_sell_amount - total_buy_amount
 
             # 실수익률(%)
             return_pct = (profit_loss / total_buy_amount) * 100 if total_buy_amount > 0 else 0
-
-            # 보유기간(총 일수 = 매도일 − 매수일)
+            
+            # 보유기간(총 일수 = 매도일 − 매수일), 보유 봉 수(장중 봉만 계산, 분봉에서도 유효)
             holding_period = (sell_date - buy_date).days
-                        
-            exit_type = 'final_close'
+            holding_bars = i - buy_bar
+
+            if stop_loss_triggered:
+                exit_type = 'stop_loss' 
+            else:
+                exit_type = 'signal'
 
             trades.append({
-                "buy_date": buy_date.strftime("%Y-%m-%d"),
+                "buy_date": buy_date.strftime(date_format),
                 "buy_price": round(buy_price, 2),
-                "sell_date": sell_date.strftime("%Y-%m-%d"),
+                "sell_date": sell_date.strftime(date_format),
                 "sell_price": round(sell_price, 2),
                 "profit_loss": round(profit_loss, 2),
                 "return_pct": round(return_pct, 2),
-                "stop_loss": False,
+                "stop_loss": stop_loss_triggered,
                 "buy_qty": shares_held,
                 "buy_fee": round(buy_fee, 2),
                 "total_buy_amount": round(total_buy_amount, 2),
@@ -367,35 +567,203 @@ def run_backtest(data: pd.DataFrame, strategy_code: str = None, initial_capital:
                 "sell_tax": round(sell_tax, 2),
                 "total_sell_amount": round(total_sell_amount, 2),
                 "exit_type": exit_type,
-                "holding_period": holding_period
+                "holding_period": holding_period,
+                "holding_bars": holding_bars
             })
-            
+
             # print("===== run_backtest에서 예외 발생 =====")
             # print("===== trades =====", trades, flush=True)
+            # print("DEBUG sample trade keys:", trades[0].keys() if trades else "NO TRADES")
+
+            # settle the trade
             # 매도(청산) 시, 현금 보유액 증가
             cash += total_sell_amount
             shares_held = 0
-            # print(f"{sell_date.strftime('%Y-%m-%d')}: Force Sell (End of Period) at {sell_price:.2f}, Profit/Loss: {profit_loss:.2f}")
+            position_open = False
+            buy_price = 0
+            buy_fee = 0
+            total_buy_amount = 0
+            sell_fee = 0
+            sell_tax = 0
+            buy_date = None
+            # For simplicity, don't reinvest capital after selling in this basic model
+
+    # --- Handle Open Position at the End (for Buy & Hold or if strategy leaves position open) ---
+    if position_open:
+        # Close position on the last day
+        sell_price = data["Close"].iloc[-1]
+        sell_date = data.index[-1]
+
+        # 매도수수료
+        sell_fee = sell_price * shares_held * trade_fee_pct
+
+        # 매도세금
+        sell_tax = sell_price * shares_held * sell_tax_pct
+
+        # 매도금액(수수료·세금 차감)
+        total_sell_amount = sell_price * shares_held - sell_fee - sell_tax
+
+        profit_loss = total_sell_amount - total_buy_amount
+
+        # 실수익률(%)
+        return_pct = (profit_loss / total_buy_amount) * 100 if total_buy_amount > 0 else 0
+
+        # 보유기간(총 일수 = 매도일 − 매수일), 보유 봉 수
+        holding_period = (sell_date - buy_date).days
+        holding_bars = len(data) - 1 - buy_bar
+                    
+        exit_type = 'final_close'
+
+        trades.append({
+            "buy_date": buy_date.strftime(date_format),
+            "buy_price": round(buy_price, 2),
+            "sell_date": sell_date.strftime(date_format),
+            "sell_price": round(sell_price, 2),
+            "profit_loss": round(profit_loss, 2),
+            "return_pct": round(return_pct, 2),
+            "stop_loss": False,
+            "buy_qty": shares_held,
+            "buy_fee": round(buy_fee, 2),
+            "total_buy_amount": round(total_buy_amount, 2),
+            "sell_fee": round(sell_fee, 2),
+            "sell_tax": round(sell_tax, 2),
+            "total_sell_amount": round(total_sell_amount, 2),
+            "exit_type": exit_type,
+            "holding_period": holding_period,
+            "holding_bars": holding_bars
+        })
+        
+        # print("===== run_backtest에서 예외 발생 =====")
+        # print("===== trades =====", trades, flush=True)
+        # 매도(청산) 시, 현금 보유액 증가
+        cash += total_sell_amount
+        shares_held = 0
+        # print(f"{sell_date.strftime('%Y-%m-%d')}: Force Sell (End of Period) at {sell_price:.2f}, Profit/Loss: {profit_loss:.2f}")
 
-        # --- Calculate Metrics --- 
-        # metrics = calculate_metrics(trades, initial_capital)
-        # ensure equity_curve is filled forward for any trailing NaNs
-        equity_curve.fillna(method="ffill", inplace=True)
-        equity_curve.fillna(initial_capital, inplace=True)
+    # --- Calculate Metrics --- 
+    # metrics = calculate_metrics(trades, initial_capital)
+    # ensure equity_curve is filled forward for any trailing NaNs
+    equity_curve.fillna(method="ffill", inplace=True)
+    equity_curve.fillna(initial_capital, inplace=True)
 
-        # --- Calculate Metrics (including MDD) --- 
-        metrics = calculate_metrics(trades, equity_curve, initial_capital)
+    # --- Calculate Metrics (including MDD) --- 
+    metrics = calculate_metrics(trades, equity_curve, initial_capital)
 
-        print("DEBUG sample trade keys:", trades[0].keys() if trades else "NO TRADES")
+    logger.debug("Backtest finished with %d trades", len(trades))
 
-        return {
-            "trades": trades,
-            "metrics": metrics
+    return {
+        "trades": trades,
+        "metrics": metrics,
+        "equity_curve": equity_curve
+    }
+
+
+class _LongOnlyEngine:
+    """Cash/position state of the metrics-only engine.
+
+    Applies the _simulate_trades trading rules bar by bar and keeps only per-trade P/L and
+    return. The state survives between `run` calls, so bars can be fed in chunks.
+    """
+
+    def __init__(self, initial_capital: float, stop_loss_pct: float, trade_fee_pct: float, sell_tax_pct: float):
+        self.initial_capital = initial_capital
+        self.trade_fee_pct = trade_fee_pct / 100
+        self.sell_tax_pct = sell_tax_pct / 100
+        self.stop_loss_ratio = 1 - stop_loss_pct / 100
+        self.profit_losses = []
+        self.returns = []
+        self.holding_bars = []
+        self.cash = initial_capital
+        self.shares_held = 0
+        self.position_open = False
+        self.buy_price = 0
+        self.buy_bar = None
+        self.total_buy_amount = None # Unset until the first filled buy, as in _simulate_trades
+        self.bars_seen = 0
+        self.last_equity = None
+
+    def _close_position(self, sell_price: float, bar: int):
+        gross = sell_price * self.shares_held
+        total_sell_amount = gross - gross * self.trade_fee_pct - gross * self.sell_tax_pct
+        profit_loss = total_sell_amount - self.total_buy_amount
+        # Same 2-decimal values the trade dicts carry, so both modes report identical metrics
+        self.profit_losses.append(round(profit_loss, 2))
+        self.returns.append(round((profit_loss / self.total_buy_amount) * 100 if self.total_buy_amount > 0 else 0, 2))
+        self.holding_bars.append(bar - self.buy_bar)
+        self.cash += total_sell_amount
+        self.shares_held = 0
+        self.position_open = False
+        self.buy_price = 0
+        self.total_buy_amount = 0
+
+    def run(self, closes: list, is_buy: list, is_sell: list) -> list:
+        """Processes the next bars and returns their equity values."""
+        equity = [0.0] * len(closes)
+        previous = self.initial_capital if self.last_equity is None else self.last_equity
+        for i, current_price in enumerate(closes):
+            bar = self.bars_seen + i
+            if current_price != current_price: # Missing price (NaN)
+                equity[i] = previous
+                continue
+            equity[i] = previous = self.shares_held * current_price if self.shares_held > 0 else self.cash
+
+            stop_loss_triggered = self.position_open and current_price <= self.buy_price * self.stop_loss_ratio
+
+            if is_buy[i] and not self.position_open:
+                self.position_open = True
+                self.buy_price = current_price
+                self.buy_bar = bar
+                max_shares = int(self.cash // (current_price * (1 + self.trade_fee_pct)))
+                if max_shares == 0:
+                    continue
+                self.shares_held = max_shares
+                self.total_buy_amount = current_price * max_shares + current_price * max_shares * self.trade_fee_pct
+                self.cash -= self.total_buy_amount
+            elif (is_sell[i] or stop_loss_triggered) and self.position_open:
+                self._close_position(current_price, bar)
+
+        self.bars_seen += len(closes)
+        if equity:
+            self.last_equity = equity[-1]
+        return equity
+
+    def close_open_position(self, last_price: float):
+        """Closes a position still open after the last bar at that bar's close."""
+        if self.position_open:
+            self._close_position(last_price, self.bars_seen - 1)
+
+
+def _simulate_metrics(data: pd.DataFrame, signals: pd.Series, initial_capital: float, stop_loss_pct: float, trade_fee_pct: float, sell_tax_pct: float) -> dict:
+    """Metrics-only counterpart of _simulate_trades.
+
+    Follows the same trading rules on plain float lists and keeps only what calculate_metrics
+    needs (per-trade P/L and return, equity values): no trade dicts, dates or logging.
+
+    Returns:
+        dict: Contains 'metrics' dictionary and the 'equity_curve' Series.
+    """
+    closes = data["Close"].to_numpy(dtype=float).tolist()
+    engine = _LongOnlyEngine(initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct)
+    equity = engine.run(closes, (signals == "buy").to_numpy().tolist(), (signals == "sell").to_numpy().tolist())
+    engine.close_open_position(closes[-1])
+
+    metrics = _metrics_from_arrays(engine.profit_losses, engine.returns, np.asarray(equity), initial_capital,
+                                   periods_per_year=annualization_factor(data.index))
+    return {
+        "metrics": metrics,
+        "equity_curve": pd.Series(equity, index=data.index)
+    }
+
+
+def _finalize_result(results: dict, return_equity: bool) -> dict:
+    """Drops the internal equity Series, or converts it to JSON-friendly lists if requested."""
+    equity_curve = results.pop("equity_curve", None)
+    if return_equity and equity_curve is not None:
+        results["equity_curve"] = {
+            "dates": equity_curve.index.strftime(_date_format(equity_curve.index)).tolist(),
+            "values": equity_curve.round(2).tolist()
         }
-    except Exception as e:
-        # print("===== run_backtest에서 예외 발생 =====")
-        # traceback.print_exc()
-        return {"error": f"run_backtest error: {type(e).__name__}: {e}"}
+    return results
 
 # Example Usage (can be run standalone for testing)
 if __name__ == "__main__":
@@ -0,0 +1,250 @@
+# /home/ubuntu/backtest_app/backend/core/bar_store.py
+import os
+import struct
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Per-ticker bar files used as the on-disk cache of the local data store
+BAR_CACHE_DIR = os.getenv(
+    "BAR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bars")
+)
+# "varint" (delta + zigzag + LEB128 varint) or "zstd" (delta int32/int64 columns compressed with zstandard)
+BAR_CACHE_CODEC = os.getenv("BAR_CACHE_CODEC", "varint")
+
+MAGIC = b"KBR1"
+CODECS = {"varint": 0, "zstd": 1}
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# Prices are integer won and fit in int32; volume can exceed 2^31 on heavily traded names
+COLUMN_DTYPES = {"Open": np.int32, "High": np.int32, "Low": np.int32, "Close": np.int32, "Volume": np.int64}
+# Index ticks: days for daily bars, minutes for intraday bars (both fit in int32 since the epoch)
+INDEX_UNITS = {"D": 86400, "min": 60}
+
+# magic, codec, index unit (seconds per tick), rows
+_HEADER = struct.Struct("<4sBxxxII")
+# payload offset and size per column
+_COLUMN_ENTRY = struct.Struct("<QQ")
+
+
+def _zigzag_deltas(values: np.ndarray) -> np.ndarray:
+    deltas = np.diff(values.astype(np.int64), prepend=np.int64(0))
+    return ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+
+
+def _unzigzag_cumsum(encoded: np.ndarray) -> np.ndarray:
+    deltas = (encoded >> np.uint64(1)).astype(np.int64) ^ -(encoded & np.uint64(1)).astype(np.int64)
+    return np.cumsum(deltas)
+
+
+def encode_varint(values: np.ndarray) -> bytes:
+    """Delta + zigzag + LEB128 varint encoding of an integer column (vectorized)."""
+    encoded = _zigzag_deltas(values)
+    if len(encoded) == 0:
+        return b""
+    # Bytes per value: 7 payload bits per byte
+    bit_length = np.floor(np.log2(np.maximum(encoded, 1).astype(np.float64))).astype(np.int64) + 1
+    nbytes = np.maximum((bit_length + 6) // 7, 1)
+    # log2 on float64 can be off by one near powers of two; fix up exactly
+    nbytes = np.where((nbytes < 10) & ((encoded >> (7 * nbytes).astype(np.uint64)) > 0), nbytes + 1, nbytes)
+
+    starts = np.concatenate(([0], np.cumsum(nbytes)[:-1]))
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        has_byte = nbytes > k
+        chunk = ((encoded[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)).astype(np.uint8)
+        continues = (nbytes[has_byte] > k + 1).astype(np.uint8) << 7
+        out[starts[has_byte] + k] = chunk | continues
+    return out.tobytes()
+
+
+def decode_varint(buffer, count: int) -> np.ndarray:
+    """Inverse of encode_varint; `buffer` may be a memory-mapped slice.
+
+    Only the first `count` values are decoded, so a prefix of a column costs only its own bytes.
+    """
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    # A value takes at most 10 bytes; cut the buffer after the `count`-th value
+    ends = np.flatnonzero(raw[:10 * count] < 0x80)[:count]
+    raw = raw[:ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Position of every byte inside its value -> shift of its 7 payload bits
+    value_of_byte = np.repeat(np.arange(count), ends - starts + 1)
+    shifts = (np.arange(len(raw)) - starts[value_of_byte]).astype(np.uint64) * np.uint64(7)
+    parts = (raw & 0x7F).astype(np.uint64) << shifts
+    encoded = np.add.reduceat(parts, starts)
+    return _unzigzag_cumsum(encoded)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("The zstd bar codec requires the zstandard package (pip install zstandard).")
+    return zstandard
+
+
+def _encode_column(values: np.ndarray, dtype, codec: str) -> bytes:
+    if codec == "zstd":
+        deltas = np.diff(values.astype(np.int64), prepend=np.int64(0)).astype(dtype)
+        return _zstd().ZstdCompressor(level=9).compress(deltas.tobytes())
+    return encode_varint(values)
+
+
+def _decode_column(buffer, count: int, dtype, codec: str) -> np.ndarray:
+    """Decodes the first `count` values of a column payload."""
+    if codec == "zstd":
+        # Stream-decompress only the bytes of the first `count` deltas
+        wanted = count * np.dtype(dtype).itemsize
+        chunks = []
+        with _zstd().ZstdDecompressor().stream_reader(bytes(buffer)) as reader:
+            while wanted > 0:
+                chunk = reader.read(wanted)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                wanted -= len(chunk)
+        deltas = np.frombuffer(b"".join(chunks), dtype=dtype)
+        return np.cumsum(deltas.astype(np.int64)).astype(dtype)
+    return decode_varint(buffer, count).astype(dtype)
+
+
+def write_bars(path: str, data: pd.DataFrame, codec: str = None):
+    """Writes OHLCV bars in the compact format (atomically, via a temporary file).
+
+    Layout: header, int32 date index (raw, so it can be searched straight from the memory
+    map), column table, then one encoded payload per column.
+
+    Raises:
+        ValueError: If prices/volume are not integers (e.g. adjusted prices) or do not fit int32.
+    """
+    codec = codec or BAR_CACHE_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"codec must be one of {list(CODECS)}")
+
+    index = pd.DatetimeIndex(data.index)
+    unit = "D" if (index == index.normalize()).all() else "min"
+    ticks = index.asi8 // (INDEX_UNITS[unit] * 10**9)
+
+    payloads = []
+    for column in COLUMNS:
+        values = data[column].to_numpy(dtype=np.float64)
+        if np.isnan(values).any() or not np.array_equal(values, np.round(values)):
+            raise ValueError(f"Column {column} has non-integer values; bars cannot be stored compactly.")
+        info = np.iinfo(COLUMN_DTYPES[column])
+        if len(values) and (values.min() < info.min or values.max() > info.max):
+            raise ValueError(f"Column {column} does not fit {np.dtype(COLUMN_DTYPES[column]).name}.")
+        payloads.append(_encode_column(values.astype(np.int64), COLUMN_DTYPES[column], codec))
+
+    offset = _HEADER.size + 4 * len(ticks) + _COLUMN_ENTRY.size * len(COLUMNS)
+    table = []
+    for payload in payloads:
+        table.append(_COLUMN_ENTRY.pack(offset, len(payload)))
+        offset += len(payload)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, CODECS[codec], INDEX_UNITS[unit], len(ticks)))
+        f.write(ticks.astype(np.int32).tobytes())
+        f.write(b"".join(table))
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_bars(path: str, start_date=None, end_date=None, tail: int = None, as_float: bool = True) -> pd.DataFrame:
+    """Memory-maps a bar file and decodes it into NumPy-backed OHLCV columns.
+
+    Args:
+        path (str): File written by write_bars.
+        start_date, end_date (optional): Inclusive date range, located with a binary search on
+                                         the memory-mapped date index.
+        tail (int, optional): Keep only the last `tail` bars of the range.
+        as_float (bool): Return float64 columns like load_ohlcv (True) or the stored int32/int64.
+
+    Returns:
+        pd.DataFrame: OHLCV with a DatetimeIndex.
+    """
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, codec_id, unit_seconds, rows = _HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a bar file.")
+    codec = {v: k for k, v in CODECS.items()}[codec_id]
+
+    ticks = np.frombuffer(mm, dtype=np.int32, count=rows, offset=_HEADER.size)
+    unit_ns = np.int64(unit_seconds) * 10**9
+    lo, hi = 0, rows
+    if start_date is not None:
+        lo = int(np.searchsorted(ticks, pd.Timestamp(start_date).value // unit_ns, side="left"))
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        if end == end.normalize() and unit_seconds < INDEX_UNITS["D"]:
+            end += pd.Timedelta(days=1) - pd.Timedelta(seconds=unit_seconds) # Whole end day for intraday bars
+        hi = int(np.searchsorted(ticks, end.value // unit_ns, side="right"))
+    if tail is not None:
+        lo = max(lo, hi - int(tail))
+
+    columns = {}
+    table_offset = _HEADER.size + 4 * rows
+    for i, column in enumerate(COLUMNS):
+        offset, size = _COLUMN_ENTRY.unpack_from(mm, table_offset + i * _COLUMN_ENTRY.size)
+        # Deltas are cumulative, so decode the column prefix up to the end of the range (and no further)
+        values = _decode_column(mm[offset:offset + size], hi, COLUMN_DTYPES[column], codec)[lo:hi]
+        columns[column] = values.astype(np.float64) if as_float else values
+
+    index = pd.DatetimeIndex(ticks[lo:hi].astype(np.int64) * unit_ns)
+    return pd.DataFrame(columns, index=index)
+
+
+class BarStore:
+    """Directory of per-ticker bar files used as the data store's on-disk cache."""
+
+    def __init__(self, directory: str = BAR_CACHE_DIR, codec: str = None):
+        self.directory = directory
+        self.codec = codec or BAR_CACHE_CODEC
+        self.rejected = set() # Tickers whose bars cannot be stored compactly (e.g. adjusted prices)
+
+    def path(self, code: str) -> str:
+        return os.path.join(self.directory, f"{code}.bars")
+
+    def has(self, code: str) -> bool:
+        return os.path.isfile(self.path(code))
+
+    def get(self, code: str, start_date=None, end_date=None, tail: int = None):
+        """Returns the cached bars (None on a miss or an unreadable file)."""
+        if not self.has(code):
+            return None
+        try:
+            return read_bars(self.path(code), start_date, end_date, tail)
+        except Exception as e:
+            print(f"Failed to read cached bars for {code}: {e}") # Log the error
+            return None
+
+    def put(self, code: str, data: pd.DataFrame) -> bool:
+        """Caches the full history of one ticker. Returns False if it cannot be stored compactly."""
+        try:
+            write_bars(self.path(code), data, self.codec)
+            return True
+        except ValueError:
+            self.rejected.add(code)
+            return False
+        except Exception as e:
+            print(f"Failed to cache bars for {code}: {e}") # Log the error
+            return False
+
+    def invalidate(self, tickers: list = None):
+        """Drops the files of `tickers` (None drops every cached ticker)."""
+        if tickers is None:
+            self.rejected.clear()
+        else:
+            self.rejected.difference_update(tickers)
+        if not os.path.isdir(self.directory):
+            return
+        names = [f"{code}.bars" for code in tickers] if tickers is not None else os.listdir(self.directory)
+        for name in names:
+            if name.endswith(".bars") and os.path.isfile(os.path.join(self.directory, name)):
+                os.remove(os.path.join(self.directory, name))
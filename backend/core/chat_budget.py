@@ -0,0 +1,85 @@
+# /home/ubuntu/backtest_app/backend/core/chat_budget.py
+import functools
+import os
+
+try:
+    import tiktoken
+except ImportError: # Optional: fall back to a conservative character-based estimate
+    tiktoken = None
+
+# Prompt tokens allowed per request (system prompt + summary + history + new message); the reply comes on top
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "12000"))
+# Old messages are dropped this many at a time, so the kept history (and with it the cached
+# prompt prefix) stays the same for several requests instead of shifting every turn
+TRIM_BLOCK_MESSAGES = max(1, int(os.getenv("LLM_TRIM_BLOCK_MESSAGES", "6")))
+
+# gpt-4o estimate for one high-detail image (~1024px)
+IMAGE_TOKENS = 765
+# Role / separator tokens the API adds per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base") # gpt-4o family
+    except Exception as e: # e.g. the encoding file cannot be downloaded
+        print(f"Error loading the tiktoken encoding, estimating token counts instead: {e}") # Log the error
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of `text` with tiktoken when installed, otherwise an estimate that errs high
+    (about 4 ASCII characters or 1 non-ASCII character, e.g. a Hangul syllable, per token)."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def message_tokens(message: dict) -> int:
+    """Token estimate of one chat message; content is a string or a list of text / image_url parts."""
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return MESSAGE_OVERHEAD_TOKENS + count_tokens(content)
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    for part in content:
+        if part.get("type") == "image_url":
+            tokens += IMAGE_TOKENS
+        else:
+            tokens += count_tokens(part.get("text", ""))
+    return tokens
+
+
+def fit_history(history: list, fixed_tokens: int, budget: int = LLM_CONTEXT_TOKENS,
+                block: int = TRIM_BLOCK_MESSAGES, reserve_if_trimmed: int = 0):
+    """Splits `history` into (dropped, kept) so the kept messages fit next to the fixed part of the prompt.
+
+    The cut is the smallest multiple of `block` that fits, so as a conversation grows it moves
+    in steps and requests in between share the same prefix.
+
+    Args:
+        history (list): Previous messages, oldest first.
+        fixed_tokens (int): Tokens always sent (system prompt and the new user message).
+        budget (int): Prompt token budget.
+        block (int): Number of messages dropped at a time.
+        reserve_if_trimmed (int): Extra tokens kept free when anything is dropped (for a summary).
+
+    Returns:
+        tuple: (dropped messages, kept messages, estimated tokens of the kept messages).
+    """
+    costs = [message_tokens(message) for message in history]
+    kept_tokens = sum(costs)
+    if fixed_tokens + kept_tokens <= budget:
+        return [], history, kept_tokens
+
+    available = budget - fixed_tokens - reserve_if_trimmed
+    cut = 0
+    while cut < len(history) and kept_tokens > available:
+        step = min(block, len(history) - cut)
+        kept_tokens -= sum(costs[cut:cut + step])
+        cut += step
+    return history[:cut], history[cut:], kept_tokens
@@ -0,0 +1,155 @@
+# /home/ubuntu/backtest_app/backend/core/company_index.py
+import bisect
+import threading
+
+from backend.core.data_store import load_company_list
+
+# 초성 (한글 음절 U+AC00..U+D7A3 = 초성 19 x 중성 21 x 종성 28)
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+_SYLLABLES_PER_CHOSUNG = 21 * 28
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+
+# Match kinds, best first
+MATCH_KINDS = ("exact", "code", "prefix", "chosung_prefix", "substring", "chosung_substring")
+
+
+def normalize(text: str) -> str:
+    """Lower-cases and drops whitespace so "LG 전자" matches "LG전자"."""
+    return "".join(str(text).lower().split())
+
+
+def to_chosung(text: str) -> str:
+    """Replaces every Hangul syllable with its initial consonant: "삼성전자" -> "ㅅㅅㅈㅈ"."""
+    return "".join(
+        CHOSUNG[(ord(ch) - _HANGUL_BASE) // _SYLLABLES_PER_CHOSUNG] if _HANGUL_BASE <= ord(ch) <= _HANGUL_LAST else ch
+        for ch in text
+    )
+
+
+def is_chosung_query(text: str) -> bool:
+    return bool(text) and all(ch in CHOSUNG for ch in text)
+
+
+class _KeyIndex:
+    """Sorted keys for bisect prefix search plus one joined string for str.find substring search."""
+
+    def __init__(self, keys: list):
+        self.sorted = sorted((key, row) for row, key in enumerate(keys))
+        self.blob = "\n".join(keys)
+        self.offsets = []
+        offset = 0
+        for key in keys:
+            self.offsets.append(offset)
+            offset += len(key) + 1
+
+    def prefix(self, query: str):
+        position = bisect.bisect_left(self.sorted, (query,))
+        while position < len(self.sorted) and self.sorted[position][0].startswith(query):
+            yield self.sorted[position][1]
+            position += 1
+
+    def substring(self, query: str):
+        position = self.blob.find(query)
+        while position != -1:
+            row = bisect.bisect_right(self.offsets, position) - 1
+            yield row
+            # Skip to the next key so each row is reported once
+            next_key = self.offsets[row + 1] if row + 1 < len(self.offsets) else len(self.blob)
+            position = self.blob.find(query, next_key)
+
+
+class CompanyIndex:
+    """In-memory company name / code index answering search queries without touching the DB.
+
+    Matches, best first: exact name, ticker code prefix, name prefix, chosung prefix
+    ("ㅅㅅㅈ" -> 삼성전자), name substring, chosung substring. Within a kind shorter names come
+    first. Lookups are bisects over sorted keys and str.find over one joined string.
+    """
+
+    def __init__(self, companies):
+        """
+        Args:
+            companies: DataFrame with 'code' and 'company' columns (data_store.load_company_list).
+        """
+        self.codes = [str(code) for code in companies["code"]]
+        self.names = [str(name) for name in companies["company"]]
+        normalized = [normalize(name) for name in self.names]
+        self._by_exact = {}
+        for row, key in enumerate(normalized):
+            self._by_exact.setdefault(key, row)
+        self._by_code = {code: row for row, code in enumerate(self.codes)}
+        self._names = _KeyIndex(normalized)
+        self._chosung = _KeyIndex([to_chosung(key) for key in normalized])
+        self._code_keys = _KeyIndex(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def get(self, code: str):
+        """Exact ticker code lookup, or None."""
+        row = self._by_code.get(str(code))
+        return None if row is None else {"code": self.codes[row], "company": self.names[row]}
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list:
+        """Returns up to `limit` [{"code", "company", "match"}] for `query`, best matches first."""
+        key = normalize(query)
+        if not key or limit < 1:
+            return []
+
+        results = []
+        seen = set()
+
+        def collect(kind, rows, rank_by_length=True):
+            found = [row for row in rows if row not in seen]
+            if rank_by_length:
+                found.sort(key=lambda row: (len(self.names[row]), self.names[row]))
+            for row in found:
+                if len(results) >= limit:
+                    return
+                seen.add(row)
+                results.append({"code": self.codes[row], "company": self.names[row], "match": kind})
+
+        if key in self._by_exact:
+            collect("exact", [self._by_exact[key]])
+        if key.isdigit():
+            collect("code", self._code_keys.prefix(key), rank_by_length=False)
+        collect("prefix", self._names.prefix(key))
+        if is_chosung_query(key):
+            collect("chosung_prefix", self._chosung.prefix(key))
+        collect("substring", self._names.substring(key))
+        if is_chosung_query(key):
+            collect("chosung_substring", self._chosung.substring(key))
+        return results
+
+
+_company_index = None
+_index_lock = threading.Lock()
+
+
+def get_company_index() -> CompanyIndex:
+    """Returns the process-wide company index, building it from company_info on first use."""
+    global _company_index
+    if _company_index is None:
+        with _index_lock:
+            if _company_index is None:
+                _company_index = CompanyIndex(load_company_list())
+    return _company_index
+
+
+def refresh_company_index() -> int:
+    """Rebuilds the index from company_info (after DBUpdater.update_comp_info).
+
+    The new index is built off to the side and swapped in, so searches never see a partial index.
+
+    Returns:
+        int: Number of companies in the new index.
+    """
+    global _company_index
+    index = CompanyIndex(load_company_list())
+    with _index_lock:
+        _company_index = index
+    return len(index)
@@ -0,0 +1,189 @@
+# /home/ubuntu/backtest_app/backend/core/data_store.py
+import os
+import threading
+import pandas as pd
+import pymysql
+from dotenv import load_dotenv
+
+from backend.core.bar_store import BarStore
+
+# Load environment variables (MariaDB credentials)
+load_dotenv()
+
+# Full per-ticker histories are cached on disk in the compact bar format (core/bar_store.py)
+BAR_CACHE_ENABLED = os.getenv("BAR_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Local MariaDB maintained by DBUpdater (company_info / daily_price tables)
+DB_CONFIG = {
+    'host': os.getenv("MARIA_DB_HOST", "localhost"),
+    'user': os.getenv("MARIA_DB_USER", "stockuser"),
+    'password': os.getenv("MARIA_DB_PASSWORD"),
+    'database': os.getenv("MARIA_DB_NAME"),
+    'port': int(os.getenv("MARIA_DB_PORT", "3307")),
+    'charset': 'utf8mb4'
+}
+
+# daily_price column -> OHLCV column used throughout the backtester
+PRICE_COLUMN_MAP = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume'
+}
+
+
+# Callbacks run after DBUpdater reports new bars: fn(tickers) where tickers is a list or None (all)
+_update_listeners = []
+_listeners_lock = threading.Lock()
+
+
+def get_connection():
+    """Opens a new connection to the local MariaDB data store."""
+    return pymysql.connect(**DB_CONFIG)
+
+
+def load_company_list() -> pd.DataFrame:
+    """Returns every listed company as a DataFrame with 'code' and 'company' columns."""
+    conn = get_connection()
+    try:
+        with conn.cursor() as curs:
+            curs.execute("SELECT code, company FROM company_info ORDER BY code")
+            rows = curs.fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=["code", "company"])
+
+
+def load_ohlcv(code: str, start_date=None, end_date=None) -> pd.DataFrame:
+    """Loads daily OHLCV bars for one ticker from the daily_price table.
+
+    With the bar cache enabled, the first call reads the ticker's full history once, stores
+    it as a compact bar file and every later call is served from the memory-mapped file.
+
+    Args:
+        code (str): Ticker code (e.g., "005930").
+        start_date (str or date, optional): Inclusive start date.
+        end_date (str or date, optional): Inclusive end date.
+
+    Returns:
+        pd.DataFrame: 'Open', 'High', 'Low', 'Close', 'Volume' columns with a sorted
+                      DatetimeIndex. Empty if the ticker has no bars in the range.
+    """
+    if _bar_store is not None and code not in _bar_store.rejected:
+        cached = _bar_store.get(code, start_date, end_date)
+        if cached is not None:
+            return cached
+        history = _query_ohlcv(code)
+        if not history.empty:
+            _bar_store.put(code, history)
+        return history.loc[_date_slice(start_date, end_date)]
+    return _query_ohlcv(code, start_date, end_date)
+
+
+def _date_slice(start_date=None, end_date=None) -> slice:
+    return slice(
+        pd.Timestamp(start_date) if start_date is not None else None,
+        pd.Timestamp(end_date) if end_date is not None else None,
+    )
+
+
+def _query_ohlcv(code: str, start_date=None, end_date=None) -> pd.DataFrame:
+    sql = "SELECT date, open, high, low, close, volume FROM daily_price WHERE code = %s"
+    params = [code]
+    if start_date is not None:
+        sql += " AND date >= %s"
+        params.append(pd.Timestamp(start_date).strftime("%Y-%m-%d"))
+    if end_date is not None:
+        sql += " AND date <= %s"
+        params.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
+    sql += " ORDER BY date"
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as curs:
+            curs.execute(sql, params)
+            rows = curs.fetchall()
+    finally:
+        conn.close()
+
+    return _rows_to_ohlcv(rows)
+
+
+def load_ohlcv_tail(code: str, bars: int, end_date=None) -> pd.DataFrame:
+    """Loads only the last `bars` daily bars of one ticker (up to `end_date` if given).
+
+    Returns:
+        pd.DataFrame: Same layout as load_ohlcv, oldest bar first.
+    """
+    if _bar_store is not None and _bar_store.has(code):
+        cached = _bar_store.get(code, end_date=end_date, tail=bars)
+        if cached is not None:
+            return cached
+
+    sql = "SELECT date, open, high, low, close, volume FROM daily_price WHERE code = %s"
+    params = [code]
+    if end_date is not None:
+        sql += " AND date <= %s"
+        params.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
+    sql += " ORDER BY date DESC LIMIT %s"
+    params.append(int(bars))
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as curs:
+            curs.execute(sql, params)
+            rows = curs.fetchall()
+    finally:
+        conn.close()
+
+    return _rows_to_ohlcv(rows[::-1])
+
+
+def get_latest_date():
+    """Returns the most recent bar date in daily_price (None if the table is empty)."""
+    conn = get_connection()
+    try:
+        with conn.cursor() as curs:
+            curs.execute("SELECT MAX(date) FROM daily_price")
+            result = curs.fetchone()
+    finally:
+        conn.close()
+    return pd.Timestamp(result[0]) if result and result[0] else None
+
+
+def _rows_to_ohlcv(rows) -> pd.DataFrame:
+    df = pd.DataFrame(list(rows), columns=["date", "open", "high", "low", "close", "volume"])
+    df = df.rename(columns=PRICE_COLUMN_MAP)
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop("date")), name=None)
+    return df.astype(float)
+
+
+def register_update_listener(listener):
+    """Registers fn(tickers) to be called when new bars land in the data store."""
+    with _listeners_lock:
+        if listener not in _update_listeners:
+            _update_listeners.append(listener)
+
+
+_bar_store = BarStore() if BAR_CACHE_ENABLED else None
+if _bar_store is not None:
+    register_update_listener(_bar_store.invalidate)
+
+
+def notify_data_updated(tickers: list = None) -> list:
+    """Runs every update listener for `tickers` (None means the whole universe).
+
+    Returns:
+        list: Error messages from listeners that raised (other listeners still run).
+    """
+    with _listeners_lock:
+        listeners = list(_update_listeners)
+    errors = []
+    for listener in listeners:
+        try:
+            listener(tickers)
+        except Exception as e:
+            print(f"Error in data update listener {getattr(listener, '__name__', listener)}: {e}") # Log the error
+            errors.append(f"{getattr(listener, '__name__', listener)}: {e}")
+    return errors
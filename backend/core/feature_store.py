@@ -0,0 +1,191 @@
+# /home/ubuntu/backtest_app/backend/core/feature_store.py
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.core.bar_store import BAR_CACHE_DIR
+from backend.core.data_store import load_ohlcv, load_company_list, register_update_listener
+from backend.core.indicators import (
+    DEFAULT_INDICATORS, compute_indicators, update_indicators, indicator_columns, parse_indicator_specs,
+)
+
+# Materialized indicators are kept next to the cached bar files
+FEATURE_STORE_ENABLED = os.getenv("FEATURE_STORE_ENABLED", "true").lower() not in ("0", "false", "no")
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", BAR_CACHE_DIR)
+# e.g. "SMA:5,SMA:20,EMA:12,RSI:14,DC:20"; defaults to indicators.DEFAULT_INDICATORS
+FEATURE_SPECS = parse_indicator_specs(os.getenv("FEATURE_SPECS", "")) or DEFAULT_INDICATORS
+
+
+def _specs_text(specs: list) -> str:
+    return ",".join(f"{kind}:{period}" for kind, period in specs)
+
+
+class FeatureStore:
+    """Per-ticker indicator columns computed at ingest time and stored as {code}.features.npz.
+
+    Each file holds the dates, the Close the features were computed from and one float64 column
+    per indicator. After new bars arrive only those bars are computed (see
+    indicators.update_indicators); the file is rebuilt from scratch when the spec set changes or
+    the stored closes no longer match the data store (e.g. a price adjustment).
+    """
+
+    def __init__(self, directory: str = FEATURE_STORE_DIR, specs: list = None):
+        self.directory = directory
+        self.specs = specs or FEATURE_SPECS
+        self._lock = threading.Lock()
+
+    def path(self, code: str) -> str:
+        return os.path.join(self.directory, f"{code}.features.npz")
+
+    def load(self, code: str, start_date=None, end_date=None):
+        """Returns the stored features (plus the reference Close) or None if there are none."""
+        if not os.path.isfile(self.path(code)):
+            return None
+        try:
+            with np.load(self.path(code), allow_pickle=False) as stored:
+                if str(stored["specs"]) != _specs_text(self.specs):
+                    return None
+                columns = [str(column) for column in stored["columns"]]
+                frame = pd.DataFrame(stored["values"], index=pd.DatetimeIndex(stored["dates"]), columns=columns)
+                frame["Close"] = stored["close"]
+        except Exception as e:
+            print(f"Failed to read features for {code}: {e}") # Log the error
+            return None
+        return frame.loc[start_date:end_date]
+
+    def _save(self, code: str, features: pd.DataFrame, close: pd.Series):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(code)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                dates=features.index.asi8,
+                close=close.to_numpy(dtype=np.float64),
+                columns=np.array(features.columns, dtype=str),
+                values=features.to_numpy(dtype=np.float64),
+                specs=np.array(_specs_text(self.specs)),
+            )
+        os.replace(tmp_path, self.path(code))
+
+    def update(self, code: str) -> int:
+        """Brings one ticker's features up to date with the data store.
+
+        Returns:
+            int: Number of bars whose features were (re)computed.
+        """
+        bars = load_ohlcv(code)
+        if bars.empty:
+            return 0
+        with self._lock:
+            stored = self.load(code)
+            if stored is not None and not stored.empty:
+                last = stored.index[-1]
+                # Incremental only if the stored history is still the data store's history
+                if last in bars.index and bars.at[last, "Close"] == stored["Close"].iloc[-1]:
+                    previous = stored.drop(columns="Close")
+                    new_rows = update_indicators(previous, bars, self.specs)
+                    if new_rows.empty:
+                        return 0
+                    features = pd.concat([previous, new_rows])
+                    self._save(code, features, bars["Close"].reindex(features.index))
+                    return len(new_rows)
+            self._save(code, compute_indicators(bars, self.specs), bars["Close"])
+            return len(bars)
+
+    def features_for(self, code: str, data: pd.DataFrame):
+        """Stored features aligned to `data`, or None if they do not cover it or its closes differ.
+
+        Features are computed over the ticker's whole history, so long windows are already
+        warmed up on the first bar of `data`.
+        """
+        stored = self.load(code, data.index[0], data.index[-1])
+        if stored is None or len(stored) != len(data) or not stored.index.equals(data.index):
+            return None
+        if not np.allclose(stored["Close"].to_numpy(), data["Close"].to_numpy(dtype=float), equal_nan=True):
+            return None
+        return stored.drop(columns="Close")
+
+
+_feature_store = FeatureStore() if FEATURE_STORE_ENABLED else None
+
+# Background ingest pipeline: tickers waiting for a feature update (_pending_all means every ticker)
+_pending = set()
+_pending_all = False
+_pipeline_lock = threading.Lock()
+_pipeline_thread = None
+
+
+def get_feature_store():
+    """Returns the process-wide feature store (None if FEATURE_STORE_ENABLED is off)."""
+    return _feature_store
+
+
+def load_features(code: str, data: pd.DataFrame, specs: list = None, return_source: bool = False):
+    """Indicator columns for `data` of ticker `code`, from the feature store when it covers them.
+
+    Falls back to compute_indicators(data) when the store is disabled, not built yet for the
+    ticker, or holds different closes (e.g. data from another source). The two can differ on
+    the first bars of `data`: stored features are warmed up on the whole history, computed
+    ones only on `data`.
+
+    Returns:
+        pd.DataFrame: The indicator columns, or with `return_source` a tuple
+                      (indicators, "feature_store" or "computed").
+    """
+    if _feature_store is not None and code and (specs is None or set(specs) <= set(_feature_store.specs)):
+        features = _feature_store.features_for(code, data)
+        if features is not None:
+            if specs is not None:
+                features = features[[column for kind, period in specs for column in indicator_columns(kind, period)]]
+            return (features, "feature_store") if return_source else features
+    features = compute_indicators(data, specs)
+    return (features, "computed") if return_source else features
+
+
+def _run_pipeline():
+    global _pending_all, _pipeline_thread
+    while True:
+        with _pipeline_lock:
+            if _pending_all:
+                _pending_all = False
+                _pending.clear()
+                codes = None
+            elif _pending:
+                codes = sorted(_pending)
+                _pending.clear()
+            else:
+                _pipeline_thread = None
+                return
+        if codes is None:
+            try:
+                codes = load_company_list()["code"].tolist()
+            except Exception as e:
+                print(f"Error listing tickers for the feature update: {e}") # Log the error
+                continue
+        for code in codes:
+            try:
+                _feature_store.update(code)
+            except Exception as e:
+                print(f"Error updating features for {code}: {e}") # Log the error
+
+
+def schedule_feature_update(tickers: list = None):
+    """Data update listener: recomputes the features of `tickers` in a background thread."""
+    global _pending_all, _pipeline_thread
+    if _feature_store is None:
+        return
+    with _pipeline_lock:
+        if tickers is None:
+            _pending_all = True
+        else:
+            _pending.update(tickers)
+        if _pipeline_thread is None:
+            # 데이터 갱신 요청은 바로 반환하고 계산은 백그라운드에서 진행
+            _pipeline_thread = threading.Thread(target=_run_pipeline, daemon=True)
+            _pipeline_thread.start()
+
+
+# Registered after the bar cache invalidation (data_store import), so updates read fresh bars
+register_update_listener(schedule_feature_update)
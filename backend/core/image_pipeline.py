@@ -0,0 +1,147 @@
+# /home/ubuntu/backtest_app/backend/core/image_pipeline.py
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Without Pillow images are passed through unchanged, with their real MIME type
+    Image = ImageOps = None
+
+# Largest accepted upload
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+# gpt-4o high-detail input: the image is fit into 2048 x 2048 and then scaled so the short side
+# is at most 768 px; anything larger is downscaled by the API anyway, so we send at most this
+MAX_LONG_SIDE = 2048
+MAX_SHORT_SIDE = 768
+# "WEBP" or "JPEG"; both keep chart lines and labels readable at this quality
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "WEBP").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+# Processed images kept in memory, keyed by the SHA-256 of the uploaded bytes
+IMAGE_CACHE_ENTRIES = 64
+
+# Formats the OpenAI API accepts as-is
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "GIF": "image/gif"}
+# Sources that are likely screenshots (no lossy artifacts), also tried as lossless PNG
+LOSSLESS_SOURCES = ("PNG", "GIF", "BMP")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def detect_format(data: bytes):
+    """Image format from the file signature ("PNG", "JPEG", "WEBP", "GIF", "BMP"), or None."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if data.startswith(b"BM"):
+        return "BMP"
+    return None
+
+
+def target_size(width: int, height: int) -> tuple:
+    """Size after fitting into MAX_LONG_SIDE and MAX_SHORT_SIDE, keeping the aspect ratio (never upscales)."""
+    scale = min(1.0, MAX_LONG_SIDE / max(width, height), MAX_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _save(image, image_format: str) -> bytes:
+    out = io.BytesIO()
+    if image_format == "PNG":
+        image.save(out, format="PNG", compress_level=6)
+    elif image_format == "WEBP":
+        image.save(out, format="WEBP", quality=IMAGE_QUALITY, method=4)
+    else:
+        image.save(out, format="JPEG", quality=IMAGE_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def _encode(data: bytes, source_format: str) -> dict:
+    if Image is None:
+        if source_format not in MIME_TYPES:
+            raise ValueError(f"{source_format} images need Pillow to be converted (pip install Pillow).")
+        return {"data": data, "mime": MIME_TYPES[source_format], "format": source_format, "width": None, "height": None}
+
+    with Image.open(io.BytesIO(data)) as image:
+        original_size = image.size
+        # The API rejects animated GIFs, so those are always re-encoded (first frame)
+        animated = getattr(image, "is_animated", False)
+        if source_format == "JPEG":
+            # Let the decoder downscale by 1/2, 1/4 or 1/8 while decoding (square: EXIF may rotate it)
+            side = max(target_size(*original_size))
+            image.draft("RGB", (side, side))
+        image = ImageOps.exif_transpose(image)
+        size = target_size(*image.size)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        if image.size != size:
+            image = image.resize(size, Image.LANCZOS, reducing_gap=3.0) # Box-reduce first, then Lanczos
+        if image.mode == "RGBA":
+            # Flatten transparency onto white (charts are drawn on light backgrounds)
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+
+        candidates = [(IMAGE_OUTPUT_FORMAT, _save(image, IMAGE_OUTPUT_FORMAT))]
+        if source_format in LOSSLESS_SOURCES:
+            # Screenshots of charts (flat colors, thin lines) are often smaller as lossless PNG
+            candidates.append(("PNG", _save(image, "PNG")))
+
+    # A small image already in an accepted format can be smaller than its re-encoding
+    if source_format in MIME_TYPES and not animated and size == original_size:
+        candidates.append((source_format, data))
+    output_format, encoded = min(candidates, key=lambda candidate: len(candidate[1]))
+    return {"data": encoded, "mime": MIME_TYPES[output_format], "format": output_format,
+            "width": size[0], "height": size[1]}
+
+
+def prepare_image(data: bytes) -> dict:
+    """Detects, downscales and re-encodes an uploaded chart image for the vision model.
+
+    Results are cached by the SHA-256 of `data`, so a re-sent image is not decoded again.
+
+    Returns:
+        dict: {"data": bytes, "mime": str, "format", "width", "height", "original_bytes", "bytes", "sha256"}.
+
+    Raises:
+        ValueError: If the data is empty, too large, not an image or cannot be decoded.
+    """
+    if not data:
+        raise ValueError("Empty image data")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"Image is larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+    source_format = detect_format(data)
+    if source_format is None:
+        raise ValueError("Unsupported image format (PNG, JPEG, WebP, GIF or BMP expected)")
+
+    key = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    try:
+        result = _encode(data, source_format)
+    except ValueError:
+        raise
+    except Exception as e: # Truncated or corrupt files, decompression bombs
+        raise ValueError(f"Could not decode the {source_format} image: {e}")
+    result.update(original_bytes=len(data), bytes=len(result["data"]), sha256=key)
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > IMAGE_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return result
+
+
+def to_data_url(image: dict) -> str:
+    """data: URL for a prepare_image result, with its real MIME type."""
+    return f"data:{image['mime']};base64,{base64.b64encode(image['data']).decode('ascii')}"
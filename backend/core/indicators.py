@@ -0,0 +1,117 @@
+# /home/ubuntu/backtest_app/backend/core/indicators.py
+import pandas as pd
+
+# Indicators most saved strategies recompute: (kind, period)
+DEFAULT_INDICATORS = [
+    ("SMA", 5), ("SMA", 20), ("SMA", 50), ("SMA", 60), ("SMA", 120), ("SMA", 200),
+    ("EMA", 12), ("EMA", 26),
+    ("RSI", 14),
+    ("DC", 20),
+]
+
+
+def sma(close, period: int):
+    """Simple moving average (min_periods=1, as in the chart and SMA strategies)."""
+    return close.rolling(window=period, min_periods=1).mean()
+
+
+def ema(close, period: int):
+    """Exponential moving average with adjust=False (recursive form used by the MACD strategies)."""
+    return close.ewm(span=period, adjust=False).mean()
+
+
+def rsi(close, period: int):
+    """RSI from rolling-mean gains/losses, matching RSI_14.py."""
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).rolling(window=period, min_periods=period).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(window=period, min_periods=period).mean()
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def donchian(high, low, period: int):
+    """Donchian channel (upper, lower) with min_periods=period, matching Donchain.py."""
+    upper = high.rolling(window=period, min_periods=period).max()
+    lower = low.rolling(window=period, min_periods=period).min()
+    return upper, lower
+
+
+def indicator_columns(kind: str, period: int) -> list:
+    """Column names produced for one indicator spec."""
+    if kind == "DC":
+        return [f"DC_HIGH_{period}", f"DC_LOW_{period}"]
+    return [f"{kind}_{period}"]
+
+
+def compute_indicators(data: pd.DataFrame, specs: list = None) -> pd.DataFrame:
+    """Computes a set of common indicators once for a OHLCV DataFrame.
+
+    Args:
+        data (pd.DataFrame): OHLCV data with DatetimeIndex.
+        specs (list, optional): [(kind, period), ...] with kind in SMA/EMA/RSI/DC.
+                                Defaults to DEFAULT_INDICATORS.
+
+    Returns:
+        pd.DataFrame: Indicator columns (e.g. "SMA_20", "EMA_12", "RSI_14",
+                      "DC_HIGH_20", "DC_LOW_20") on the same index as `data`.
+    """
+    columns = {}
+    for kind, period in specs or DEFAULT_INDICATORS:
+        if kind == "SMA":
+            columns[f"SMA_{period}"] = sma(data["Close"], period)
+        elif kind == "EMA":
+            columns[f"EMA_{period}"] = ema(data["Close"], period)
+        elif kind == "RSI":
+            columns[f"RSI_{period}"] = rsi(data["Close"], period)
+        elif kind == "DC":
+            columns[f"DC_HIGH_{period}"], columns[f"DC_LOW_{period}"] = donchian(data["High"], data["Low"], period)
+        else:
+            raise ValueError(f"Unknown indicator kind: {kind}")
+    return pd.DataFrame(columns, index=data.index)
+
+
+def parse_indicator_specs(text: str) -> list:
+    """Parses "SMA:20,EMA:12,DC:20" into [("SMA", 20), ("EMA", 12), ("DC", 20)]."""
+    specs = []
+    for item in text.split(","):
+        if item.strip():
+            kind, period = item.strip().split(":")
+            specs.append((kind.strip().upper(), int(period)))
+    return specs
+
+
+def warmup_bars(specs: list = None) -> int:
+    """Bars of history a window indicator needs before the first bar it updates."""
+    return max((period for kind, period in specs or DEFAULT_INDICATORS if kind != "EMA"), default=0) + 1
+
+
+def update_indicators(previous: pd.DataFrame, data: pd.DataFrame, specs: list = None) -> pd.DataFrame:
+    """Computes indicator rows only for the bars of `data` after the last row of `previous`.
+
+    Window indicators (SMA/RSI/DC) are evaluated on the last warmup_bars(specs) bars before
+    the new ones plus the new bars. EMAs continue their recursion from the last stored value,
+    so they stay identical to a full recomputation.
+
+    Args:
+        previous (pd.DataFrame): Indicator rows already computed (compute_indicators output).
+        data (pd.DataFrame): Full OHLCV history, including the new bars.
+        specs (list, optional): Same specs `previous` was computed with.
+
+    Returns:
+        pd.DataFrame: Indicator rows for the new bars only (empty if there are none).
+    """
+    specs = specs or DEFAULT_INDICATORS
+    new_start = data.index.searchsorted(previous.index[-1], side="right") if len(previous) else 0
+    if new_start >= len(data):
+        return compute_indicators(data.iloc[0:0], specs)
+    if new_start == 0:
+        return compute_indicators(data, specs)
+
+    context = data.iloc[max(0, new_start - warmup_bars(specs)):]
+    rows = compute_indicators(context, [spec for spec in specs if spec[0] != "EMA"]).iloc[-(len(data) - new_start):]
+    new_close = data["Close"].iloc[new_start:]
+    for kind, period in specs:
+        if kind == "EMA":
+            seeded = pd.concat([pd.Series([previous[f"EMA_{period}"].iloc[-1]]), new_close])
+            rows[f"EMA_{period}"] = seeded.ewm(span=period, adjust=False).mean().iloc[1:].to_numpy()
+    return rows[[column for kind, period in specs for column in indicator_columns(kind, period)]]
+
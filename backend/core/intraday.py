@@ -0,0 +1,253 @@
+# /home/ubuntu/backtest_app/backend/core/intraday.py
+import os
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+from backend.core.backtesting import (
+    _LongOnlyEngine, _build_metrics, annualization_factor, generate_signal_series, StrategyError,
+)
+from backend.core.signal_scanner import estimate_lookback
+
+# Rows read from the file per chunk; memory use is bounded by this, not by the file size
+DEFAULT_CHUNK_ROWS = 250_000
+# Minute-bar files are looked up under this directory by the API
+INTRADAY_DATA_DIR = os.getenv(
+    "INTRADAY_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "intraday")
+)
+# Column names accepted for the bar timestamp (first match wins)
+TIMESTAMP_COLUMNS = ["datetime", "timestamp", "time", "date"]
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _normalize_chunk(chunk: pd.DataFrame, ticker_column: str = None) -> pd.DataFrame:
+    """Maps a raw file chunk to OHLCV columns with a DatetimeIndex (plus the ticker column)."""
+    chunk = chunk.rename(columns={column: column.lower() for column in chunk.columns})
+    lowered = [column.lower() for column in OHLCV_COLUMNS]
+    missing = [column for column in lowered if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns in bar file: {missing}")
+
+    if "date" in chunk.columns and "time" in chunk.columns:
+        stamps = pd.to_datetime(chunk["date"].astype(str) + " " + chunk["time"].astype(str))
+    else:
+        column = next((c for c in TIMESTAMP_COLUMNS if c in chunk.columns), None)
+        if column is None:
+            raise ValueError(f"Bar file needs one of the timestamp columns {TIMESTAMP_COLUMNS}")
+        stamps = pd.to_datetime(chunk[column])
+
+    frame = chunk[lowered].astype(float)
+    frame.columns = OHLCV_COLUMNS
+    if ticker_column:
+        frame[ticker_column] = chunk[ticker_column.lower()].astype(str).to_numpy()
+    frame.index = pd.DatetimeIndex(stamps, name=None)
+    return frame
+
+
+def iter_bar_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, ticker_column: str = None):
+    """Streams a minute-bar CSV or Parquet file as normalized OHLCV chunks.
+
+    Rows must be in time order (per ticker if `ticker_column` is given). Parquet files are
+    read batch by batch through pyarrow, CSV files through pandas' chunked reader, so the
+    whole file is never loaded.
+
+    Yields:
+        pd.DataFrame: At most `chunk_rows` bars.
+    """
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet bar files requires pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield _normalize_chunk(batch.to_pandas(), ticker_column)
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield _normalize_chunk(chunk, ticker_column)
+
+
+class _StreamingEquityStats:
+    """Drawdown and bar-return moments of an equity curve that arrives in chunks."""
+
+    def __init__(self):
+        self.peak = -np.inf
+        self.max_drawdown = 0.0
+        self.last = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, equity: np.ndarray):
+        if len(equity) == 0:
+            return
+        running_peak = np.maximum(np.maximum.accumulate(equity), self.peak)
+        self.max_drawdown = min(self.max_drawdown, float((equity / running_peak - 1).min()))
+        self.peak = running_peak[-1]
+
+        values = equity if self.last is None else np.concatenate(([self.last], equity))
+        bar_returns = values[1:] / values[:-1] - 1
+        bar_returns = bar_returns[~np.isnan(bar_returns)]
+        self.last = equity[-1]
+        if len(bar_returns) == 0:
+            return
+        # Chan et al. parallel update of mean / sum of squared deviations
+        count = self.count + len(bar_returns)
+        chunk_mean = bar_returns.mean()
+        delta = chunk_mean - self.mean
+        self.m2 += ((bar_returns - chunk_mean) ** 2).sum() + delta ** 2 * self.count * len(bar_returns) / count
+        self.mean += delta * len(bar_returns) / count
+        self.count = count
+
+    def sharpe_ratio(self, risk_free_rate: float, periods_per_year: float) -> float:
+        if self.count < 2:
+            return np.nan
+        std = np.sqrt(self.m2 / (self.count - 1))
+        if std == 0:
+            return np.nan
+        return (self.mean - risk_free_rate / periods_per_year) / std * np.sqrt(periods_per_year)
+
+
+class ChunkedBacktest:
+    """Runs one strategy over bars fed in chunks, with memory bounded by chunk size + lookback.
+
+    The engine's cash/position state and the equity statistics carry over between chunks.
+    Each chunk is evaluated together with the last `lookback` bars of the previous one, so
+    rolling-window indicators see the same history they would in a single pass. EWM state is
+    not carried over: an EWM restarts on that tail, which covers EWM_WARMUP_FACTOR spans
+    when the lookback is estimated, so its values only approximate a single pass (the
+    remaining weight of older bars is about e^-8 with the default factor of 4). Strategies
+    that loop over the rows in Python and declare no `LOOKBACK = <bars>` (see
+    signal_scanner.estimate_lookback) keep the whole history, so their memory is not bounded.
+    """
+
+    def __init__(self, strategy_code: str = None, initial_capital: float = 1000000.0, stop_loss_pct: float = 5.0,
+                 trade_fee_pct: float = 0.001, sell_tax_pct: float = 0.2, lookback: int = None,
+                 periods_per_year: float = None, risk_free_rate: float = 0.02):
+        self.strategy_code = strategy_code
+        self.initial_capital = initial_capital
+        # None: the strategy needs the full history
+        self.lookback = lookback or (estimate_lookback(strategy_code) if strategy_code else 1)
+        self.periods_per_year = periods_per_year
+        self.risk_free_rate = risk_free_rate
+        self.engine = _LongOnlyEngine(initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct)
+        self.equity_stats = _StreamingEquityStats()
+        self.first_bar = None
+        self.last_bar = None
+        self._tail = None
+        self._last_close = np.nan
+
+    def feed(self, chunk: pd.DataFrame):
+        """Processes the next bars (in time order)."""
+        if chunk.empty:
+            return
+        chunk = chunk[OHLCV_COLUMNS]
+        if self.periods_per_year is None:
+            self.periods_per_year = annualization_factor(chunk.index)
+
+        if self.strategy_code:
+            context = chunk if self._tail is None else pd.concat([self._tail, chunk])
+            signals = generate_signal_series(context, self.strategy_code).iloc[len(context) - len(chunk):]
+            self._tail = context if self.lookback is None else context.iloc[-self.lookback:]
+        else:
+            # Default Strategy: Buy and Hold from the very first bar
+            signals = pd.Series("hold", index=chunk.index)
+            if self.first_bar is None:
+                signals.iloc[0] = "buy"
+
+        closes = chunk["Close"].to_numpy(dtype=float)
+        equity = self.engine.run(closes.tolist(), (signals == "buy").to_numpy().tolist(),
+                                 (signals == "sell").to_numpy().tolist())
+        self.equity_stats.update(np.asarray(equity))
+        self._last_close = closes[-1]
+        self.first_bar = chunk.index[0] if self.first_bar is None else self.first_bar
+        self.last_bar = chunk.index[-1]
+
+    def result(self) -> dict:
+        """Closes any open position at the last close and returns the metrics."""
+        if self.first_bar is None:
+            return {"error": "Input data is empty."}
+        self.engine.close_open_position(self._last_close)
+        stats = self.equity_stats
+        metrics = _build_metrics(
+            self.engine.profit_losses,
+            self.engine.returns,
+            stats.last,
+            self.initial_capital,
+            stats.max_drawdown * 100,
+            stats.sharpe_ratio(self.risk_free_rate, self.periods_per_year),
+        )
+        holding_bars = self.engine.holding_bars
+        metrics["avg_holding_bars"] = round(sum(holding_bars) / len(holding_bars), 1) if holding_bars else None
+        return {
+            "metrics": metrics,
+            "bars": self.engine.bars_seen,
+            "start": str(self.first_bar),
+            "end": str(self.last_bar),
+            "periods_per_year": self.periods_per_year,
+        }
+
+
+def run_intraday_backtest(path: str, strategy_code: str = None, engine_args: tuple = (), ticker_column: str = None,
+                          chunk_rows: int = DEFAULT_CHUNK_ROWS, lookback: int = None) -> dict:
+    """Backtests a minute-bar file chunk by chunk (metrics only).
+
+    Args:
+        path (str): CSV or Parquet file with a timestamp column and open/high/low/close/volume.
+        strategy_code (str, optional): Strategy code as for run_backtest (buy-and-hold if None).
+        engine_args (tuple): (initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct).
+        ticker_column (str, optional): Column holding the ticker when one file has many names.
+        chunk_rows (int): Rows per chunk.
+        lookback (int, optional): Bars of history carried into each chunk for the strategy.
+
+    Returns:
+        dict: {ticker: {"metrics", "bars", "start", "end", "periods_per_year"} or {"error"}}.
+              Without `ticker_column` the single key is the file name without extension.
+    """
+    default_ticker = os.path.splitext(os.path.basename(path))[0]
+    runs = {}
+    failed = {}
+    for chunk in iter_bar_chunks(path, chunk_rows, ticker_column):
+        groups = chunk.groupby(ticker_column, sort=False) if ticker_column else [(default_ticker, chunk)]
+        for ticker, bars in groups:
+            if ticker in failed:
+                continue
+            if ticker not in runs:
+                runs[ticker] = ChunkedBacktest(strategy_code, *engine_args, lookback=lookback)
+            try:
+                runs[ticker].feed(bars)
+            except StrategyError as e:
+                failed[ticker] = {"error": str(e)}
+                del runs[ticker]
+
+    results = {ticker: run.result() for ticker, run in runs.items()}
+    results.update(failed)
+    return results
+
+
+def _run_file(path: str, strategy_code: str, engine_args: tuple, ticker_column: str, chunk_rows: int, lookback: int) -> dict:
+    """Worker task: one file, errors reported per file instead of failing the whole batch."""
+    try:
+        return run_intraday_backtest(path, strategy_code, engine_args, ticker_column, chunk_rows, lookback)
+    except Exception as e:
+        return {os.path.splitext(os.path.basename(path))[0]: {"error": f"{type(e).__name__}: {e}"}}
+
+
+def run_intraday_files(paths: list, strategy_code: str = None, engine_args: tuple = (), ticker_column: str = None,
+                       chunk_rows: int = DEFAULT_CHUNK_ROWS, lookback: int = None, max_workers: int = None) -> dict:
+    """Backtests many minute-bar files in parallel worker processes (one file per task).
+
+    Returns:
+        dict: {ticker: result} merged over all files (see run_intraday_backtest).
+    """
+    results = {}
+    workers = min(max_workers or os.cpu_count(), len(paths)) or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_run_file, path, strategy_code, engine_args, ticker_column, chunk_rows, lookback)
+            for path in paths
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            results.update(future.result())
+    return results
@@ -1,9 +1,19 @@
 # /home/ubuntu/backtest_app/backend/core/llm_service.py
 import os
+import json
+import time
+import hashlib
+import textwrap
+import threading
+from collections import OrderedDict
+
 import openai
-import base64
 from dotenv import load_dotenv
 
+from backend.core.chat_budget import LLM_CONTEXT_TOKENS, fit_history, message_tokens
+from backend.core.image_pipeline import prepare_image, to_data_url
+from backend.core.strategy_validation import SAMPLE_ROWS, extract_strategy_code, validate_strategy_code
+
 # Load environment variables (especially OPENAI_API_KEY)
 # load_dotenv(dotenv_path="/backend/.env")
 load_dotenv()
@@ -17,44 +27,23 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 # MODEL = "gpt-4-turbo" # Or "gpt-4-vision-preview" if using images
 # MODEL ="gpt-4o" # Use gpt-4o as it supports both text and image
 MODEL ="gpt-4o" # Use gpt-4o as it supports both text and image
+MAX_OUTPUT_TOKENS = 1500
+REQUEST_TIMEOUT_S = 120
 
-def get_llm_response(chat_history: list, user_message: str, image_data: bytes = None) -> dict:
-    """Gets a response from the LLM based on chat history, user message, and optional image.
-
-    Args:
-        chat_history (list): List of previous messages, e.g., [{\"role\": \"user\", \"content\": \"...\"}, {\"role\": \"assistant\", \"content\": \"...\"}].
-        user_message (str): The latest message from the user.
-        image_data (bytes, optional): Binary image data if provided.
+# Messages trimmed by the token budget are replaced by a short summary (one extra call per trim step)
+LLM_SUMMARIZE_HISTORY = os.getenv("LLM_SUMMARIZE_HISTORY", "true").lower() not in ("0", "false", "no")
+LLM_SUMMARY_MODEL = os.getenv("LLM_SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_MAX_TOKENS = 400
+MAX_CACHED_SUMMARIES = 128
 
-    Returns:
-        dict: {\"response\": str} or {\"error\": str}.
-    """
-    if not openai.api_key:
-        return {"error": "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable."}
+# generate_signals code in a response is run on a sample fixture; failures are sent back to the
+# model for up to this many repair rounds, and only code that passes is returned as `code`
+LLM_VALIDATE_CODE = os.getenv("LLM_VALIDATE_CODE", "true").lower() not in ("0", "false", "no")
+LLM_MAX_REPAIR_ROUNDS = int(os.getenv("LLM_MAX_REPAIR_ROUNDS", "2"))
 
-    messages = chat_history.copy()
-    
-    # Prepare content: Add user text and image if present
-    content_list = [{"type": "text", "text": user_message}]
-    if image_data:
-        try:
-            # Encode image to base64
-            base64_image = base64.b64encode(image_data).decode("utf-8")
-            content_list.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}" # Assuming JPEG, adjust if needed
-                }
-            })
-        except Exception as e:
-            return {"error": f"Failed to process image data: {e}"}
-            
-    messages.append({"role": "user", "content": content_list})
-
-    # Add a system prompt to guide the LLM
-    system_prompt = {
-                    "role": "system",
-                    "content": """
+# The system prompt is one constant string sent first on every request, so the provider can serve
+# it from its prompt cache (prefix caching needs byte-identical leading messages)
+SYSTEM_PROMPT = textwrap.dedent("""
                     ### Conversation Protocol (ENHANCED)
                     1. **Clarify**  
                     - 시작 시, 아래 “Required Parameters” 중 누락된 항목을 `❓` 접두사로 질문합니다.  
@@ -145,31 +134,351 @@ def get_llm_response(chat_history: list, user_message: str, image_data: bytes =
                         def generate_signals(data):
                             # Your code here
                         ```        
-                    """
-                    }
-    
-    # Prepend system prompt if not already in history (or adjust as needed)
-    if not any(msg["role"] == "system" for msg in messages):
-        messages.insert(0, system_prompt)
-    # Or always ensure the latest system prompt is used
-    # messages = [system_prompt] + [msg for msg in chat_history if msg["role"] != "system"] + [messages[-1]]
+                    """).strip()
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of a conversation between a user and a trading strategy assistant. "
+    "Keep the agreed entry/exit conditions, parameter values, open questions and the name of any "
+    "generated function. Write in the user's language, at most 10 short bullet points."
+)
+
+REPAIR_PROMPT = (
+    "The generate_signals code above failed automatic validation on a {rows}-row sample OHLCV DataFrame:\n"
+    "{errors}\n"
+    "Fix these problems and keep the strategy logic. Reply with only the corrected function in one "
+    "```python code block, without import statements."
+)
+
+_client = None
+_client_api_key = None
+_client_lock = threading.Lock()
+
+_summaries = OrderedDict()
+_summaries_lock = threading.Lock()
+
+
+def get_client() -> openai.OpenAI:
+    """Returns the process-wide OpenAI client.
+
+    The client keeps one pooled HTTP connection set and is safe to share between request threads.
+    It is rebuilt only when openai.api_key changes. OPENAI_BASE_URL is read from the environment.
+    """
+    global _client, _client_api_key
+    with _client_lock:
+        if _client is None or _client_api_key != openai.api_key:
+            _client = openai.OpenAI(api_key=openai.api_key, timeout=REQUEST_TIMEOUT_S)
+            _client_api_key = openai.api_key
+        return _client
+
+
+def _clean_history(chat_history: list, user_message: str) -> list:
+    """Keeps the role/content of user and assistant messages (the system prompt is always ours).
+
+    The frontend appends the new message to its history before sending it, so a trailing copy of
+    `user_message` is dropped instead of being sent twice.
+    """
+    history = [
+        {"role": message["role"], "content": message["content"]}
+        for message in chat_history
+        if isinstance(message, dict) and message.get("role") in ("user", "assistant") and message.get("content")
+    ]
+    if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+        history.pop()
+    return history
+
+
+def _summarize_history(messages: list):
+    """Summary of trimmed messages, cached by their content (the trim point moves in blocks, so one
+    summary serves several requests). Returns None if the summary call fails."""
+    transcript = "\n\n".join(
+        f"{message['role']}: {message['content'] if isinstance(message['content'], str) else json.dumps(message['content'], ensure_ascii=False)}"
+        for message in messages
+    )
+    key = hashlib.sha1(transcript.encode("utf-8")).hexdigest()
+    with _summaries_lock:
+        if key in _summaries:
+            _summaries.move_to_end(key)
+            return _summaries[key]
 
     try:
-        client = openai.OpenAI() # Initialize client inside function if key might change or for thread safety
-        completion = client.chat.completions.create(
+        completion = get_client().chat.completions.create(
+            model=LLM_SUMMARY_MODEL,
+            messages=[{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": transcript}],
+            max_tokens=SUMMARY_MAX_TOKENS,
+        )
+        summary = completion.choices[0].message.content
+    except Exception as e:
+        print(f"Error summarizing chat history, trimming only: {e}") # Log the error
+        return None
+
+    with _summaries_lock:
+        _summaries[key] = summary
+        while len(_summaries) > MAX_CACHED_SUMMARIES:
+            _summaries.popitem(last=False)
+    return summary
+
+
+def _build_messages(chat_history: list, user_message: str, image_data: bytes = None):
+    """Builds the chat.completions message list within the prompt token budget.
+
+    Order: SYSTEM_MESSAGE, summary of trimmed messages (if any), kept history, new user turn.
+
+    Returns:
+        tuple: (messages, context) - context reports the history sent/dropped, the
+               estimated prompt tokens and the prepared image.
+
+    Raises:
+        ValueError: If the image data cannot be encoded.
+    """
+    history = _clean_history(chat_history, user_message)
+
+    # Prepare content: Add user text and image if present
+    content_list = [{"type": "text", "text": user_message}]
+    image = None
+    if image_data:
+        try:
+            # Downscaled to the model's input resolution and re-encoded (cached by content hash)
+            image = prepare_image(image_data)
+        except ValueError as e:
+            raise ValueError(f"Failed to process image data: {e}")
+        content_list.append({"type": "image_url", "image_url": {"url": to_data_url(image)}})
+    user_turn = {"role": "user", "content": content_list}
+
+    fixed_tokens = message_tokens(SYSTEM_MESSAGE) + message_tokens(user_turn)
+    dropped, kept, kept_tokens = fit_history(
+        history, fixed_tokens, reserve_if_trimmed=SUMMARY_MAX_TOKENS if LLM_SUMMARIZE_HISTORY else 0
+    )
+
+    messages = [SYSTEM_MESSAGE]
+    summary = _summarize_history(dropped) if dropped and LLM_SUMMARIZE_HISTORY else None
+    summary_tokens = 0
+    if summary:
+        summary_message = {"role": "system", "content": f"Summary of the earlier conversation (older messages omitted):\n{summary}"}
+        summary_tokens = message_tokens(summary_message)
+        if fixed_tokens + summary_tokens + kept_tokens > LLM_CONTEXT_TOKENS:
+            summary, summary_tokens = None, 0 # Longer than the space reserved for it: trim only
+        else:
+            messages.append(summary_message)
+    messages.extend(kept)
+    messages.append(user_turn)
+
+    context = {
+        "history_messages": len(history),
+        "dropped_messages": len(dropped),
+        "summarized": bool(summary),
+        "estimated_prompt_tokens": fixed_tokens + summary_tokens + kept_tokens,
+    }
+    if image:
+        context["image"] = {key: image[key] for key in ("format", "width", "height", "original_bytes", "bytes")}
+    return messages, context
+
+
+def _usage(usage) -> dict:
+    """Token counts reported by the API (cached_tokens: prompt tokens served from the prompt cache)."""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+    }
+
+
+def _add_usage(total: dict, usage: dict) -> dict:
+    if usage is None:
+        return total
+    if total is None:
+        return dict(usage)
+    return {key: total[key] + usage[key] for key in total}
+
+
+def _text_only(message: dict) -> dict:
+    """The message without image parts (repair rounds do not need the chart again)."""
+    if isinstance(message["content"], str):
+        return message
+    text = "\n".join(part.get("text", "") for part in message["content"] if part.get("type") == "text")
+    return {"role": message["role"], "content": text}
+
+
+def validate_and_repair(messages: list, response_text: str):
+    """Validates the generate_signals code in a response and asks the model to fix it if needed.
+
+    Each round runs validate_strategy_code; on failure the errors are sent back in the same
+    conversation, at most LLM_MAX_REPAIR_ROUNDS times.
+
+    Args:
+        messages (list): The messages the response was generated from.
+        response_text (str): The assistant response.
+
+    Yields:
+        dict: {"type": "validation", "round": int, **validate_strategy_code result} per round, then
+              {"type": "code", "code": str or None (only validated code), "validation": dict,
+              "repair_usage": dict or None}. Nothing if the response contains no code.
+    """
+    code = extract_strategy_code(response_text)
+    if code is None or not LLM_VALIDATE_CODE:
+        return
+
+    conversation = [_text_only(message) for message in messages] + [{"role": "assistant", "content": response_text}]
+    repair_usage = None
+    round_number = 0
+    while True:
+        result = validate_strategy_code(code)
+        yield {"type": "validation", "round": round_number, **result}
+        if result["ok"] or round_number >= LLM_MAX_REPAIR_ROUNDS:
+            break
+
+        round_number += 1
+        errors = "\n".join(f"- {error}" for error in result["errors"])
+        conversation.append({"role": "user", "content": REPAIR_PROMPT.format(rows=SAMPLE_ROWS, errors=errors)})
+        try:
+            completion = get_client().chat.completions.create(
+                model=MODEL,
+                messages=conversation,
+                max_tokens=MAX_OUTPUT_TOKENS,
+            )
+        except Exception as e:
+            result["errors"].append(_api_error_message(e))
+            break
+        repair_usage = _add_usage(repair_usage, _usage(completion.usage))
+        reply = completion.choices[0].message.content or ""
+        conversation.append({"role": "assistant", "content": reply})
+        repaired = extract_strategy_code(reply)
+        if repaired is None:
+            result["errors"].append("The repair reply contained no generate_signals code block.")
+            break
+        code = repaired
+
+    yield {
+        "type": "code",
+        "code": code if result["ok"] else None,
+        "validation": {**result, "repair_rounds": round_number},
+        "repair_usage": repair_usage,
+    }
+
+
+def _api_error_message(e: Exception) -> str:
+    """Maps an OpenAI client exception to the error message returned to the API caller."""
+    if isinstance(e, openai.AuthenticationError):
+        return "OpenAI authentication failed. Check your API key."
+    if isinstance(e, openai.RateLimitError):
+        return "OpenAI rate limit exceeded. Please try again later."
+    print(f"Error calling OpenAI API: {e}") # Log the error
+    return f"An error occurred while communicating with the AI: {str(e)}"
+
+
+def get_llm_response(chat_history: list, user_message: str, image_data: bytes = None) -> dict:
+    """Gets a response from the LLM based on chat history, user message, and optional image.
+
+    Args:
+        chat_history (list): List of previous messages, e.g., [{\"role\": \"user\", \"content\": \"...\"}, {\"role\": \"assistant\", \"content\": \"...\"}].
+        user_message (str): The latest message from the user.
+        image_data (bytes, optional): Binary image data if provided.
+
+    Returns:
+        dict: {\"response\": str, \"usage\": dict, \"latency_ms\": float, \"context\": dict} or {\"error\": str}.
+              If the response contains generate_signals code, also \"code\" (validated code or None),
+              \"validation\" and \"repair_usage\" (see validate_and_repair).
+    """
+    if not openai.api_key:
+        return {"error": "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable."}
+
+    try:
+        messages, context = _build_messages(chat_history, user_message, image_data)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    started = time.perf_counter()
+    try:
+        completion = get_client().chat.completions.create(
             model=MODEL,
             messages=messages,
-            max_tokens=1500 # Adjust as needed
+            max_tokens=MAX_OUTPUT_TOKENS,
         )
         response_text = completion.choices[0].message.content
-        return {"response": response_text}
-    except openai.AuthenticationError:
-         return {"error": "OpenAI authentication failed. Check your API key."}
-    except openai.RateLimitError:
-        return {"error": "OpenAI rate limit exceeded. Please try again later."}
     except Exception as e:
-        print(f"Error calling OpenAI API: {e}") # Log the error
-        return {"error": f"An error occurred while communicating with the AI: {str(e)}"}
+        return {"error": _api_error_message(e)}
+
+    result = {
+        "response": response_text,
+        "usage": _usage(completion.usage),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "context": context,
+    }
+    for event in validate_and_repair(messages, response_text):
+        if event["type"] == "code":
+            result.update({key: value for key, value in event.items() if key != "type"})
+    return result
+
+
+def stream_llm_response(chat_history: list, user_message: str, image_data: bytes = None):
+    """Streams the LLM response as tokens arrive (same inputs as get_llm_response).
+
+    Yields:
+        dict: {"type": "delta", "text": str} for every content chunk, {"type": "validation", ...}
+              per code validation round (see validate_and_repair), then either
+              {"type": "done", "response": str, "usage": dict, "ttft_ms": float, "elapsed_ms": float,
+              "context": dict, ["code", "validation", "repair_usage"]}
+              or {"type": "error", "error": str}. An error can follow some deltas if the
+              connection drops mid-stream.
+    """
+    if not openai.api_key:
+        yield {"type": "error", "error": "OpenAI API key not configured. Please set the OPENAI_API_KEY environment variable."}
+        return
+
+    try:
+        messages, context = _build_messages(chat_history, user_message, image_data)
+    except ValueError as e:
+        yield {"type": "error", "error": str(e)}
+        return
+
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+    usage = None
+    try:
+        stream = get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            max_tokens=MAX_OUTPUT_TOKENS,
+            stream=True,
+            stream_options={"include_usage": True}, # Token counts arrive in a last chunk without choices
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = _usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+            parts.append(text)
+            yield {"type": "delta", "text": text}
+    except Exception as e:
+        yield {"type": "error", "error": _api_error_message(e)}
+        return
+
+    done = {
+        "type": "done",
+        "response": "".join(parts),
+        "usage": usage,
+        "ttft_ms": round(ttft_ms if ttft_ms is not None else (time.perf_counter() - started) * 1000, 1),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "context": context,
+    }
+    # The text is complete on the client at this point; validation runs before "done"
+    for event in validate_and_repair(messages, done["response"]):
+        if event["type"] == "code":
+            done.update({key: value for key, value in event.items() if key != "type"})
+        else:
+            yield event
+    yield done
+
 
 # Example Usage (can be run standalone for testing)
 if __name__ == "__main__":
@@ -184,19 +493,23 @@ if __name__ == "__main__":
         result = get_llm_response(history, user_input)
         if "response" in result:
             print(f"Assistant: {result['response']}")
+            print(f"(usage {result['usage']}, {result['latency_ms']} ms)")
             history.append({"role": "user", "content": user_input})
             history.append({"role": "assistant", "content": result['response']})
         else:
             print(f"Error: {result['error']}")
-        
-        # Add another turn
+
+        # Add another turn, streamed
+        print("--- Testing LLM Service (Streaming) ---")
         user_input_2 = "Use 20-day and 50-day simple moving averages."
         print(f"User: {user_input_2}")
-        result_2 = get_llm_response(history, user_input_2)
-        if "response" in result_2:
-            print(f"Assistant: {result_2['response']}")
-        else:
-            print(f"Error: {result_2['error']}")
+        print("Assistant: ", end="", flush=True)
+        for event in stream_llm_response(history, user_input_2):
+            if event["type"] == "delta":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "done":
+                print(f"\n(first token {event['ttft_ms']} ms, total {event['elapsed_ms']} ms, usage {event['usage']})")
+            else:
+                print(f"\nError: {event['error']}")
 
         # TODO: Add test for image input when an image file is available
-
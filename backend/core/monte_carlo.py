@@ -0,0 +1,89 @@
+# /home/ubuntu/backtest_app/backend/core/monte_carlo.py
+import numpy as np
+
+MONTE_CARLO_METHODS = ("bootstrap", "permutation")
+# Percentiles reported for every distribution
+PERCENTILES = [5, 25, 50, 75, 95]
+# Upper bound on simulations x trades so one request cannot exhaust memory (~400 MB of float64)
+MAX_CELLS = 50_000_000
+
+
+def _bands(values: np.ndarray) -> dict:
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def monte_carlo_trades(trade_returns, initial_capital: float = 1000000.0, simulations: int = 10000,
+                       method: str = "bootstrap", ruin_threshold_pct: float = 50.0, seed: int = None,
+                       path_points: int = 50) -> dict:
+    """Resamples a trade return sequence to get confidence bands for the backtest metrics.
+
+    All simulations are drawn and compounded at once as a (simulations x trades) array.
+    "bootstrap" draws trades with replacement. "permutation" shuffles their order, which keeps
+    the final equity fixed (compounding is order-independent) and varies only the path, i.e.
+    the drawdown and ruin. Like the engine, every trade compounds the whole equity.
+    Drawdowns are measured trade to trade.
+
+    Args:
+        trade_returns: Per-trade returns in percent (the trades' `return_pct`).
+        initial_capital (float): Starting equity.
+        simulations (int): Number of resampled sequences.
+        method (str): "bootstrap" or "permutation".
+        ruin_threshold_pct (float): Loss from the initial capital (%) that counts as ruin.
+        seed (int, optional): Seed for reproducible draws.
+        path_points (int): Trade indices at which equity percentile bands are reported.
+
+    Returns:
+        dict: Percentile bands (p5..p95) for final equity, total return and max drawdown,
+              probability of ruin, and equity bands along the trade sequence.
+
+    Raises:
+        ValueError: For an unknown method, no trades, a return that is not finite or not
+                    above -100%, or too many simulations.
+    """
+    if method not in MONTE_CARLO_METHODS:
+        raise ValueError(f"method must be one of {MONTE_CARLO_METHODS}")
+    returns = np.asarray(trade_returns, dtype=np.float64) / 100.0
+    if not np.isfinite(returns).all():
+        raise ValueError("Trade returns must be finite numbers.")
+    if (returns <= -1.0).any():
+        raise ValueError("Trade returns must be greater than -100%; a trade cannot lose more than its stake.")
+    if len(returns) == 0:
+        raise ValueError("At least one trade is needed for a Monte Carlo simulation.")
+    simulations = int(simulations)
+    if simulations < 1 or simulations * len(returns) > MAX_CELLS:
+        raise ValueError(f"simulations x trades must be between 1 and {MAX_CELLS:,}")
+
+    rng = np.random.default_rng(seed)
+    if method == "bootstrap":
+        sampled = returns[rng.integers(len(returns), size=(simulations, len(returns)))]
+    else:
+        sampled = rng.permuted(np.broadcast_to(returns, (simulations, len(returns))), axis=1)
+
+    # Equity after each trade, in place to keep a single (simulations x trades) buffer
+    equity = np.log1p(sampled, out=sampled)
+    np.cumsum(equity, axis=1, out=equity)
+    np.exp(equity, out=equity)
+    equity *= initial_capital
+
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), initial_capital)
+    max_drawdown = ((1 - equity / peak).max(axis=1)) * 100
+    final_equity = equity[:, -1]
+    ruined = equity.min(axis=1) <= initial_capital * (1 - ruin_threshold_pct / 100)
+
+    steps = np.unique(np.linspace(0, len(returns) - 1, min(path_points, len(returns))).astype(int))
+    path = np.percentile(equity[:, steps], PERCENTILES, axis=0)
+
+    return {
+        "method": method,
+        "simulations": simulations,
+        "num_trades": int(len(returns)),
+        "final_equity": _bands(final_equity),
+        "total_return_pct": _bands((final_equity / initial_capital - 1) * 100),
+        "max_drawdown_pct": _bands(max_drawdown),
+        "probability_of_ruin": round(float(ruined.mean()), 4),
+        "ruin_threshold_pct": ruin_threshold_pct,
+        "equity_bands": {
+            "trade": (steps + 1).tolist(),
+            **{f"p{p}": np.round(row, 2).tolist() for p, row in zip(PERCENTILES, path)},
+        },
+    }
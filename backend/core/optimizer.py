@@ -0,0 +1,302 @@
+# /home/ubuntu/backtest_app/backend/core/optimizer.py
+import os
+import math
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+from backend.core.backtesting import run_backtest, METRIC_KEYS
+
+# Metrics where lower is better; every other objective is maximized
+MINIMIZED_METRICS = {"max_drawdown_pct"}
+# Fraction of the best observations TPE models as "good"
+TPE_GAMMA = 0.25
+# Candidates drawn from the good density per suggestion
+TPE_CANDIDATES = 24
+# Observations needed before TPE replaces random sampling
+TPE_MIN_OBSERVATIONS = 8
+# Shortest sub-period a low rung is evaluated on
+MIN_RUNG_BARS = 120
+
+# Set once per worker process by _init_worker so bars are pickled per worker, not per task
+_worker_data = None
+
+
+def _init_worker(data: pd.DataFrame):
+    global _worker_data
+    _worker_data = data
+
+
+def _evaluate(strategy_code: str, params: dict, bars: int, engine_args: tuple) -> dict:
+    """Worker task: metrics of one candidate on the last `bars` bars."""
+    return run_backtest(_worker_data.iloc[-bars:], strategy_code, *engine_args, strategy_params=params, output="metrics")
+
+
+class SearchSpace:
+    """Parameter space parsed from the request.
+
+    Each entry is one of
+        {"type": "int", "low": 10, "high": 60}
+        {"type": "float", "low": 0.001, "high": 0.02, "log": true}
+        {"type": "choice", "values": [...]}
+    or the shorthand [low, high] (int if both bounds are ints, float otherwise).
+    """
+
+    def __init__(self, space: dict):
+        if not isinstance(space, dict) or not space:
+            raise ValueError("params must map parameter names to ranges")
+        self.params = {}
+        for name, spec in space.items():
+            if isinstance(spec, list) and len(spec) == 2:
+                kind = "int" if all(isinstance(v, int) and not isinstance(v, bool) for v in spec) else "float"
+                spec = {"type": kind, "low": spec[0], "high": spec[1]}
+            if not isinstance(spec, dict) or spec.get("type") not in ("int", "float", "choice"):
+                raise ValueError(f"Invalid range for {name}: use [low, high] or {{\"type\": int|float|choice, ...}}")
+            if spec["type"] == "choice":
+                if not spec.get("values"):
+                    raise ValueError(f"Choice parameter {name} needs a non-empty values list")
+            else:
+                low, high = float(spec["low"]), float(spec["high"])
+                if not low < high:
+                    raise ValueError(f"Parameter {name} needs low < high")
+                if spec.get("log") and low <= 0:
+                    raise ValueError(f"Log-scaled parameter {name} needs low > 0")
+            self.params[name] = spec
+
+    def _to_unit(self, name: str, values: np.ndarray) -> np.ndarray:
+        spec = self.params[name]
+        low, high = float(spec["low"]), float(spec["high"])
+        if spec.get("log"):
+            return (np.log(values) - np.log(low)) / (np.log(high) - np.log(low))
+        return (values - low) / (high - low)
+
+    def _from_unit(self, name: str, units: np.ndarray) -> np.ndarray:
+        spec = self.params[name]
+        low, high = float(spec["low"]), float(spec["high"])
+        units = np.clip(units, 0.0, 1.0)
+        values = np.exp(np.log(low) + units * (np.log(high) - np.log(low))) if spec.get("log") else low + units * (high - low)
+        return np.round(values) if spec["type"] == "int" else values
+
+    def _value(self, name: str, raw):
+        spec = self.params[name]
+        if spec["type"] == "choice":
+            return spec["values"][int(raw)]
+        return int(raw) if spec["type"] == "int" else float(raw)
+
+    def sample(self, rng: np.random.Generator, count: int) -> list:
+        """Uniform random candidates."""
+        columns = {}
+        for name, spec in self.params.items():
+            if spec["type"] == "choice":
+                columns[name] = rng.integers(len(spec["values"]), size=count)
+            else:
+                columns[name] = self._from_unit(name, rng.random(count))
+        return [{name: self._value(name, columns[name][i]) for name in self.params} for i in range(count)]
+
+    def suggest_tpe(self, rng: np.random.Generator, observations: list, count: int) -> list:
+        """Tree-structured Parzen estimator suggestions (independent per parameter).
+
+        Observations are split into the best TPE_GAMMA ("good") and the rest. For each
+        parameter a Parzen density is fitted to both groups. Candidates are drawn from the
+        good density and the one with the highest summed log l(x)/g(x) is kept.
+
+        Args:
+            observations (list): [(params, score)] where higher scores are better.
+        """
+        scores = np.array([score for _, score in observations])
+        order = np.argsort(-scores)
+        n_good = max(1, int(math.ceil(TPE_GAMMA * len(observations))))
+        good, bad = order[:n_good], order[n_good:]
+
+        suggestions = []
+        for _ in range(count):
+            log_ratio = np.zeros(TPE_CANDIDATES)
+            drawn = {}
+            for name, spec in self.params.items():
+                if spec["type"] == "choice":
+                    encoded = np.array([spec["values"].index(p[name]) for p, _ in observations])
+                    size = len(spec["values"])
+                    # Counts with a +1 prior so unseen choices keep some mass
+                    l_prob = np.bincount(encoded[good], minlength=size) + 1.0
+                    g_prob = np.bincount(encoded[bad], minlength=size) + 1.0
+                    l_prob, g_prob = l_prob / l_prob.sum(), g_prob / g_prob.sum()
+                    candidates = rng.choice(size, size=TPE_CANDIDATES, p=l_prob)
+                    log_ratio += np.log(l_prob[candidates]) - np.log(g_prob[candidates])
+                else:
+                    units = self._to_unit(name, np.array([float(p[name]) for p, _ in observations]))
+                    candidates = _parzen_sample(rng, units[good], TPE_CANDIDATES)
+                    log_ratio += _parzen_log_pdf(candidates, units[good]) - _parzen_log_pdf(candidates, units[bad])
+                    candidates = self._from_unit(name, candidates)
+                drawn[name] = candidates
+            best = int(np.argmax(log_ratio))
+            suggestions.append({name: self._value(name, drawn[name][best]) for name in self.params})
+        return suggestions
+
+
+def _bandwidth(count: int) -> float:
+    # Scott-style shrinking bandwidth on the unit interval
+    return max(0.05, min(0.5, 1.06 * 0.29 * (count + 1) ** -0.2))
+
+
+def _parzen_log_pdf(x: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Log density of a Gaussian mixture on [0, 1] (one kernel per observation + a uniform prior)."""
+    sigma = _bandwidth(len(centers))
+    kernels = np.exp(-0.5 * ((x[:, None] - centers[None, :]) / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
+    density = (kernels.sum(axis=1) + 1.0) / (len(centers) + 1) # uniform prior has density 1 on [0, 1]
+    return np.log(density)
+
+
+def _parzen_sample(rng: np.random.Generator, centers: np.ndarray, count: int) -> np.ndarray:
+    sigma = _bandwidth(len(centers))
+    # Pick the prior with weight 1/(n+1), otherwise a kernel around one good observation
+    picks = rng.integers(len(centers) + 1, size=count)
+    samples = rng.random(count)
+    from_kernel = picks < len(centers)
+    samples[from_kernel] = centers[picks[from_kernel]] + rng.normal(0.0, sigma, from_kernel.sum())
+    return np.clip(samples, 0.0, 1.0)
+
+
+def pareto_front(trials: list) -> list:
+    """Trials not dominated on (higher total_return, lower max_drawdown_pct), by total_return."""
+    front = []
+    for trial in trials:
+        ret, mdd = trial["metrics"]["total_return"], trial["metrics"]["max_drawdown_pct"]
+        dominated = any(
+            other["metrics"]["total_return"] >= ret and other["metrics"]["max_drawdown_pct"] <= mdd
+            and (other["metrics"]["total_return"] > ret or other["metrics"]["max_drawdown_pct"] < mdd)
+            for other in trials
+        )
+        if not dominated:
+            front.append(trial)
+    return sorted(front, key=lambda trial: -trial["metrics"]["total_return"])
+
+
+def _score(metrics: dict, objective: str) -> float:
+    value = metrics.get(objective)
+    if not isinstance(value, (int, float)) or np.isnan(value):
+        return -np.inf
+    return -float(value) if objective in MINIMIZED_METRICS else float(value)
+
+
+def rung_bars(total_bars: int, eta: int, min_fraction: float) -> list:
+    """Sub-period lengths of the successive-halving rungs, shortest first, ending at the full history."""
+    bars = [total_bars]
+    while bars[0] / eta >= max(MIN_RUNG_BARS, total_bars * min_fraction):
+        bars.insert(0, int(bars[0] / eta))
+    return bars
+
+
+def optimize_strategy(data: pd.DataFrame, strategy_code: str, space: dict, engine_args: tuple = (),
+                      objective: str = "total_return", budget: int = 60, eta: int = 3, min_fraction: float = 0.1,
+                      max_workers: int = None, seed: int = None) -> dict:
+    """Searches strategy parameters with successive halving, sampling candidates with TPE.
+
+    Each bracket draws a batch of candidates (random at first, then from a TPE model of the
+    scores seen so far) and evaluates them on the most recent `1/eta**k` of the history.
+    Only the best 1/eta of every rung is promoted to the next, longer sub-period, so only a few
+    candidates per bracket reach the full history. Evaluations run in worker processes in
+    metrics-only mode.
+
+    Args:
+        data (pd.DataFrame): OHLCV data with DatetimeIndex.
+        strategy_code (str): Strategy whose `generate_signals` takes the searched keyword arguments.
+        space (dict): Parameter space (see SearchSpace).
+        engine_args (tuple): (initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct).
+        objective (str): Metric ranking candidates (max_drawdown_pct is minimized, others maximized).
+        budget (int): Total number of backtests over all rungs.
+        eta (int): Halving rate; also the length ratio between consecutive rungs.
+        min_fraction (float): Shortest sub-period as a fraction of the history.
+        max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+        seed (int, optional): Seed for reproducible sampling.
+
+    Returns:
+        dict: {"best": trial, "pareto": [trials on total_return vs max_drawdown_pct],
+               "trials": [full-history trials], "evaluations", "rungs", "objective"},
+              each trial being {"params", "metrics"}. {"error": message} if nothing succeeded.
+    """
+    if objective not in METRIC_KEYS:
+        raise ValueError(f"objective must be one of {METRIC_KEYS}")
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    search_space = SearchSpace(space)
+    rng = np.random.default_rng(seed)
+    rungs = rung_bars(len(data), eta, min_fraction)
+    workers = max_workers or os.cpu_count() or 1
+
+    evaluations = 0
+    cache = {} # (params, bars) -> metrics, so duplicate suggestions are not re-run
+    observations = {bars: [] for bars in rungs} # rung -> [(params, score)]
+    full_trials = []
+    errors = []
+    stalled = 0
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as executor:
+        while evaluations < budget:
+            # Largest bracket (a multiple of eta**(rungs-1), at least one per worker) that fits the budget
+            batch = max(eta ** (len(rungs) - 1), workers)
+            while batch > 1 and sum(max(1, batch // eta ** k) for k in range(len(rungs))) > budget - evaluations:
+                batch -= 1
+
+            # TPE models the highest rung with enough observations, random sampling before that
+            modeled = next((observations[bars] for bars in reversed(rungs) if len(observations[bars]) >= TPE_MIN_OBSERVATIONS), None)
+            if modeled is None:
+                candidates = search_space.sample(rng, batch)
+            else:
+                candidates = search_space.suggest_tpe(rng, modeled, batch)
+            # Integer/choice spaces can repeat a suggestion; each candidate runs once per rung
+            candidates = list({tuple(sorted(params.items())): params for params in candidates}.values())
+            evaluations_before = evaluations
+
+            for k, bars in enumerate(rungs):
+                keys = [(tuple(sorted(params.items())), bars) for params in candidates]
+                pending = {key: params for key, params in zip(keys, candidates) if key not in cache}
+                pending = dict(list(pending.items())[:max(0, budget - evaluations)])
+                futures = {
+                    executor.submit(_evaluate, strategy_code, params, bars, engine_args): key
+                    for key, params in pending.items()
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    key = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"error": f"Worker failed: {e}"}
+                    metrics = result.get("metrics", {}) if "error" not in result else {"error": result["error"]}
+                    cache[key] = metrics
+                    evaluations += 1
+                    if "error" in metrics:
+                        errors.append(metrics["error"])
+                        continue
+                    observations[bars].append((pending[key], _score(metrics, objective)))
+                    if bars == rungs[-1]:
+                        full_trials.append({"params": pending[key], "metrics": metrics})
+
+                if k == len(rungs) - 1:
+                    break
+                # Promote the best 1/eta to the next, longer sub-period
+                scored = [(params, _score(cache[key], objective)) for params, key in zip(candidates, keys)
+                          if key in cache and "error" not in cache[key]]
+                scored.sort(key=lambda item: -item[1])
+                candidates = [params for params, _ in scored[:max(1, len(candidates) // eta)]]
+                if not candidates:
+                    break
+
+            if not full_trials and errors and len(errors) >= evaluations:
+                break # Every evaluation failed (e.g. the strategy rejects the parameters)
+            stalled = stalled + 1 if evaluations == evaluations_before else 0
+            if stalled >= 3:
+                break # Small discrete space already exhausted
+
+    if not full_trials:
+        return {"error": errors[0] if errors else "No candidate reached the full history; increase the budget."}
+
+    best = max(full_trials, key=lambda trial: _score(trial["metrics"], objective))
+    return {
+        "objective": objective,
+        "best": best,
+        "pareto": pareto_front(full_trials),
+        "trials": sorted(full_trials, key=lambda trial: -_score(trial["metrics"], objective)),
+        "evaluations": evaluations,
+        "rungs": rungs,
+    }
@@ -0,0 +1,198 @@
+# /home/ubuntu/backtest_app/backend/core/result_cache.py
+import os
+import json
+import copy
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from backend.core.data_store import register_update_listener
+
+# Memory budget per tier, overridable from .env
+SIGNALS_TIER_MAX_MB = float(os.getenv("BACKTEST_CACHE_SIGNALS_MB", "64"))
+RESULTS_TIER_MAX_MB = float(os.getenv("BACKTEST_CACHE_RESULTS_MB", "192"))
+# Evicted entries are pickled here when set (optional on-disk spill)
+SPILL_DIR = os.getenv("BACKTEST_CACHE_SPILL_DIR") or None
+
+# Signals are stored as int8 codes instead of Python strings
+_SIGNAL_LABELS = np.array(["hold", "buy", "sell"], dtype=object)
+_SIGNAL_CODES = {"hold": 0, "buy": 1, "sell": 2}
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """Content hash of a OHLCV DataFrame (values and dates)."""
+    hashed = pd.util.hash_pandas_object(data, index=True).to_numpy()
+    return hashlib.sha1(hashed.tobytes() + ",".join(map(str, data.columns)).encode()).hexdigest()
+
+
+def _hash_text(text) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+class _LRUTier:
+    """Size-bounded LRU map with optional spill of evicted entries to disk."""
+
+    def __init__(self, name: str, max_bytes: int, spill_dir: str = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.spill_dir = os.path.join(spill_dir, name) if spill_dir else None
+        self._entries = OrderedDict() # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def get(self, key: str):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        if self.spill_dir and os.path.isfile(self._spill_path(key)):
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    value = pickle.load(f)
+                os.remove(self._spill_path(key))
+                self.put(key, value)
+                self.hits += 1
+                return value
+            except Exception as e:
+                print(f"Failed to read spilled cache entry {key}: {e}") # Log the error
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value, size: int = None):
+        if size is None:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        self.discard(key)
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            evicted_key, (evicted_value, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            if self.spill_dir:
+                try:
+                    with open(self._spill_path(evicted_key), "wb") as f:
+                        pickle.dump(evicted_value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    print(f"Failed to spill cache entry {evicted_key}: {e}") # Log the error
+
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        if self.spill_dir and os.path.isfile(self._spill_path(key)):
+            os.remove(self._spill_path(key))
+
+    def clear(self):
+        for key in list(self._entries):
+            self.discard(key)
+        if self.spill_dir:
+            for filename in os.listdir(self.spill_dir):
+                if filename.endswith(".pkl"):
+                    os.remove(os.path.join(self.spill_dir, filename))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+class TieredBacktestCache:
+    """Two-tier backtest cache.
+
+    Tier 1 (signals): (data fingerprint, strategy-code hash, strategy params) -> signal codes.
+    Tier 2 (results): tier-1 key + engine params -> final run_backtest result.
+    Changing only engine params (e.g. stop_loss_pct) therefore skips generate_signals, and an
+    identical run skips everything. Entries are tagged with their ticker so they can be
+    dropped when that ticker's data is updated.
+    """
+
+    def __init__(self, signals_max_bytes: int, results_max_bytes: int, spill_dir: str = None):
+        self.signals = _LRUTier("signals", signals_max_bytes, spill_dir)
+        self.results = _LRUTier("results", results_max_bytes, spill_dir)
+        self._keys_by_ticker = {} # ticker -> {(tier, key), ...}
+        self._lock = threading.Lock()
+
+    def signals_key(self, data: pd.DataFrame, strategy_code: str, strategy_params: dict = None, indicators: pd.DataFrame = None) -> str:
+        params = json.dumps(strategy_params or {}, sort_keys=True, default=str)
+        key = f"{data_fingerprint(data)}|{_hash_text(strategy_code)}|{params}"
+        # Stored (full-history) and freshly computed indicators can differ at the start of the data
+        if indicators is not None:
+            key = f"{key}|{data_fingerprint(indicators)}"
+        return _hash_text(key)
+
+    def result_key(self, signals_key: str, *engine_params, output: str = "full") -> str:
+        key = f"{signals_key}|{json.dumps([float(p) for p in engine_params])}"
+        # Metrics-only results must never be served to a caller that wants trades
+        return _hash_text(key if output == "full" else f"{key}|{output}")
+
+    def get_signals(self, key: str, index: pd.Index):
+        with self._lock:
+            codes = self.signals.get(key)
+        if codes is None:
+            return None
+        return pd.Series(_SIGNAL_LABELS[codes], index=index)
+
+    def put_signals(self, key: str, signals: pd.Series, ticker: str = None):
+        codes = signals.map(_SIGNAL_CODES).to_numpy(dtype=np.int8)
+        with self._lock:
+            self.signals.put(key, codes, codes.nbytes)
+            self._tag(ticker, "signals", key)
+
+    def get_result(self, key: str):
+        with self._lock:
+            result = self.results.get(key)
+        # Callers may mutate the returned dict (e.g. JSON conversion), so hand out a copy
+        return copy.deepcopy(result) if result is not None else None
+
+    def put_result(self, key: str, result: dict, ticker: str = None):
+        with self._lock:
+            self.results.put(key, copy.deepcopy(result))
+            self._tag(ticker, "results", key)
+
+    def _tag(self, ticker, tier: str, key: str):
+        if ticker:
+            self._keys_by_ticker.setdefault(ticker, set()).add((tier, key))
+
+    def invalidate(self, tickers: list = None):
+        """Drops entries of `tickers` (memory and disk). None clears the whole cache."""
+        with self._lock:
+            if tickers is None:
+                self.signals.clear()
+                self.results.clear()
+                self._keys_by_ticker.clear()
+                return
+            for ticker in tickers:
+                for tier, key in self._keys_by_ticker.pop(ticker, set()):
+                    getattr(self, tier).discard(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"signals": self.signals.stats(), "results": self.results.stats()}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_backtest_cache() -> TieredBacktestCache:
+    """Returns the process-wide cache, invalidated whenever the data store reports updates."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TieredBacktestCache(
+                int(SIGNALS_TIER_MAX_MB * 1024 * 1024),
+                int(RESULTS_TIER_MAX_MB * 1024 * 1024),
+                SPILL_DIR,
+            )
+            register_update_listener(_default_cache.invalidate)
+        return _default_cache
@@ -0,0 +1,318 @@
+# /home/ubuntu/backtest_app/backend/core/run_history.py
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pandas as pd
+
+from backend.core.backtesting import METRIC_KEYS
+
+# Embedded SQLite file holding every completed /api/backtest run
+RUN_HISTORY_DB = os.getenv(
+    "RUN_HISTORY_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "run_history.db")
+)
+
+# Metric columns stored per run (also the allowed sort keys of query_runs)
+METRIC_COLUMNS = list(METRIC_KEYS)
+# Columns returned by query_runs (blobs are only read by get_run)
+SUMMARY_COLUMNS = [
+    "id", "created_at", "ticker", "strategy_name", "strategy_hash", "start_date", "end_date",
+    "initial_capital", "stop_loss_pct", "trade_fee_pct", "sell_tax_pct", "strategy_params", "indicator_source",
+] + METRIC_COLUMNS
+
+CREATE_RUNS_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    ticker TEXT,
+    strategy_name TEXT,
+    strategy_hash TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    initial_capital REAL,
+    stop_loss_pct REAL,
+    trade_fee_pct REAL,
+    sell_tax_pct REAL,
+    strategy_params TEXT,
+    indicator_source TEXT,
+    {", ".join(f"{column} REAL" for column in METRIC_COLUMNS)},
+    trades_blob BLOB,
+    equity_blob BLOB)
+"""
+
+# "Top N by metric for strategy X" and "all runs for ticker Y" are served from these indexes
+CREATE_INDEX_SQL = [
+    f"CREATE INDEX IF NOT EXISTS idx_runs_strategy_{column} ON runs (strategy_name, {column})"
+    for column in METRIC_COLUMNS
+] + [
+    "CREATE INDEX IF NOT EXISTS idx_runs_ticker ON runs (ticker, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_strategy_hash ON runs (strategy_hash)",
+]
+
+# Decoded trade tables kept in memory for paging (run id -> DataFrame)
+MAX_DECODED_RUNS = 16
+TRADE_OUTCOMES = {"winners", "losers"}
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Returns this thread's connection to the run-history database (created on first use)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != RUN_HISTORY_DB:
+        os.makedirs(os.path.dirname(RUN_HISTORY_DB) or ".", exist_ok=True)
+        conn = sqlite3.connect(RUN_HISTORY_DB, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn, _local.path = conn, RUN_HISTORY_DB
+    with _schema_lock:
+        if RUN_HISTORY_DB not in _schema_ready:
+            conn.execute(CREATE_RUNS_TABLE_SQL)
+            # Databases created before the indicator source was recorded
+            if "indicator_source" not in {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}:
+                conn.execute("ALTER TABLE runs ADD COLUMN indicator_source TEXT")
+            for sql in CREATE_INDEX_SQL:
+                conn.execute(sql)
+            conn.commit()
+            _schema_ready.add(RUN_HISTORY_DB)
+    return conn
+
+
+def _pack(obj) -> bytes:
+    return zlib.compress(json.dumps(obj, default=str).encode("utf-8"), 6)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8")) if blob else None
+
+
+def _trades_to_columns(trades: list) -> dict:
+    """Converts trade dicts to the columnar {column: [values]} form stored in trades_blob."""
+    columns = list(trades[0]) if trades else []
+    return {column: [trade.get(column) for trade in trades] for column in columns}
+
+
+def _trades_from_blob(blob) -> list:
+    stored = _unpack(blob) or {}
+    columns = list(stored)
+    return [dict(zip(columns, values)) for values in zip(*stored.values())]
+
+
+def summarize_trades(trades: list) -> dict:
+    """Counts returned instead of the trade list when the caller asks for a result handle."""
+    exit_types = {}
+    for trade in trades:
+        exit_types[trade.get("exit_type")] = exit_types.get(trade.get("exit_type"), 0) + 1
+    return {
+        "num_trades": len(trades),
+        "winners": sum(1 for trade in trades if trade["profit_loss"] > 0),
+        "losers": sum(1 for trade in trades if trade["profit_loss"] < 0),
+        "exit_types": exit_types,
+    }
+
+
+def _metric_value(value):
+    # profit_loss_ratio may be the string "inf" (no losing trades)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def record_run(results: dict, ticker: str = None, strategy_name: str = None, strategy_code: str = None,
+               engine_params: dict = None, strategy_params: dict = None, start_date=None, end_date=None,
+               indicator_source: str = None) -> int:
+    """Persists one completed backtest.
+
+    Args:
+        results (dict): run_backtest result ('trades', 'metrics' and optionally 'equity_curve').
+        ticker (str, optional): Ticker the run was made on.
+        strategy_name (str, optional): Saved strategy name (None for ad-hoc code).
+        strategy_code (str, optional): Strategy source; its hash groups runs of identical code.
+        engine_params (dict, optional): initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct.
+        strategy_params (dict, optional): Keyword arguments passed to generate_signals.
+        start_date, end_date (optional): Date range of the bars.
+        indicator_source (str, optional): Where the strategy's `indicators` came from
+                                          ("feature_store" or "computed", see load_features).
+
+    Returns:
+        int: The new run id.
+    """
+    metrics = results.get("metrics", {})
+    engine_params = engine_params or {}
+    row = {
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ticker": ticker,
+        "strategy_name": strategy_name,
+        "strategy_hash": hashlib.sha1((strategy_code or "").encode("utf-8")).hexdigest(),
+        "start_date": str(start_date)[:10] if start_date is not None else None,
+        "end_date": str(end_date)[:10] if end_date is not None else None,
+        "initial_capital": engine_params.get("initial_capital"),
+        "stop_loss_pct": engine_params.get("stop_loss_pct"),
+        "trade_fee_pct": engine_params.get("trade_fee_pct"),
+        "sell_tax_pct": engine_params.get("sell_tax_pct"),
+        "strategy_params": json.dumps(strategy_params, sort_keys=True) if strategy_params else None,
+        "indicator_source": indicator_source,
+        "trades_blob": _pack(_trades_to_columns(results.get("trades", []))),
+        "equity_blob": _pack(results["equity_curve"]) if results.get("equity_curve") else None,
+    }
+    row.update({column: _metric_value(metrics.get(column)) for column in METRIC_COLUMNS})
+
+    conn = get_connection()
+    cursor = conn.execute(
+        f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+        list(row.values())
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def _summary(row: sqlite3.Row) -> dict:
+    run = {column: row[column] for column in SUMMARY_COLUMNS}
+    if run["strategy_params"]:
+        run["strategy_params"] = json.loads(run["strategy_params"])
+    return run
+
+
+def query_runs(strategy: str = None, ticker: str = None, strategy_hash: str = None,
+               order_by: str = "created_at", ascending: bool = False, limit: int = 50) -> list:
+    """Lists stored runs (metrics only, no trades), e.g. top N by sharpe_ratio for a strategy.
+
+    Args:
+        strategy (str, optional): Filter by strategy name.
+        ticker (str, optional): Filter by ticker.
+        strategy_hash (str, optional): Filter by strategy code hash.
+        order_by (str): "created_at" or one of METRIC_COLUMNS.
+        ascending (bool): Sort direction, defaults to descending.
+        limit (int): Maximum number of runs.
+
+    Returns:
+        list: Run summaries.
+    """
+    if order_by not in METRIC_COLUMNS + ["created_at"]:
+        raise ValueError(f"order_by must be one of {['created_at'] + METRIC_COLUMNS}")
+
+    sql = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM runs"
+    conditions, params = [], []
+    for column, value in (("strategy_name", strategy), ("ticker", ticker), ("strategy_hash", strategy_hash)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if order_by != "created_at":
+        conditions.append(f"{order_by} IS NOT NULL")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {order_by} {'ASC' if ascending else 'DESC'}, id DESC LIMIT ?"
+    params.append(int(limit))
+
+    return [_summary(row) for row in get_connection().execute(sql, params)]
+
+
+def get_run(run_id: int, include_trades: bool = True, include_equity: bool = True):
+    """Returns one stored run with its decompressed trades / equity curve (None if missing)."""
+    columns = SUMMARY_COLUMNS + ["trades_blob", "equity_blob"]
+    row = get_connection().execute(f"SELECT {', '.join(columns)} FROM runs WHERE id = ?", (int(run_id),)).fetchone()
+    if row is None:
+        return None
+    run = _summary(row)
+    if include_trades:
+        run["trades"] = _trades_from_blob(row["trades_blob"])
+    if include_equity:
+        run["equity_curve"] = _unpack(row["equity_blob"])
+    return run
+
+
+def delete_run(run_id: int) -> bool:
+    """Deletes one stored run. Returns False if it did not exist."""
+    conn = get_connection()
+    cursor = conn.execute("DELETE FROM runs WHERE id = ?", (int(run_id),))
+    conn.commit()
+    with _decoded_lock:
+        _decoded_trades.pop(int(run_id), None)
+    return cursor.rowcount > 0
+
+
+_decoded_trades = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def _load_trade_frame(run_id: int):
+    """Returns the run's trades as a DataFrame, decoding the blob at most once per LRU slot."""
+    with _decoded_lock:
+        if run_id in _decoded_trades:
+            _decoded_trades.move_to_end(run_id)
+            return _decoded_trades[run_id]
+    row = get_connection().execute("SELECT trades_blob FROM runs WHERE id = ?", (run_id,)).fetchone()
+    if row is None:
+        return None
+    frame = pd.DataFrame(_trades_from_blob(row["trades_blob"]))
+    with _decoded_lock:
+        _decoded_trades[run_id] = frame
+        while len(_decoded_trades) > MAX_DECODED_RUNS:
+            _decoded_trades.popitem(last=False)
+    return frame
+
+
+def get_run_trades(run_id: int, page: int = 1, page_size: int = 100, sort_by: str = None, ascending: bool = True,
+                   exit_type: str = None, outcome: str = None):
+    """Returns one page of a stored run's trades in columnar form.
+
+    Args:
+        run_id (int): Run id (the result handle returned by /api/backtest).
+        page (int): 1-based page number.
+        page_size (int): Trades per page.
+        sort_by (str, optional): Any trade column (e.g. "return_pct"); trade order if None.
+        ascending (bool): Sort direction.
+        exit_type (str, optional): "signal", "stop_loss" or "final_close".
+        outcome (str, optional): "winners" (profit_loss > 0) or "losers" (profit_loss < 0).
+
+    Returns:
+        dict: {"total", "page", "page_size", "pages", "columns", "data": {column: [values]}},
+              or None if the run does not exist.
+
+    Raises:
+        ValueError: For an unknown sort column or outcome, or a non-positive page / page_size.
+    """
+    if page < 1 or page_size < 1:
+        raise ValueError("page and page_size must be positive")
+    if outcome is not None and outcome not in TRADE_OUTCOMES:
+        raise ValueError(f"outcome must be one of {sorted(TRADE_OUTCOMES)}")
+
+    frame = _load_trade_frame(int(run_id))
+    if frame is None:
+        return None
+    if sort_by is not None and sort_by not in frame.columns:
+        raise ValueError(f"sort_by must be one of {list(frame.columns)}")
+
+    if not frame.empty:
+        mask = pd.Series(True, index=frame.index)
+        if exit_type:
+            mask &= frame["exit_type"] == exit_type
+        if outcome == "winners":
+            mask &= frame["profit_loss"] > 0
+        elif outcome == "losers":
+            mask &= frame["profit_loss"] < 0
+        frame = frame[mask]
+        if sort_by is not None:
+            frame = frame.sort_values(sort_by, ascending=ascending, kind="stable")
+
+    total = len(frame)
+    page_frame = frame.iloc[(page - 1) * page_size:page * page_size]
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "pages": (total + page_size - 1) // page_size,
+        "columns": list(page_frame.columns),
+        "data": {column: page_frame[column].tolist() for column in page_frame.columns},
+    }
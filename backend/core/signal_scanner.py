@@ -0,0 +1,283 @@
+# /home/ubuntu/backtest_app/backend/core/signal_scanner.py
+import ast
+import math
+import operator
+import os
+import concurrent.futures
+from datetime import datetime
+
+import pandas as pd
+
+from backend.core.backtesting import generate_signal_series, StrategyError
+from backend.core.data_store import get_connection, get_latest_date, load_ohlcv, load_ohlcv_tail
+from backend.core.strategy_spec import is_strategy_spec, compile_strategy_spec
+from backend.core.strategy_validation import _is_row_loop
+
+# Used when a strategy declares no LOOKBACK and no window constants can be found
+DEFAULT_LOOKBACK = 500
+# Extra bars on top of the estimated lookback
+LOOKBACK_MARGIN = 10
+# EWM spans need several spans of history before adjust=False values settle
+EWM_WARMUP_FACTOR = 4
+# Tickers handed to one worker task
+SCAN_CHUNK_SIZE = 100
+# Failed tickers listed in the scan summary (the count is always reported)
+MAX_REPORTED_FAILURES = 20
+
+# Keyword / positional arguments that size a window in pandas calls
+_WINDOW_KEYWORDS = {"window", "span", "com", "halflife", "periods", "min_periods"}
+_WINDOW_METHODS = {"rolling", "shift", "diff", "pct_change", "expanding"}
+_EWM_METHODS = {"ewm"}
+# Arithmetic evaluated in window arguments, e.g. rolling(period * 5)
+_WINDOW_ARITHMETIC = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv, ast.Div: operator.truediv,
+}
+
+CREATE_SIGNAL_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS daily_signal (
+    date DATE,
+    code VARCHAR(20),
+    strategy VARCHAR(100),
+    signal_type VARCHAR(10),
+    close BIGINT(20),
+    lookback INT,
+    scanned_at DATETIME,
+    PRIMARY KEY (date, code, strategy),
+    INDEX idx_daily_signal_strategy (strategy, date))
+"""
+
+
+def estimate_lookback(strategy_code: str):
+    """Works out how many trailing bars a strategy needs to decide the latest bar's signal.
+
+    Declarative specs report the longest chain of windows in their compiled plan. A
+    module-level `LOOKBACK = <int>` in the strategy code is used as declared, and
+    `LOOKBACK = None` marks a strategy that needs the full history. Otherwise
+    the code is parsed and every window-sizing constant passed to rolling/ewm/shift/diff
+    (literal or through a simple `name = <int>` assignment or argument default, with + - * /
+    // evaluated) is summed, with EWM spans scaled by EWM_WARMUP_FACTOR. Summing
+    over-estimates chained windows, which only costs a few extra rows. If any window
+    argument cannot be resolved, DEFAULT_LOOKBACK is used.
+
+    Strategies that loop over the rows in Python (for ... in range(len(data)), while) may
+    carry state such as a position flag through the whole history, so they get None
+    unless they declare LOOKBACK.
+
+    Returns:
+        int or None: Bars needed, or None for the full history.
+    """
+    if is_strategy_spec(strategy_code):
+        return compile_strategy_spec(strategy_code).lookback(EWM_WARMUP_FACTOR) + LOOKBACK_MARGIN
+
+    try:
+        tree = ast.parse(strategy_code)
+    except SyntaxError:
+        return DEFAULT_LOOKBACK
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "LOOKBACK" for t in node.targets):
+            if isinstance(node.value, ast.Constant) and (node.value.value is None or isinstance(node.value.value, int)):
+                return node.value.value
+
+    if any(isinstance(node, ast.While) or (isinstance(node, (ast.For, ast.comprehension)) and _is_row_loop(node))
+           for node in ast.walk(tree)):
+        return None
+
+    constants = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, int):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    constants[target.id] = node.value.value
+        elif isinstance(node, ast.arguments):
+            positional = node.posonlyargs + node.args
+            for arg, default in zip(positional[len(positional) - len(node.defaults):], node.defaults):
+                if isinstance(default, ast.Constant) and isinstance(default.value, int):
+                    constants[arg.arg] = default.value
+
+    def resolve(value):
+        """Integer value of a window argument, or None if it cannot be worked out statically."""
+        if isinstance(value, ast.Constant) and isinstance(value.value, (int, float)) and not isinstance(value.value, bool):
+            return int(math.ceil(value.value))
+        if isinstance(value, ast.Name):
+            return constants.get(value.id)
+        if isinstance(value, ast.UnaryOp) and isinstance(value.op, (ast.USub, ast.UAdd)):
+            operand = resolve(value.operand)
+            return None if operand is None else (-operand if isinstance(value.op, ast.USub) else operand)
+        if isinstance(value, ast.BinOp) and type(value.op) in _WINDOW_ARITHMETIC:
+            left, right = resolve(value.left), resolve(value.right)
+            if left is None or right is None:
+                return None
+            try:
+                return int(math.ceil(_WINDOW_ARITHMETIC[type(value.op)](left, right)))
+            except (ZeroDivisionError, OverflowError, ValueError):
+                return None
+        return None
+
+    total = 0
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+            continue
+        method = node.func.attr
+        if method not in _WINDOW_METHODS | _EWM_METHODS:
+            continue
+        arguments = node.args[:1] + [kw.value for kw in node.keywords if kw.arg in _WINDOW_KEYWORDS]
+        sizes = [resolve(arg) for arg in arguments]
+        if None in sizes:
+            return DEFAULT_LOOKBACK # A window computed at run time: the estimate would be too short
+        size = max([abs(s) for s in sizes], default=1 if method in ("shift", "diff", "pct_change") else 0)
+        total += size * EWM_WARMUP_FACTOR if method in _EWM_METHODS else size
+
+    return total + LOOKBACK_MARGIN if total else DEFAULT_LOOKBACK
+
+
+def _scan_chunk(tickers: list, strategies: dict, lookbacks: dict, as_of) -> tuple:
+    """Worker task: loads the tail window per ticker and evaluates each strategy's last signal.
+
+    Returns:
+        tuple: (rows, failed) - (code, strategy, signal, close) for every 'buy'/'sell' on the
+               `as_of` bar, and the tickers that could not be scanned.
+    """
+    # None: a strategy needs the full history
+    window = None if None in lookbacks.values() else max(lookbacks.values())
+    rows = []
+    failed = []
+    for ticker in tickers:
+        try:
+            tail = load_ohlcv(ticker, end_date=as_of) if window is None else load_ohlcv_tail(ticker, window, as_of)
+            if tail.empty or tail.index[-1] != as_of:
+                continue # No bar on the scan date (suspended or delisted)
+
+            ticker_rows = []
+            for name, code in strategies.items():
+                data = tail if lookbacks[name] is None else tail.iloc[-lookbacks[name]:]
+                try:
+                    signal = generate_signal_series(data, code).iloc[-1]
+                except StrategyError:
+                    continue
+                if signal != "hold":
+                    ticker_rows.append((ticker, name, signal, int(data["Close"].iloc[-1])))
+        except Exception as e:
+            print(f"Signal scan: failed to scan {ticker}: {e}") # Log the error
+            failed.append(ticker)
+            continue
+        rows.extend(ticker_rows)
+    return rows, failed
+
+
+def run_signal_scan(strategies: dict, tickers: list, as_of=None, max_workers: int = None) -> dict:
+    """Evaluates every strategy's signal on the latest bar for every ticker and stores it.
+
+    Only the tail window each strategy needs (see estimate_lookback) is loaded per ticker.
+    'buy' and 'sell' rows are written to the daily_signal table (re-running a scan for the
+    same date replaces that date's rows, except those of tickers that failed to scan).
+
+    Args:
+        strategies (dict): {strategy name: strategy code}.
+        tickers (list): Ticker codes to scan.
+        as_of (date or str, optional): Bar date to evaluate ("YYYY-MM-DD" accepted). Defaults to
+            the latest date in daily_price.
+        max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+
+    Returns:
+        dict: Scan summary (date, counts, lookbacks, failed tickers) or {"error": message}.
+    """
+    started = datetime.now()
+    if not strategies:
+        return {"error": "No saved strategies to scan."}
+    as_of = get_latest_date() if as_of is None else as_of
+    if as_of is None:
+        return {"error": "daily_price has no data to scan."}
+    as_of = pd.Timestamp(as_of).normalize() # Compared against the bar index in every worker
+
+    lookbacks = {name: estimate_lookback(code) for name, code in strategies.items()}
+    chunks = [tickers[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(tickers), SCAN_CHUNK_SIZE)]
+
+    rows = []
+    failed = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {executor.submit(_scan_chunk, chunk, strategies, lookbacks, as_of): chunk for chunk in chunks}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                chunk_rows, chunk_failed = future.result()
+            except Exception as e:
+                print(f"Signal scan worker failed: {e}") # Log the error
+                chunk_rows, chunk_failed = [], futures[future]
+            rows.extend(chunk_rows)
+            failed.extend(chunk_failed)
+
+    failed = sorted(failed)
+    if tickers and len(failed) == len(tickers):
+        return {"error": f"Signal scan failed for all {len(tickers)} tickers; stored signals were kept."}
+    save_signals(as_of, rows, lookbacks, keep_codes=failed)
+    return {
+        "date": as_of.strftime("%Y-%m-%d"),
+        "tickers": len(tickers),
+        "strategies": len(strategies),
+        "buy_signals": sum(1 for row in rows if row[2] == "buy"),
+        "sell_signals": sum(1 for row in rows if row[2] == "sell"),
+        "failed_tickers": len(failed),
+        "failed_examples": failed[:MAX_REPORTED_FAILURES],
+        "lookbacks": lookbacks,
+        "elapsed_sec": round((datetime.now() - started).total_seconds(), 2),
+    }
+
+
+def save_signals(as_of, rows: list, lookbacks: dict, keep_codes: list = None):
+    """Replaces the daily_signal rows of `as_of` with the rows of a fresh scan.
+
+    Rows of `keep_codes` (tickers that failed to scan) are left as they were.
+    """
+    date_str = as_of.strftime("%Y-%m-%d")
+    scanned_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    delete_sql = "DELETE FROM daily_signal WHERE date = %s"
+    if keep_codes:
+        delete_sql += f" AND code NOT IN ({', '.join(['%s'] * len(keep_codes))})"
+    conn = get_connection()
+    try:
+        with conn.cursor() as curs:
+            curs.execute(CREATE_SIGNAL_TABLE_SQL)
+            curs.execute(delete_sql, (date_str, *(keep_codes or [])))
+            curs.executemany(
+                "INSERT INTO daily_signal (date, code, strategy, signal_type, close, lookback, scanned_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [(date_str, code, name, signal, close, lookbacks[name], scanned_at)
+                 for code, name, signal, close in rows]
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def query_signals(date=None, strategy: str = None, signal: str = None, code: str = None, limit: int = 1000) -> list:
+    """Reads stored scan results (latest scanned date by default)."""
+    sql = "SELECT s.date, s.code, c.company, s.strategy, s.signal_type, s.close, s.scanned_at " \
+          "FROM daily_signal s LEFT JOIN company_info c ON c.code = s.code WHERE "
+    params = []
+    if date is None:
+        sql += "s.date = (SELECT MAX(date) FROM daily_signal)"
+    else:
+        sql += "s.date = %s"
+        params.append(str(date))
+    for column, value in (("s.strategy", strategy), ("s.signal_type", signal), ("s.code", code)):
+        if value:
+            sql += f" AND {column} = %s"
+            params.append(value)
+    sql += " ORDER BY s.strategy, s.code LIMIT %s"
+    params.append(int(limit))
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as curs:
+            curs.execute(CREATE_SIGNAL_TABLE_SQL)
+            curs.execute(sql, params)
+            rows = curs.fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {"date": str(d), "code": c, "company": company, "strategy": s, "signal": sig,
+         "close": close, "scanned_at": str(scanned_at)}
+        for d, c, company, s, sig, close, scanned_at in rows
+    ]
@@ -0,0 +1,74 @@
+# /home/ubuntu/backtest_app/backend/core/strategy_batch.py
+import os
+import concurrent.futures
+
+import pandas as pd
+
+from backend.core.backtesting import run_backtest
+from backend.core.indicators import compute_indicators
+
+# Set once per worker process by _init_worker so bars are pickled per worker, not per task
+_worker_data = None
+_worker_indicators = None
+
+
+def _init_worker(data: pd.DataFrame, indicators: pd.DataFrame):
+    global _worker_data, _worker_indicators
+    _worker_data = data
+    _worker_indicators = indicators
+
+
+def _run_one(name: str, strategy_code: str, engine_args: tuple, output: str) -> tuple:
+    """Worker task: runs one strategy against the worker's shared bars."""
+    return name, run_backtest(_worker_data, strategy_code, *engine_args, indicators=_worker_indicators, output=output)
+
+
+def run_strategy_batch(data: pd.DataFrame, strategies: dict, engine_args: tuple, max_workers: int = None, output: str = "metrics", indicators: pd.DataFrame = None) -> dict:
+    """Runs several strategies against one ticker's bars in parallel worker processes.
+
+    The bars and the shared indicators (core/indicators.py) are prepared once and handed to
+    each worker process a single time.
+
+    Args:
+        data (pd.DataFrame): OHLCV data with DatetimeIndex.
+        strategies (dict): {strategy name: strategy code}.
+        engine_args (tuple): (initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct).
+        max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+        output (str): run_backtest output mode; "metrics" (default) skips the trade lists.
+        indicators (pd.DataFrame, optional): Precomputed indicators (e.g. from the feature
+                                             store); computed from `data` if None.
+
+    Returns:
+        dict: {"comparison": [{"strategy": name, **metrics}, ...] sorted by total_return,
+               "results": {name: run_backtest result}}.
+    """
+    if indicators is None:
+        indicators = compute_indicators(data)
+    workers = min(max_workers or os.cpu_count(), len(strategies)) or 1
+
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(data, indicators)) as executor:
+        futures = {
+            executor.submit(_run_one, name, code, engine_args, output): name
+            for name, code in strategies.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            name = futures[future]
+            try:
+                _, result = future.result()
+            except Exception as e:
+                result = {"error": f"Worker failed: {e}"}
+            results[name] = result
+
+    comparison = []
+    for name in strategies:
+        result = results[name]
+        metrics = result.get("metrics", {})
+        if "error" in result or "error" in metrics:
+            comparison.append({"strategy": name, "error": result.get("error") or metrics.get("error")})
+        else:
+            comparison.append({"strategy": name, **metrics})
+    comparison.sort(key=lambda row: ("error" in row, -row.get("total_return", 0.0)))
+
+    return {"comparison": comparison, "results": results}
@@ -0,0 +1,338 @@
+# /home/ubuntu/backtest_app/backend/core/strategy_spec.py
+import re
+import json
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Price columns a spec can reference (case-insensitive)
+SPEC_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+# Window ops take one expression and an integer period: {"sma": ["close", 20]}
+_WINDOW_OPS = {"sma", "ema", "rsi", "rolling_max", "rolling_min", "shift", "diff"}
+_ELEMENTWISE_OPS = {
+    "add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.divide,
+    "gt": np.greater, "ge": np.greater_equal, "lt": np.less, "le": np.less_equal,
+    "eq": np.equal, "ne": np.not_equal,
+    "and": np.logical_and, "or": np.logical_or,
+    "max": np.fmax, "min": np.fmin,
+}
+_UNARY_OPS = {"not": np.logical_not, "abs": np.abs, "neg": np.negative}
+# Argument order does not matter, so they are sorted for common-subexpression elimination
+_COMMUTATIVE_OPS = {"add", "mul", "eq", "ne", "and", "or", "max", "min"}
+_MIRRORED_OPS = {"lt": "gt", "le": "ge"}
+
+_YAML_KEY_LINE = re.compile(r"^[A-Za-z_]\w*\s*:(\s|$)")
+_SIGNAL_LABELS = np.array(["hold", "buy", "sell"], dtype=object)
+
+
+class StrategySpecError(ValueError):
+    """Raised for malformed strategy specs."""
+
+
+def is_strategy_spec(strategy_code) -> bool:
+    """True if `strategy_code` is a declarative spec (JSON/YAML text with a "buy" rule) rather than Python."""
+    if isinstance(strategy_code, dict):
+        return "buy" in strategy_code
+    if not isinstance(strategy_code, str) or "buy" not in strategy_code:
+        return False
+    try:
+        return isinstance(_load_spec_text(strategy_code), dict)
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=256)
+def _load_spec_text(text: str):
+    stripped = text.lstrip()
+    if stripped.startswith("{"):
+        spec = json.loads(stripped)
+    else:
+        # YAML is only tried for text whose first statement is a top-level key like "buy:"
+        first = next((line for line in stripped.splitlines() if line.strip() and not line.startswith("#")), "")
+        if not _YAML_KEY_LINE.match(first):
+            return None
+        try:
+            import yaml
+        except ImportError:
+            return None
+        spec = yaml.safe_load(stripped)
+    return spec if isinstance(spec, dict) and "buy" in spec else None
+
+
+class CompiledSpec:
+    """Evaluation plan of a strategy spec: unique steps in dependency order.
+
+    Each step is (op, argument slots, period). Identical sub-expressions (also when written
+    under different names or with commutative arguments swapped) share one slot, and every
+    intermediate array is released after its last use.
+    """
+
+    def __init__(self, steps: list, buy: int, sell: int, priority: str, warmup: int, lookback: int = None):
+        self.steps = steps
+        self.buy = buy
+        self.sell = sell
+        self.priority = priority
+        self.warmup = warmup
+        self._declared_lookback = lookback
+        # Slot -> index of the last step (or output) that reads it
+        last_use = {}
+        for i, (_, args, _) in enumerate(steps):
+            for slot in args:
+                last_use[slot] = i
+        for slot in (buy, sell):
+            if slot is not None:
+                last_use[slot] = len(steps)
+        self._last_use = last_use
+
+    def lookback(self, ewm_factor: int = 4) -> int:
+        """Bars of history needed for the last bar's signal (longest chain of windows)."""
+        if self._declared_lookback:
+            return self._declared_lookback
+        depth = []
+        for op, args, period in self.steps:
+            own = 0
+            if op in _WINDOW_OPS:
+                own = period * ewm_factor if op == "ema" else period + (1 if op == "rsi" else 0)
+            depth.append(own + max((depth[slot] for slot in args), default=0))
+        return max([depth[slot] for slot in (self.buy, self.sell) if slot is not None] + [self.warmup])
+
+    def evaluate(self, columns: dict) -> tuple:
+        """Runs the plan on 2-D float arrays (dates x tickers) keyed by price column.
+
+        Returns:
+            tuple: (buy mask, sell mask) as boolean arrays of the same shape.
+        """
+        slots = [None] * len(self.steps)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i, (op, args, period) in enumerate(self.steps):
+                if op == "column":
+                    slots[i] = columns[period]
+                elif op == "const":
+                    slots[i] = period
+                elif op in _WINDOW_OPS:
+                    slots[i] = _window(op, slots[args[0]], period)
+                elif op in _UNARY_OPS:
+                    slots[i] = _UNARY_OPS[op](slots[args[0]])
+                else:
+                    slots[i] = _ELEMENTWISE_OPS[op](slots[args[0]], slots[args[1]])
+                for slot in args:
+                    if self._last_use[slot] == i:
+                        slots[slot] = None # Intermediate no longer needed
+        shape = columns["Close"].shape
+        buy = np.broadcast_to(slots[self.buy], shape).astype(bool)
+        sell = np.broadcast_to(slots[self.sell], shape).astype(bool) if self.sell is not None else np.zeros(shape, bool)
+        return buy, sell
+
+    def signal_codes(self, columns: dict) -> np.ndarray:
+        """int8 signal codes (0 hold, 1 buy, 2 sell) for 2-D price arrays."""
+        buy, sell = self.evaluate(columns)
+        codes = np.zeros(buy.shape, dtype=np.int8)
+        # The later assignment wins when buy and sell fire on the same bar
+        first, second = ((sell, 2), (buy, 1)) if self.priority == "buy" else ((buy, 1), (sell, 2))
+        codes[first[0]] = first[1]
+        codes[second[0]] = second[1]
+        codes[:self.warmup] = 0
+        return codes
+
+    def signals(self, data: pd.DataFrame) -> pd.Series:
+        """'buy'/'sell'/'hold' signals for one ticker's OHLCV DataFrame."""
+        columns = {col: data[col].to_numpy(dtype=np.float64)[:, None] for col in SPEC_COLUMNS.values() if col in data}
+        return pd.Series(_SIGNAL_LABELS[self.signal_codes(columns)[:, 0]], index=data.index)
+
+    def panel_signals(self, panel: dict) -> pd.DataFrame:
+        """Same rules for every ticker at once; `panel` holds wide (dates x tickers) DataFrames.
+
+        Each ticker is evaluated only on the dates where its close is present (tickers with the
+        same dates together), so NaN padding for a halt or a later listing does not enter its
+        windows and the result equals signals() on that ticker alone. Padded dates are 'hold'.
+        """
+        close = panel["Close"]
+        present = close.notna().to_numpy()
+        arrays = {col: frame.to_numpy(dtype=np.float64) for col, frame in panel.items()}
+        groups = {}
+        for j in range(present.shape[1]):
+            groups.setdefault(present[:, j].tobytes(), []).append(j)
+
+        labels = np.full(close.shape, "hold", dtype=object)
+        for tickers in groups.values():
+            rows = np.flatnonzero(present[:, tickers[0]])
+            if len(rows) == 0:
+                continue
+            if len(groups) == 1 and len(rows) == len(present): # No gaps: evaluate the arrays in place
+                labels[:] = _SIGNAL_LABELS[self.signal_codes(arrays)]
+                break
+            block = np.ix_(rows, tickers)
+            labels[block] = _SIGNAL_LABELS[self.signal_codes({col: values[block] for col, values in arrays.items()})]
+        return pd.DataFrame(labels, index=close.index, columns=close.columns)
+
+
+def _window(op: str, values: np.ndarray, period: int) -> np.ndarray:
+    """Column-wise window operation, with the same conventions as core/indicators.py."""
+    if op == "shift":
+        out = np.full(values.shape, np.nan)
+        if period < len(values):
+            out[period:] = values[:len(values) - period]
+        return out
+    if op == "diff":
+        return values - _window("shift", values, period)
+    frame = pd.DataFrame(values)
+    if op == "sma":
+        result = frame.rolling(window=period, min_periods=1).mean()
+    elif op == "ema":
+        result = frame.ewm(span=period, adjust=False).mean()
+    elif op == "rolling_max":
+        result = frame.rolling(window=period, min_periods=period).max()
+    elif op == "rolling_min":
+        result = frame.rolling(window=period, min_periods=period).min()
+    else: # rsi
+        delta = frame.diff()
+        avg_gain = delta.clip(lower=0).rolling(window=period, min_periods=period).mean()
+        avg_loss = (-delta.clip(upper=0)).rolling(window=period, min_periods=period).mean()
+        result = 100 - (100 / (1 + avg_gain / avg_loss))
+    return result.to_numpy()
+
+
+class _Compiler:
+    """Turns spec expressions into canonical keys and de-duplicated plan steps."""
+
+    def __init__(self, definitions: dict):
+        self.definitions = definitions
+        self.steps = []
+        self.slots = {} # canonical key -> slot
+        self._resolving = set()
+
+    def _emit(self, key: tuple, op: str, args: tuple, period=None) -> tuple:
+        if key not in self.slots:
+            self.slots[key] = len(self.steps)
+            self.steps.append((op, args, period))
+        return key
+
+    def slot(self, key: tuple) -> int:
+        return self.slots[key]
+
+    def compile(self, node) -> tuple:
+        """Returns the canonical key of `node`, emitting the steps it needs."""
+        if isinstance(node, (int, float)):
+            value = float(node)
+            return self._emit(("const", value), "const", (), value)
+        if isinstance(node, str):
+            name = node.strip()
+            if name.lower() in SPEC_COLUMNS:
+                column = SPEC_COLUMNS[name.lower()]
+                return self._emit(("column", column), "column", (), column)
+            if name not in self.definitions:
+                raise StrategySpecError(f"Unknown name in strategy spec: {name!r}")
+            if name in self._resolving:
+                raise StrategySpecError(f"Circular definition in strategy spec: {name!r}")
+            self._resolving.add(name)
+            try:
+                return self.compile(self.definitions[name])
+            finally:
+                self._resolving.discard(name)
+        if isinstance(node, list):
+            raise StrategySpecError(f"Expected an expression, got a list: {node!r}")
+        if not isinstance(node, dict) or len(node) != 1:
+            raise StrategySpecError(f"Each expression must be a single-key object like {{\"sma\": [\"close\", 20]}}: {node!r}")
+
+        op, raw_args = next(iter(node.items()))
+        op = op.lower()
+        raw_args = raw_args if isinstance(raw_args, list) else [raw_args]
+
+        if op in ("cross_above", "cross_below"):
+            # a crosses above b: a > b now and a <= b on the previous bar
+            if len(raw_args) != 2:
+                raise StrategySpecError(f"{op} takes two expressions.")
+            a, b = raw_args
+            now, before = ("gt", "le") if op == "cross_above" else ("lt", "ge")
+            return self.compile({"and": [{now: [a, b]}, {before: [{"shift": [a, 1]}, {"shift": [b, 1]}]}]})
+
+        if op in _WINDOW_OPS:
+            if len(raw_args) != 2 or not isinstance(raw_args[1], int) or isinstance(raw_args[1], bool) or raw_args[1] < 1:
+                raise StrategySpecError(f"{op} takes an expression and a positive integer period, e.g. {{\"{op}\": [\"close\", 20]}}.")
+            arg = self.compile(raw_args[0])
+            return self._emit((op, arg, raw_args[1]), op, (self.slot(arg),), raw_args[1])
+
+        if op in _UNARY_OPS:
+            if len(raw_args) != 1:
+                raise StrategySpecError(f"{op} takes one expression.")
+            arg = self.compile(raw_args[0])
+            return self._emit((op, arg), op, (self.slot(arg),))
+
+        if op in _ELEMENTWISE_OPS:
+            if len(raw_args) < 2 or (len(raw_args) > 2 and op not in _COMMUTATIVE_OPS):
+                raise StrategySpecError(f"{op} takes two expressions.")
+            keys = [self.compile(arg) for arg in raw_args]
+            if op in _MIRRORED_OPS:
+                # a < b is b > a, so both spellings share one step
+                op, keys = _MIRRORED_OPS[op], keys[::-1]
+            if op in _COMMUTATIVE_OPS:
+                keys = sorted(keys, key=repr)
+            # n-ary and/or/add/... fold left
+            key = keys[0]
+            for other in keys[1:]:
+                key = self._emit((op, key, other), op, (self.slot(key), self.slot(other)))
+            return key
+
+        raise StrategySpecError(f"Unknown operator in strategy spec: {op!r}")
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_text(text: str) -> CompiledSpec:
+    spec = _load_spec_text(text)
+    if spec is None:
+        raise StrategySpecError("Strategy spec must be a JSON/YAML object with a \"buy\" rule.")
+    return _compile_dict(spec)
+
+
+def _compile_dict(spec: dict) -> CompiledSpec:
+    definitions = spec.get("indicators") or {}
+    if not isinstance(definitions, dict):
+        raise StrategySpecError("\"indicators\" must map names to expressions.")
+    priority = spec.get("priority", "sell")
+    if priority not in ("buy", "sell"):
+        raise StrategySpecError("\"priority\" must be \"buy\" or \"sell\".")
+
+    compiler = _Compiler(definitions)
+    buy = compiler.slot(compiler.compile(spec["buy"]))
+    sell = compiler.slot(compiler.compile(spec["sell"])) if spec.get("sell") is not None else None
+    return CompiledSpec(compiler.steps, buy, sell, priority, int(spec.get("warmup", 0)), spec.get("lookback"))
+
+
+def compile_strategy_spec(spec) -> CompiledSpec:
+    """Compiles a declarative strategy spec into a vectorized evaluation plan.
+
+    A spec is a JSON/YAML object:
+        indicators (dict, optional): Named expressions usable in the rules.
+        buy (expr): Condition for a 'buy' signal.
+        sell (expr, optional): Condition for a 'sell' signal.
+        priority (str, optional): Signal kept when both fire on one bar, "sell" (default) or "buy".
+        warmup (int, optional): Leading bars forced to 'hold'.
+        lookback (int, optional): Bars the signal scanner loads (estimated from the windows otherwise).
+
+    An expression is a price column ("open", "high", "low", "close", "volume"), a number,
+    an indicator name, or a single-key object: {"sma"|"ema"|"rsi"|"rolling_max"|"rolling_min"|
+    "shift"|"diff": [expr, period]}, {"add"|"sub"|"mul"|"div"|"max"|"min": [expr, expr]},
+    {"gt"|"ge"|"lt"|"le"|"eq"|"ne": [expr, expr]}, {"and"|"or": [expr, ...]}, {"not"|"abs"|"neg": expr}
+    and {"cross_above"|"cross_below": [expr, expr]}.
+
+    Args:
+        spec (dict or str): Spec object, or its JSON/YAML text.
+
+    Returns:
+        CompiledSpec: Plan with signals(data) and panel_signals(panel).
+
+    Raises:
+        StrategySpecError: If the spec is malformed.
+    """
+    if isinstance(spec, dict):
+        return _compile_dict(spec)
+    return _compile_text(spec)
+
+
+def spec_to_code(spec) -> str:
+    """Serializes a spec object so it can travel wherever strategy code (a string) is accepted."""
+    if spec is None or isinstance(spec, str):
+        return spec
+    return json.dumps(spec, ensure_ascii=False, sort_keys=True)
@@ -0,0 +1,215 @@
+# /home/ubuntu/backtest_app/backend/core/strategy_validation.py
+import ast
+import functools
+import multiprocessing
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.core.backtesting import VALID_SIGNALS, _exec_strategy_code
+
+# Sample fixture: about three years of daily bars
+SAMPLE_ROWS = 750
+SAMPLE_SEED = 7
+# generate_signals must finish within this on the fixture (vectorized code takes a few ms)
+MAX_RUNTIME_MS = 1000
+# The check process is killed after this (infinite loops, huge allocations)
+VALIDATION_TIMEOUT_S = 10
+# Look-ahead check: signals must not change when the fixture is cut at these many points
+# spread over its second half
+LOOKAHEAD_CUTS = 12
+LOOKAHEAD_START_FRACTION = 0.5
+
+_CODE_BLOCK = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+# Attribute calls that walk a DataFrame row by row
+_ROW_ITERATORS = {"iterrows", "itertuples"}
+
+
+def extract_strategy_code(text: str):
+    """Returns the last fenced code block that defines generate_signals, or None."""
+    blocks = [block.strip() for block in _CODE_BLOCK.findall(text or "")]
+    candidates = [block for block in blocks if "def generate_signals" in block]
+    return candidates[-1] if candidates else None
+
+
+@functools.lru_cache(maxsize=1)
+def sample_ohlcv() -> pd.DataFrame:
+    """Deterministic synthetic OHLCV fixture (KRW-like integer prices, business-day index).
+
+    The drift alternates between up and down trends so both trend-following and
+    mean-reversion strategies produce trades. Shared: callers must pass copies to strategy code.
+    """
+    rng = np.random.default_rng(SAMPLE_SEED)
+    index = pd.bdate_range("2021-01-04", periods=SAMPLE_ROWS, name="Date")
+    drift = 0.0015 * np.sin(np.arange(SAMPLE_ROWS) / 60)
+    close = 50000 * np.exp(np.cumsum(drift + rng.normal(0, 0.018, SAMPLE_ROWS)))
+    open_ = np.concatenate(([close[0]], close[:-1])) * np.exp(rng.normal(0, 0.006, SAMPLE_ROWS))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, SAMPLE_ROWS)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, SAMPLE_ROWS)))
+    volume = rng.lognormal(13, 0.5, SAMPLE_ROWS)
+    return pd.DataFrame(
+        {"Open": open_.round(), "High": high.round(), "Low": low.round(), "Close": close.round(), "Volume": volume.round()},
+        index=index,
+    )
+
+
+def _is_row_loop(node) -> bool:
+    """True for loops over rows: range(len(...)), range(x.shape[0]), x.index, x.values."""
+    iterable = node.iter
+    if isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name) and iterable.func.id == "range":
+        return any(
+            (isinstance(sub, ast.Call) and isinstance(sub.func, ast.Name) and sub.func.id == "len")
+            or (isinstance(sub, ast.Attribute) and sub.attr == "shape")
+            for arg in iterable.args for sub in ast.walk(arg)
+        )
+    return isinstance(iterable, ast.Attribute) and iterable.attr in ("index", "values")
+
+
+def static_check(code: str) -> list:
+    """Checks the code without running it.
+
+    Returns:
+        list: Error messages, phrased for the model to act on.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [f"SyntaxError on line {e.lineno}: {e.msg}"]
+
+    errors = []
+    if not any(isinstance(node, ast.FunctionDef) and node.name == "generate_signals" for node in tree.body):
+        errors.append("The code must define a top-level function named generate_signals(data).")
+
+    for node in ast.walk(tree):
+        line = getattr(node, "lineno", "?")
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            errors.append(f"Line {line}: import statements are not allowed; pd and np are already available.")
+        elif isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            errors.append(f"Line {line}: access to the dunder attribute '{node.attr}' is not allowed.")
+        elif isinstance(node, ast.Attribute) and node.attr in _ROW_ITERATORS:
+            errors.append(f"Line {line}: {node.attr}() iterates rows in Python; use vectorized pandas operations.")
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "apply" and any(
+                keyword.arg == "axis" and isinstance(keyword.value, ast.Constant) and keyword.value.value in (1, "columns")
+                for keyword in node.keywords):
+            errors.append(f"Line {line}: apply(axis=1) runs Python per row; use vectorized column operations.")
+        elif isinstance(node, (ast.For, ast.comprehension)) and _is_row_loop(node):
+            errors.append(f"Line {line}: Python loop over the rows of the data; use vectorized pandas operations (rolling, shift, np.where).")
+        elif isinstance(node, ast.While):
+            errors.append(f"Line {line}: while loops are not allowed in generate_signals; use vectorized pandas operations.")
+    return errors
+
+
+def _check_signals(signals, data: pd.DataFrame) -> list:
+    """Errors for a generate_signals return value (type, length, index, NaN, values)."""
+    if not isinstance(signals, (pd.Series, list)):
+        return [f"generate_signals returned {type(signals).__name__}; it must return a pandas Series."]
+    if len(signals) != len(data):
+        return [f"generate_signals returned {len(signals)} values for {len(data)} rows; the Series must have exactly len(data) values."]
+    errors = []
+    if isinstance(signals, pd.Series) and not signals.index.equals(data.index):
+        errors.append("The returned Series index differs from data.index; create it with pd.Series('hold', index=data.index).")
+    values = pd.Series(list(signals) if isinstance(signals, pd.Series) else signals)
+    missing = int(values.isna().sum())
+    if missing:
+        first = int(np.flatnonzero(values.isna().to_numpy())[0])
+        errors.append(f"{missing} signals are NaN/None (first at row {first}); fill warm-up rows with 'hold'.")
+    invalid = sorted({repr(value) for value in values.dropna().unique() if value not in VALID_SIGNALS})
+    if invalid:
+        errors.append(f"Signals must be 'buy', 'sell' or 'hold'; found {', '.join(invalid[:5])}.")
+    return errors
+
+
+def _run_checks(code: str) -> dict:
+    """Runs generate_signals on the fixture (inside the check process)."""
+    data = sample_ohlcv()
+    result = {"errors": [], "warnings": [], "runtime_ms": None, "signal_counts": None}
+    try:
+        exec_locals = _exec_strategy_code(code, data.copy())
+        generate_signals = exec_locals.get("generate_signals")
+        if not callable(generate_signals):
+            result["errors"].append("The code must define a function named generate_signals(data).")
+            return result
+        started = time.perf_counter()
+        signals = generate_signals(data.copy())
+        result["runtime_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as e:
+        result["errors"].append(f"Error executing strategy code: {type(e).__name__}: {e}")
+        return result
+
+    result["errors"] = _check_signals(signals, data)
+    if result["errors"]:
+        return result
+    signals = pd.Series(list(signals), index=data.index)
+    result["signal_counts"] = {signal: int((signals == signal).sum()) for signal in ("buy", "sell", "hold")}
+
+    if result["runtime_ms"] > MAX_RUNTIME_MS:
+        result["errors"].append(f"generate_signals took {result['runtime_ms']:.0f} ms on {len(data)} rows (limit {MAX_RUNTIME_MS} ms); vectorize the computation.")
+    if result["signal_counts"]["buy"] == 0:
+        result["warnings"].append(f"No 'buy' signal on the {len(data)}-row sample; the entry condition may never trigger.")
+
+    # Look-ahead: with future data (shift(-n), whole-series statistics) the signals before a cut
+    # change when the rows after it are removed. shift(-1) only shows on the row before the cut,
+    # so several cuts are tried.
+    full = signals.to_numpy(dtype=object)
+    try:
+        for cut in np.linspace(len(data) * LOOKAHEAD_START_FRACTION, len(data) - 1, LOOKAHEAD_CUTS).astype(int):
+            prefix_signals = generate_signals(data.iloc[:cut].copy())
+            if len(prefix_signals) != cut:
+                continue
+            changed = np.flatnonzero(np.asarray(list(prefix_signals), dtype=object) != full[:cut])
+            if len(changed):
+                result["errors"].append(
+                    f"Signals change when later rows are removed (run on the first {cut} rows, {len(changed)} rows differ, "
+                    f"first at row {int(changed[0])}): the code uses future data, e.g. shift(-1) or statistics over the whole series."
+                )
+                break
+    except Exception as e:
+        result["warnings"].append(f"Could not run the look-ahead check on a shorter sample: {e}")
+    return result
+
+
+def _check_worker(code: str, conn):
+    try:
+        conn.send(_run_checks(code))
+    except Exception as e:
+        conn.send({"errors": [f"Error executing strategy code: {e}"], "warnings": [], "runtime_ms": None, "signal_counts": None})
+    finally:
+        conn.close()
+
+
+def validate_strategy_code(code: str, timeout: float = VALIDATION_TIMEOUT_S) -> dict:
+    """Validates strategy code statically, then runs it on the sample fixture in a separate process.
+
+    The process is killed after `timeout` seconds, so a runaway strategy cannot hang the server.
+
+    Returns:
+        dict: {"ok": bool, "errors": [...], "warnings": [...], "runtime_ms": float or None,
+               "signal_counts": {"buy", "sell", "hold"} or None, "check_ms": float}.
+    """
+    started = time.perf_counter()
+    result = {"errors": static_check(code), "warnings": [], "runtime_ms": None, "signal_counts": None}
+
+    if not result["errors"]:
+        context = multiprocessing.get_context()
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_check_worker, args=(code, sender), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            if receiver.poll(timeout):
+                result = receiver.recv()
+            else:
+                result["errors"].append(f"generate_signals did not finish within {timeout:g} s on {SAMPLE_ROWS} rows.")
+        except EOFError: # The process died without reporting (e.g. killed for memory)
+            result["errors"].append("The strategy check process exited unexpectedly.")
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            receiver.close()
+
+    result["ok"] = not result["errors"]
+    result["check_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
@@ -0,0 +1,174 @@
+# /home/ubuntu/backtest_app/backend/core/universe_scan.py
+import os
+import uuid
+import threading
+import concurrent.futures
+from collections import OrderedDict
+from datetime import datetime
+
+from backend.core.backtesting import run_panel_backtest, METRIC_KEYS
+from backend.core.data_store import load_company_list, load_ohlcv
+
+# Tickers handed to one worker task; large enough to amortize panel-mode evaluation
+SCAN_CHUNK_SIZE = 50
+# Finished scans kept in memory for leaderboard queries
+MAX_KEPT_SCANS = 20
+# Metrics where a smaller value ranks higher by default
+ASCENDING_METRICS = {"max_drawdown_pct"}
+
+
+def _scan_chunk(tickers: list, start_date, end_date, strategy_code: str, engine_args: tuple) -> list:
+    """Worker task: loads a chunk of tickers from the local data store and backtests them.
+
+    Returns:
+        list: One row per ticker, {"ticker": code, **metrics} or {"ticker": code, "error": msg}.
+    """
+    rows = []
+    data_by_ticker = {}
+    for ticker in tickers:
+        try:
+            df = load_ohlcv(ticker, start_date, end_date)
+        except Exception as e:
+            rows.append({"ticker": ticker, "error": f"Failed to load data: {e}"})
+            continue
+        if df.empty:
+            rows.append({"ticker": ticker, "error": "No data in the specified date range."})
+            continue
+        data_by_ticker[ticker] = df
+
+    if not data_by_ticker:
+        return rows
+
+    # Only metrics are streamed, so skip building trade lists
+    results = run_panel_backtest(data_by_ticker, strategy_code, *engine_args, output="metrics")
+    if "error" in results:
+        return rows + [{"ticker": t, "error": results["error"]} for t in data_by_ticker]
+
+    for ticker, result in results.items():
+        if "error" in result:
+            rows.append({"ticker": ticker, "error": result["error"]})
+        elif "error" in result.get("metrics", {}):
+            rows.append({"ticker": ticker, "error": result["metrics"]["error"]})
+        else:
+            rows.append({"ticker": ticker, **result["metrics"]})
+    return rows
+
+
+def _sort_value(value):
+    """Maps a metric value to a sortable float ("inf" strings and None included)."""
+    if value == "inf":
+        return float("inf")
+    return float(value)
+
+
+class UniverseScan:
+    """Results of one strategy run across the listed universe, filled in as tickers complete."""
+
+    def __init__(self, tickers: dict, params: dict):
+        self.scan_id = uuid.uuid4().hex
+        self.tickers = tickers # {code: company}
+        self.params = params
+        self.rows = []
+        self.status = "pending"
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self._lock = threading.Lock()
+
+    def add_rows(self, rows: list):
+        with self._lock:
+            self.rows.extend(rows)
+
+    def summary(self) -> dict:
+        with self._lock:
+            errors = sum(1 for row in self.rows if "error" in row)
+            return {
+                "scan_id": self.scan_id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "total": len(self.tickers),
+                "completed": len(self.rows),
+                "errors": errors,
+            }
+
+    def leaderboard(self, sort_by: str = "total_return", ascending: bool = None, limit: int = 50) -> list:
+        """Returns successful rows sorted by any calculate_metrics key.
+
+        Rows where the metric is missing (e.g. sharpe_ratio None) are placed last.
+        """
+        if sort_by not in METRIC_KEYS:
+            raise ValueError(f"sort_by must be one of: {', '.join(METRIC_KEYS)}")
+        if ascending is None:
+            ascending = sort_by in ASCENDING_METRICS
+
+        with self._lock:
+            rows = [row for row in self.rows if "error" not in row]
+        ranked = [row for row in rows if row.get(sort_by) is not None]
+        missing = [row for row in rows if row.get(sort_by) is None]
+        ranked.sort(key=lambda row: _sort_value(row[sort_by]), reverse=not ascending)
+        return (ranked + missing)[:limit] if limit else ranked + missing
+
+
+_scans = OrderedDict()
+_scans_lock = threading.Lock()
+
+
+def create_scan(start_date, end_date, strategy_code: str, engine_args: tuple, tickers: list = None) -> UniverseScan:
+    """Registers a new scan over `tickers` (default: every company in company_info)."""
+    companies = load_company_list()
+    names = dict(zip(companies["code"], companies["company"]))
+    if tickers:
+        names = {code: names.get(code, "") for code in tickers}
+
+    scan = UniverseScan(names, {
+        "start_date": start_date,
+        "end_date": end_date,
+        "strategy_code": strategy_code,
+        "engine_args": engine_args,
+    })
+    with _scans_lock:
+        _scans[scan.scan_id] = scan
+        while len(_scans) > MAX_KEPT_SCANS:
+            _scans.popitem(last=False)
+    return scan
+
+
+def get_scan(scan_id: str):
+    with _scans_lock:
+        return _scans.get(scan_id)
+
+
+def iter_scan_results(scan: UniverseScan, max_workers: int = None):
+    """Runs the scan over a process pool and yields per-ticker rows as chunks complete.
+
+    Closing the generator early (e.g. the HTTP client disconnects) cancels pending chunks.
+    """
+    params = scan.params
+    codes = list(scan.tickers)
+    chunks = [codes[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(codes), SCAN_CHUNK_SIZE)]
+    scan.status = "running"
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    try:
+        futures = {
+            executor.submit(_scan_chunk, chunk, params["start_date"], params["end_date"],
+                            params["strategy_code"], params["engine_args"]): chunk
+            for chunk in chunks
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                rows = future.result()
+            except Exception as e:
+                rows = [{"ticker": t, "error": f"Worker failed: {e}"} for t in futures[future]]
+            for row in rows:
+                row["company"] = scan.tickers.get(row["ticker"], "")
+            scan.add_rows(rows)
+            for row in rows:
+                yield row
+        scan.status = "done"
+    except GeneratorExit:
+        scan.status = "cancelled"
+        raise
+    except Exception:
+        scan.status = "failed"
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -11,9 +11,15 @@ def generate_signals(data: pd.DataFrame) -> pd.Series:
     signals = pd.Series('hold', index=data.index)
 
     # --- Donchian Channel 계산 (벡터화, 규칙 6) ---
+    # 전역 indicators에 미리 계산된 채널(DC_HIGH_20/DC_LOW_20)이 있으면 사용하고, 없으면 직접 계산
     # min_periods=period로 설정하여, period만큼의 데이터가 쌓이기 전까지는 NaN 반환
-    upper_band = data['High'].rolling(window=period, min_periods=period).max()
-    lower_band = data['Low'].rolling(window=period, min_periods=period).min()
+    high_column, low_column = f'DC_HIGH_{period}', f'DC_LOW_{period}'
+    if indicators is not None and high_column in indicators and low_column in indicators:
+        upper_band = indicators[high_column].reindex(data.index)
+        lower_band = indicators[low_column].reindex(data.index)
+    else:
+        upper_band = data['High'].rolling(window=period, min_periods=period).max()
+        lower_band = data['Low'].rolling(window=period, min_periods=period).min()
 
     # shift(1)을 사용하여 현재 봉이 아닌 이전 봉의 채널 값을 기준으로 판단 (미래 데이터 참조 방지)
     prev_upper_band = upper_band.shift(1)
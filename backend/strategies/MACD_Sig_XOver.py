@@ -1,7 +1,11 @@
 # 3. MACD Signal Line Crossover
 def generate_signals(data: pd.DataFrame) -> pd.Series:
     signals = pd.Series('hold', index=data.index)
-    macd = data['Close'].ewm(span=12, adjust=False).mean() - data['Close'].ewm(span=26, adjust=False).mean()
+    # Use the precomputed EMAs of the global `indicators` when present, else compute them
+    if indicators is not None and 'EMA_12' in indicators and 'EMA_26' in indicators:
+        macd = indicators['EMA_12'].reindex(data.index) - indicators['EMA_26'].reindex(data.index)
+    else:
+        macd = data['Close'].ewm(span=12, adjust=False).mean() - data['Close'].ewm(span=26, adjust=False).mean()
     signal_line = macd.ewm(span=9, adjust=False).mean()
     buy = (macd > signal_line) & (macd.shift(1) <= signal_line.shift(1))
     sell = (macd < signal_line) & (macd.shift(1) >= signal_line.shift(1))
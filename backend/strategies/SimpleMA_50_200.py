@@ -1,10 +1,29 @@
 # 1. Simple Moving Average Crossover (50/200 days)
-def generate_signals_sma_crossover(data: pd.DataFrame) -> pd.Series:
+def generate_signals(data: pd.DataFrame) -> pd.Series:
     signals = pd.Series('hold', index=data.index)
-    data['SMA_50'] = data['Close'].rolling(window=50, min_periods=1).mean()
-    data['SMA_200'] = data['Close'].rolling(window=200, min_periods=1).mean()
+    # Use the precomputed columns of the global `indicators` when present, else compute them
+    if indicators is not None and 'SMA_50' in indicators:
+        data['SMA_50'] = indicators['SMA_50'].reindex(data.index)
+    else:
+        data['SMA_50'] = data['Close'].rolling(window=50, min_periods=1).mean()
+    if indicators is not None and 'SMA_200' in indicators:
+        data['SMA_200'] = indicators['SMA_200'].reindex(data.index)
+    else:
+        data['SMA_200'] = data['Close'].rolling(window=200, min_periods=1).mean()
     buy = (data['SMA_50'] > data['SMA_200']) & (data['SMA_50'].shift(1) <= data['SMA_200'].shift(1))
     sell = (data['SMA_50'] < data['SMA_200']) & (data['SMA_50'].shift(1) >= data['SMA_200'].shift(1))
     signals.loc[buy] = 'buy'
     signals.loc[sell] = 'sell'
-    return signals
\ No newline at end of file
+    return signals
+
+# Panel mode: same rule evaluated for every ticker at once (data[col] is dates x tickers)
+def generate_panel_signals(data):
+    close = data['Close']
+    sma_50 = close.rolling(window=50, min_periods=1).mean()
+    sma_200 = close.rolling(window=200, min_periods=1).mean()
+    buy = (sma_50 > sma_200) & (sma_50.shift(1) <= sma_200.shift(1))
+    sell = (sma_50 < sma_200) & (sma_50.shift(1) >= sma_200.shift(1))
+    signals = pd.DataFrame('hold', index=close.index, columns=close.columns)
+    signals[buy] = 'buy'
+    signals[sell] = 'sell'
+    return signals
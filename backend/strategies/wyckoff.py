@@ -1,4 +1,7 @@
-def generate_signals(data):
+# 포지션 상태를 전체 기간에 걸쳐 루프로 이어가므로 최근 구간만으로는 신호가 같지 않음: 항상 전체 기간 사용
+LOOKBACK = None
+
+def generate_signals(data, n_range_period=20, n_spring_lookback=5, n_pullback_window=5, pullback_tolerance_factor=0.005):
     """
     Wyckoff 이론의 단순화된 매집(Accumulation) 패턴을 기반으로 매수/매도 신호를 생성합니다.
 
@@ -10,14 +13,16 @@ def generate_signals(data):
 
     매도 신호 (청산):
     - 매수 신호를 유발했던 매집 패턴의 Spring 발생 시점의 범위 저점 아래로 종가가 형성될 때.
+
+    파라미터는 키워드 인자로 받습니다 (strategy_params).
     """
     signals = pd.Series('hold', index=data.index)
 
-    # 파라미터 설정
-    n_range_period = 20  # 매집/분산 범위를 정의하기 위한 기간
-    n_spring_lookback = 5 # SOS 발생 전 Spring을 찾기 위한 이전 기간
-    n_pullback_window = 5 # SOS 발생 후 되돌림을 기다리는 기간
-    pullback_tolerance_factor = 0.005 # 되돌림 목표 수준에 대한 허용 오차 (예: 고점의 0.5%)
+    # 파라미터 (strategy_params / 최적화로 조정 가능)
+    # n_range_period: 매집/분산 범위를 정의하기 위한 기간
+    # n_spring_lookback: SOS 발생 전 Spring을 찾기 위한 이전 기간
+    # n_pullback_window: SOS 발생 후 되돌림을 기다리는 기간
+    # pullback_tolerance_factor: 되돌림 목표 수준에 대한 허용 오차 (예: 고점의 0.5%)
 
     # 1. 매집/분산 범위 정의 (lookahead bias 피하기 위해 shift(1) 사용)
     data['range_low'] = data['Low'].rolling(window=n_range_period, min_periods=n_range_period // 2).min().shift(1)
@@ -10,26 +10,36 @@ import streamlit as st
 import pandas as pd
 import datetime
 import requests
-import base64
 import time
-import pymysql
+import functools
 from dotenv import load_dotenv
 import os
 import re
+import json
+import hashlib
 import concurrent.futures
+from collections import OrderedDict
 from utils.charting import create_candlestick_chart
+from utils import http_client
 from datetime import timedelta
 from urllib.parse import quote
 
 # 환경 변수 로드
 load_dotenv()
 
-# 데이터베이스 설정
-db_pw = os.getenv("MARIA_DB_PASSWORD")
-db_name = os.getenv("MARIA_DB_NAME")
 
-# 백엔드 API URL
-BACKEND_URL = "http://127.0.0.1:5001"
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# 세션에는 결과 핸들(run_id, 지표)만 두고 주가/거래 내역은 필요할 때 백엔드에서 다시 받음.
+# 받은 데이터는 서버 프로세스 전체에서 공유하는 st.cache_data에 아래 개수까지만 보관
+STOCK_DATA_CACHE_ENTRIES = 64
+RUN_TRADES_CACHE_ENTRIES = 64
+# 세션별로 보관하는 차트 Figure / 거래 내역 표 수 (가장 오래 안 본 것부터 제거)
+MAX_CHART_FIGURES = 4
+MAX_TRADE_TABLES = 8
+# 차트 이동평균선 (MA20/60/120)
+CHART_FEATURES = "SMA:20,SMA:60,SMA:120"
+# 재실행(전체/영역별) 소요 시간 표시 여부
+SHOW_RERUN_TIMINGS = os.getenv("SHOW_RERUN_TIMINGS", "true").lower() not in ("0", "false", "no")
 
 
 def load_css():
@@ -49,8 +59,7 @@ def initialize_session_state():
         'ticker': "",
         'start_date': datetime.date.today() - datetime.timedelta(days=365),
         'end_date': datetime.date.today(),
-        'stock_data': None,
-        'backtest_results': None,
+        'backtest_handle': None,
         'strategy_code': """# 여기에 전략 코드를 입력하세요.""",
         'llm_chat_history': [],
         'saved_strategy_names': ["직접 코드 입력/생성"],
@@ -60,9 +69,13 @@ def initialize_session_state():
         'strategy_selector': "직접 코드 입력/생성",
         'selected_stocks': [],
         'multi_backtest_results': {},
-        'multi_stock_data': {},
+        'trade_fee_pct': 0.015,
+        'sell_tax_pct': 0.2,
+        'chart_figures': OrderedDict(),
+        'trade_tables': OrderedDict(),
         'is_multi_mode': False,
         'ticker_found': False,
+        'company_search': {"query": "", "results": [], "error": None},
     }
 
     for key, default_value in default_values.items():
@@ -77,49 +90,39 @@ st.set_page_config(
     layout="wide"
 )
 
+# 전체 스크립트 재실행 시간 측정 시작
+rerun_started = time.perf_counter()
+
 # CSS 로드 및 세션 상태 초기화
 load_css()
 initialize_session_state()
 
-db_config = {
-    'host': 'localhost',
-    'user': 'stockuser',
-    'password': db_pw,
-    'database': db_name,
-    'port': 3307,
-    'charset': 'utf8mb4'
-}
+# === 종목 검색 함수 (백엔드 /api/companies) ===
+@st.cache_data(ttl=600, max_entries=256, show_spinner=False)
+def search_companies(query, limit=20):
+    """회사명, 티커 또는 초성(예: ㅅㅅㅈㅈ)으로 종목을 검색합니다.
+
+    Returns:
+        list: [(회사명, 코드), ...] 가장 잘 맞는 순서
+    """
+    if not query.strip():
+        return []
+    response = http_client.get("/api/companies/search", params={"q": query, "limit": limit})
+    response.raise_for_status()
+    return [(item["company"], item["code"]) for item in response.json().get("results", [])]
+
 
-# === 데이터베이스 관련 함수 ===
 def get_company_code(company_name):
-    """회사명으로 주식 코드를 조회합니다."""
-  
-    conn = None
+    """회사명으로 주식 코드를 조회합니다 (정확히 일치하는 회사만)."""
     try:
-        conn = pymysql.connect(**db_config)
-        cursor = conn.cursor()
-        
-        query = "SELECT code FROM company_info WHERE company = %s"
-        cursor.execute(query, (company_name,))
-        result = cursor.fetchone()
-        
-        return result[0] if result else None
-        
-    except Exception as e:
-        print(f"Database error: {e}")
+        response = http_client.get("/api/companies/search", params={"q": company_name, "limit": 1})
+        response.raise_for_status()
+        results = response.json().get("results", [])
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Company search error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
-
-# ① 모든 회사·티커 불러오기 (캐싱!)
-@st.cache_data
-def load_company_options():
-    conn = pymysql.connect(**db_config)
-    df  = pd.read_sql("SELECT company, code FROM company_info", conn)
-    conn.close()
-    # [(회사명, 코드), ...] 형태로 반환
-    return list(df.itertuples(index=False, name=None))      # ex) [("한화오션", "042660"), ...]
+    return results[0]["code"] if results and results[0]["match"] == "exact" else None
+
 
 def company_select_on_change():
     """
@@ -137,6 +140,8 @@ def company_select_on_change():
     #     return
 
     # name, code = m.groups()
+    if not st.session_state.company_select_widget:
+        return
     name, code = st.session_state.company_select_widget
     st.session_state.company_name_buffer = name
     st.session_state.ticker               = code
@@ -195,22 +200,18 @@ def remove_stock_from_list(ticker: str):
         st.session_state.is_multi_mode = False
 
     if not st.session_state.selected_stocks:
-        st.session_state.stock_data        = None
-        st.session_state.backtest_results  = None
-        st.session_state.candlestick_fig   = None
+        st.session_state.backtest_handle   = None
 
 def clear_all_stocks():
     """모든 선택된 종목을 제거합니다."""
     st.session_state.selected_stocks = []
     st.session_state.is_multi_mode = False
     st.session_state.multi_backtest_results = {}
-    st.session_state.multi_stock_data = {}
-    st.session_state.stock_data = None
-    st.session_state.backtest_results = None
+    st.session_state.backtest_handle = None
 
 
 # === API 호출 함수 ===
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, max_entries=STOCK_DATA_CACHE_ENTRIES)
 def fetch_data_cached(ticker, start_date, end_date):
     # # ----------------- 날짜 버퍼 로직 (수정 부분) -----------------
     # lookback_days = max_window * 2                     # 여유분 포함
@@ -224,15 +225,16 @@ def fetch_data_cached(ticker, start_date, end_date):
 def fetch_data(ticker, start_date, end_date):
 
     """백엔드 API에서 주식 데이터를 조회합니다."""
-    api_endpoint = f"{BACKEND_URL}/api/stock_data"
+    api_path = "/api/stock_data"
     params = {
         "ticker": ticker,
         "start_date": start_date.strftime("%Y-%m-%d"),
-        "end_date": end_date.strftime("%Y-%m-%d")
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "features": CHART_FEATURES # 차트 이동평균선은 백엔드 피처 저장소에서 미리 계산된 값을 사용
     }
     
     try:
-        response = requests.get(api_endpoint, params=params, timeout=20)
+        response = http_client.get(api_path, params=params)
         response.raise_for_status()
         data_dict = response.json()
         
@@ -244,8 +246,8 @@ def fetch_data(ticker, start_date, end_date):
         df.index = pd.to_datetime(df.index)
         
         # 수치 데이터 변환
-        for col in ["Open", "High", "Low", "Close", "Volume"]:
-            if col in df.columns:
+        for col in df.columns:
+            if col in OHLCV_COLUMNS or col.startswith("SMA_"):
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         
         df.sort_index(inplace=True)
@@ -263,44 +265,126 @@ def fetch_data(ticker, start_date, end_date):
         return None
 
 
-def call_llm_api(history, message, image_bytes=None):
-    """LLM API를 호출하여 AI 응답을 받습니다."""
-    api_endpoint = f"{BACKEND_URL}/api/llm_chat"
-    payload = {"history": history, "message": message}
-    
+def stream_llm_api(history, message, image_bytes=None, outcome=None):
+    """LLM 응답을 SSE(/api/llm_chat/stream)로 받아 토큰이 도착하는 대로 텍스트 조각을 내보냅니다.
+
+    st.write_stream에 그대로 넘길 수 있는 제너레이터입니다. 스트림이 끝나면 `outcome`에
+    "done" 이벤트 내용(response, usage, ttft_ms, elapsed_ms, context, code, validation) 또는
+    "error"를 채웁니다. 코드 검증 라운드마다 `outcome["on_validation"]`(있으면)을 호출합니다.
+    """
+    api_path = "/api/llm_chat/stream"
+    outcome = {} if outcome is None else outcome
+
     if image_bytes:
-        payload["image"] = base64.b64encode(image_bytes).decode("utf-8")
-    
+        # 이미지는 base64(+33%) 없이 원본 바이트 그대로 multipart로 전송 (형식 판별/축소는 백엔드에서)
+        request_kwargs = {
+            "data": {"message": message, "history": json.dumps(history, ensure_ascii=False)},
+            "files": {"image": ("chart", image_bytes, "application/octet-stream")},
+        }
+    else:
+        request_kwargs = {"json": {"history": history, "message": message}}
+
     try:
-        response = requests.post(api_endpoint, json=payload, timeout=120)
-        response.raise_for_status()
-        return response.json()
+        with http_client.post(api_path, stream=True, **request_kwargs) as response:
+            # 첫 토큰 전에 실패하면 (API 키, 요청 한도 등) 상태 코드와 함께 JSON 오류가 옴
+            if response.headers.get("Content-Type", "").startswith("application/json"):
+                outcome["error"] = response.json().get("error", f"HTTP {response.status_code}")
+                return
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            event = None
+            # chunk_size=None: 받은 만큼 바로 처리 (버퍼가 찰 때까지 기다리지 않음)
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "delta":
+                        yield data["text"]
+                    elif event == "validation" and outcome.get("on_validation"):
+                        outcome["on_validation"](data)
+                    elif event == "done":
+                        outcome.update(data)
+                    elif event == "error":
+                        outcome["error"] = data["error"]
     except requests.exceptions.Timeout:
-        st.error("AI 챗봇 요청 시간 초과 (Timeout > 120초).")
-        return {"error": "AI 챗봇 요청 시간 초과"}
+        outcome["error"] = "AI 챗봇 응답 대기 시간 초과"
     except requests.exceptions.RequestException as e:
-        st.error(f"AI 챗봇 요청 실패: {e}")
-        return {"error": f"AI 챗봇 요청 실패: {e}"}
-    except Exception as e:
-        st.error(f"AI 챗봇 응답 처리 중 오류 발생: {e}")
-        return {"error": f"AI 챗봇 응답 처리 중 오류 발생: {e}"}
+        outcome["error"] = f"AI 챗봇 요청 실패: {e}"
+    except ValueError as e:
+        outcome["error"] = f"AI 챗봇 응답 처리 중 오류 발생: {e}"
+
+    if "response" not in outcome:
+        outcome.setdefault("error", "AI 응답 스트림이 중간에 끊겼습니다.")
+
+
+def format_llm_stats(meta):
+    """AI 응답의 토큰 수와 지연 시간을 한 줄로 표시합니다."""
+    parts = []
+    usage = meta.get("usage")
+    if usage:
+        parts.append(f"입력 {usage['prompt_tokens']:,} 토큰 (캐시 {usage.get('cached_tokens', 0):,})")
+        parts.append(f"출력 {usage['completion_tokens']:,} 토큰")
+    if meta.get("ttft_ms") is not None:
+        parts.append(f"첫 토큰 {meta['ttft_ms'] / 1000:.1f}초")
+    if meta.get("elapsed_ms") is not None:
+        parts.append(f"전체 {meta['elapsed_ms'] / 1000:.1f}초")
+    context = meta.get("context") or {}
+    if context.get("dropped_messages"):
+        action = "요약" if context.get("summarized") else "생략"
+        parts.append(f"이전 메시지 {context['dropped_messages']}개 {action}")
+    return " · ".join(parts)
+
+
+def format_validation_round(round_result):
+    """코드 검증 한 라운드의 진행 상황 문구입니다."""
+    if round_result.get("ok"):
+        return f"✅ 코드 검증 통과 (라운드 {round_result['round'] + 1})"
+    return f"🔧 코드 검증 실패, AI에게 수정 요청 중... (라운드 {round_result['round'] + 1}: {round_result['errors'][0]})"
+
+
+def display_code_validation(meta):
+    """AI 응답 코드의 자동 검증 결과(샘플 데이터 실행)를 표시합니다."""
+    validation = meta.get("validation")
+    if not validation:
+        return
+    repairs = validation.get("repair_rounds", 0)
+    if validation.get("ok"):
+        counts = validation.get("signal_counts") or {}
+        st.caption(
+            f"✅ 코드 자동 검증 통과 · 샘플 실행 {validation['runtime_ms']:.1f}ms · "
+            f"매수 {counts.get('buy', 0)} / 매도 {counts.get('sell', 0)} 신호 · 자동 수정 {repairs}회"
+        )
+        for warning in validation.get("warnings", []):
+            st.caption(f"⚠️ {warning}")
+        if repairs and meta.get("code"):
+            with st.expander("자동 수정된 코드 (편집기에 반영됨)"):
+                st.code(meta["code"], language="python")
+    else:
+        errors = "\n".join(f"- {error}" for error in validation.get("errors", []))
+        st.warning(f"코드 자동 검증 실패 (자동 수정 {repairs}회), 편집기에 반영하지 않았습니다.\n{errors}")
 
 
-def run_backend_backtest(stock_df, strategy_code_str, initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct):
-    """백엔드에서 백테스트를 실행합니다."""
-    api_endpoint = f"{BACKEND_URL}/api/backtest"
-    data_dict = {str(idx): row.to_dict() for idx, row in stock_df.iterrows()}
+def run_backend_backtest(stock_df, strategy_code_str, initial_capital, stop_loss_pct, trade_fee_pct, sell_tax_pct, ticker=None, strategy_name=None):
+    """백엔드에서 백테스트를 실행하고 결과 핸들 (run_id, metrics, trade_summary)을 반환합니다."""
+    api_path = "/api/backtest"
+    # 지표 컬럼은 제외하고 OHLCV만 전송 (지표는 백엔드가 `indicators`로 제공)
+    ohlcv_df = stock_df[[col for col in OHLCV_COLUMNS if col in stock_df.columns]]
+    data_dict = {str(idx): row.to_dict() for idx, row in ohlcv_df.iterrows()}
     payload = {
         "data": data_dict,
+        "ticker": ticker,
+        "strategy_name": strategy_name, # 실행 이력(/api/runs)에 기록될 전략 이름
         "strategy_code": strategy_code_str,
         "initial_capital": initial_capital,
         "stop_loss_pct": stop_loss_pct,
         "trade_fee_pct": trade_fee_pct,
-        "sell_tax_pct": sell_tax_pct
+        "sell_tax_pct": sell_tax_pct,
+        "result_handle": True # 지표와 run_id만 받고 거래 내역은 필요할 때 /api/runs에서 조회
     }
     
     try:
-        response = requests.post(api_endpoint, json=payload, timeout=60)
+        response = http_client.post(api_path, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.Timeout:
@@ -335,25 +419,65 @@ def run_single_backtest(stock, settings):
             settings['initial_capital'],
             settings['stop_loss_pct'],
             settings['trade_fee_pct'],
-            settings['sell_tax_pct']
+            settings['sell_tax_pct'],
+            ticker=stock['ticker'],
+            strategy_name=settings.get('strategy_name')
         )
 
         if 'error' in result:
             return {'error': f"{stock['name']} 백테스트 실패: {result['error']}"}
 
+        # 세션에는 가벼운 핸들만 보관 (주가/거래 내역은 load_result_detail로 다시 조회)
         return {
-            'stock_data': data,
-            'backtest_results': result,
-            'stock_info': stock
+            'ticker': stock['ticker'],
+            'name': stock['name'],
+            'start_date': settings['start_date'],
+            'end_date': settings['end_date'],
+            'run_id': result.get('run_id'),
+            'metrics': result.get('metrics', {}),
+            'trade_summary': result.get('trade_summary', {}),
+            'result_hash': result_fingerprint(stock['ticker'], settings, result)
         }
 
     except Exception as e:
         return {'error': f"{stock['name']} 처리 중 오류: {str(e)}"}
 
 
-def run_multi_backtest_parallel(stocks, settings, max_workers=3):
-    """병렬로 다중 종목 백테스트를 실행합니다."""
+def result_fingerprint(ticker, settings, backtest_results):
+    """차트 캐시 키로 쓰는 백테스트 결과 해시 (종목, 기간, 결과가 같으면 같은 값)."""
+    payload = json.dumps(
+        [ticker, str(settings['start_date']), str(settings['end_date']), backtest_results],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@st.cache_data(ttl=3600, max_entries=RUN_TRADES_CACHE_ENTRIES, show_spinner=False)
+def fetch_run_trades(run_id):
+    """저장된 실행의 전체 거래 내역을 조회합니다 (실패는 캐시하지 않도록 예외로 전달)."""
+    response = http_client.get(f"/api/runs/{run_id}", params={"include_equity": "false"})
+    response.raise_for_status()
+    return response.json().get("trades", [])
+
+
+def load_handle_trades(handle):
+    """결과 핸들의 거래 내역을 백엔드(캐시)에서 가져옵니다. 실패 시 None."""
+    if handle.get('run_id') is None:
+        return None
+    try:
+        return fetch_run_trades(handle['run_id'])
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(f"거래 내역 조회 실패: {e}")
+        return None
+
+
+def run_multi_backtest_parallel(stocks, settings, max_workers=None):
+    """병렬로 다중 종목 백테스트를 실행합니다.
+
+    max_workers를 주지 않으면 백엔드가 알려주는 처리 용량(/api/capacity)에 맞춰 동시 요청 수를 정합니다.
+    """
     results = {}
+    max_workers = max_workers or http_client.fanout_workers(len(stocks))
 
     # 진행 상황 표시
     progress_bar = st.progress(0)
@@ -392,11 +516,11 @@ def run_multi_backtest_parallel(stocks, settings, max_workers=3):
 # === 전략 관리 함수 ===
 def fetch_strategies(name=None):
     """저장된 전략 목록을 조회하거나 특정 전략의 코드를 가져옵니다."""
-    api_endpoint = f"{BACKEND_URL}/api/strategies"
+    api_path = "/api/strategies"
     params = {"name": name} if name else {}
     
     try:
-        response = requests.get(api_endpoint, params=params, timeout=10)
+        response = http_client.get(api_path, params=params)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -406,11 +530,11 @@ def fetch_strategies(name=None):
 
 def save_strategy_code(name, code):
     """전략 코드를 백엔드에 저장합니다."""
-    api_endpoint = f"{BACKEND_URL}/api/strategies"
+    api_path = "/api/strategies"
     payload = {"name": name, "code": code}
     
     try:
-        response = requests.post(api_endpoint, json=payload, timeout=10)
+        response = http_client.post(api_path, json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -420,10 +544,10 @@ def save_strategy_code(name, code):
 
 def delete_strategy_code(name):
     """백엔드에서 전략을 삭제합니다."""
-    api_endpoint = f"{BACKEND_URL}/api/strategies/{name}"
+    api_path = f"/api/strategies/{name}"
     
     try:
-        response = requests.delete(api_endpoint, timeout=10)
+        response = http_client.delete(api_path)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -485,19 +609,41 @@ def format_won(n):
 
 
 # === 결과 표시 함수 ===
-def display_candlestick_chart(stock_data, ticker, trades, title_suffix=""):
-    """캔들스틱 차트를 표시합니다."""
-    if stock_data is not None and not stock_data.empty:
+def cached_chart_figure(ticker, result_hash):
+    """세션에 보관된 (종목, 결과 해시)의 차트 Figure, 없으면 None."""
+    figures = st.session_state.setdefault("chart_figures", OrderedDict())
+    fig = figures.get((ticker, result_hash)) if result_hash else None
+    if fig is not None:
+        figures.move_to_end((ticker, result_hash))
+    return fig
+
+
+def display_candlestick_chart(stock_data, ticker, trades, title_suffix="", result_hash=None):
+    """캔들스틱 차트를 표시합니다.
+
+    result_hash가 주어지면 만든 Figure를 (종목, 결과 해시)별로 세션에 최대 MAX_CHART_FIGURES개까지 보관해
+    재실행 시 다시 만들지 않습니다 (이때 stock_data는 None이어도 됨).
+    """
+    fig = cached_chart_figure(ticker, result_hash)
+    if fig is None:
+        if stock_data is None or stock_data.empty:
+            st.info("차트를 표시할 데이터가 없습니다.")
+            return
         try:
             fig = create_candlestick_chart(stock_data, ticker, trades)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True, key=f"chart_{ticker}")
-            else:
-                st.error("차트 생성에 실패했습니다.")
         except Exception as e:
             st.error(f"차트 생성 중 오류 발생: {e}")
+            return
+        if fig and result_hash:
+            figures = st.session_state.chart_figures
+            figures[(ticker, result_hash)] = fig
+            while len(figures) > MAX_CHART_FIGURES:
+                figures.popitem(last=False)
+
+    if fig:
+        st.plotly_chart(fig, use_container_width=True, key=f"chart_{ticker}")
     else:
-        st.info("차트를 표시할 데이터가 없습니다.")
+        st.error("차트 생성에 실패했습니다.")
 
 
 def colored_metric(label, value, delta="", color="#f5f5f5", help_text=None):
@@ -597,97 +743,132 @@ def display_performance_metrics(metrics, title_suffix=""):
         st.warning("성과 지표를 계산할 수 없습니다.")
 
 
-def display_trade_history(trades, title_suffix=""):
-    """거래 내역을 표시합니다."""
-    if trades:
-        trades_df = pd.DataFrame(trades)
-        if not trades_df.empty:
-            # 통계 계산
-            profit_mask = trades_df["return_pct"] > 0
-            count_profit = int(profit_mask.sum())
-            count_loss = int((~profit_mask).sum())
-            total_trades = count_profit + count_loss
+# 거래 내역 표의 컬럼 이름과 순서
+TRADE_COLUMN_LABELS = {
+    "buy_date": "매수일 (Buy Date)",
+    "buy_price": "매수 가격 (Buy Price)",
+    "buy_qty": "매수 수량 (Quantity)",
+    "buy_fee": "매수 수수료 (Buy Fee)",
+    "total_buy_amount": "매수 총액 (수수료 포함)",
+    "sell_date": "매도일 (Sell Date)",
+    "sell_price": "매도 가격 (Sell Price)",
+    "sell_fee": "매도 수수료 (Sell Fee)",
+    "sell_tax": "매도 세금 (Sell Tax)",
+    "total_sell_amount": "매도 총액 (수수료, 세금 포함)",
+    "exit_type": "매도 형태 (Sell Type)",
+    "profit_loss": "손익 (Profit/Loss)",
+    "return_pct": "수익률 (Return %)",
+    "holding_period": "보유 기간 (Holding Days)",
+}
+TRADE_PAGE_SIZES = [50, 100, 500, 1000]
+
+
+def trade_column_config():
+    """거래 내역 컬럼 설정: 숫자/날짜는 원래 타입 그대로 두고 표시 형식만 지정합니다 (정렬도 숫자 기준)."""
+    labels = TRADE_COLUMN_LABELS
+    amount = lambda key: st.column_config.NumberColumn(labels[key], format="localized")
+    return {
+        labels["buy_date"]: st.column_config.DateColumn(labels["buy_date"], format="YYYY-MM-DD"),
+        labels["sell_date"]: st.column_config.DateColumn(labels["sell_date"], format="YYYY-MM-DD"),
+        labels["buy_price"]: amount("buy_price"),
+        labels["sell_price"]: amount("sell_price"),
+        labels["buy_qty"]: amount("buy_qty"),
+        labels["buy_fee"]: amount("buy_fee"),
+        labels["total_buy_amount"]: amount("total_buy_amount"),
+        labels["sell_fee"]: amount("sell_fee"),
+        labels["sell_tax"]: amount("sell_tax"),
+        labels["total_sell_amount"]: amount("total_sell_amount"),
+        labels["profit_loss"]: amount("profit_loss"),
+        labels["return_pct"]: st.column_config.NumberColumn(labels["return_pct"], format="%.2f%%"),
+        labels["holding_period"]: st.column_config.NumberColumn(labels["holding_period"], format="%d"),
+        labels["exit_type"]: st.column_config.TextColumn(labels["exit_type"]),
+    }
+
+
+def prepare_trade_table(trades):
+    """거래 목록을 표시용 DataFrame(타입 유지)과 통계로 변환합니다."""
+    trades_df = pd.DataFrame(trades)
 
+    # 통계 계산
+    profit_mask = trades_df["return_pct"] > 0
+    count_profit = int(profit_mask.sum())
+    count_loss = int((~profit_mask).sum())
+    stats = {
+        "count_profit": count_profit,
+        "count_loss": count_loss,
+        "total_trades": count_profit + count_loss,
+        "avg_holding_days": trades_df["holding_period"].mean() if "holding_period" in trades_df.columns else None,
+    }
+
+    # 데이터 정렬 (매도일 순)
+    trades_df["buy_date"] = pd.to_datetime(trades_df["buy_date"])
+    trades_df["sell_date"] = pd.to_datetime(trades_df["sell_date"])
+    trades_df = trades_df.sort_values(by="sell_date", ignore_index=True)
+    trades_df["exit_type"] = trades_df["exit_type"].map({
+        "signal": "일반",
+        "stop_loss": "손절",
+        "final_close": "종료"
+    }).fillna("일반") if "exit_type" in trades_df.columns else "일반"
+
+    columns = [column for column in TRADE_COLUMN_LABELS if column in trades_df.columns]
+    table = trades_df[columns].rename(columns=TRADE_COLUMN_LABELS).dropna(how="all")
+    table.index = pd.RangeIndex(start=1, stop=len(table) + 1, name="거래 순서")
+    return table, stats
+
+
+def cached_trade_table(trades, cache_key=None):
+    """prepare_trade_table 결과를 결과(cache_key)별로 세션에 최대 MAX_TRADE_TABLES개까지 보관합니다."""
+    if cache_key is None:
+        return prepare_trade_table(trades)
+    tables = st.session_state.setdefault("trade_tables", OrderedDict())
+    if cache_key in tables:
+        tables.move_to_end(cache_key)
+        return tables[cache_key]
+    tables[cache_key] = prepare_trade_table(trades)
+    while len(tables) > MAX_TRADE_TABLES:
+        tables.popitem(last=False)
+    return tables[cache_key]
+
+
+def display_trade_history(trades, title_suffix="", key="trades", cache_key=None):
+    """거래 내역을 표시합니다.
+
+    표는 페이지 단위로 나눠 현재 페이지만 브라우저로 보냅니다. 정렬은 전체 거래 기준으로 적용됩니다.
+    """
+    if trades:
+        trades_display_df, stats = cached_trade_table(trades, cache_key)
+        if not trades_display_df.empty:
+            count_profit, count_loss, total_trades = stats["count_profit"], stats["count_loss"], stats["total_trades"]
             profit_pct = (count_profit / total_trades * 100) if total_trades else 0.0
             loss_pct = (count_loss / total_trades * 100) if total_trades else 0.0
-
-            if "holding_period" in trades_df.columns:
-                avg_holding_days = trades_df["holding_period"].mean()
-                avg_holding_txt = f"{avg_holding_days:.1f}일"
+            avg_holding_txt = f"{stats['avg_holding_days']:.1f}일" if stats["avg_holding_days"] is not None else "—"
+
+            # 정렬 및 페이지 선택
+            col_sort, col_order, col_size, col_page = st.columns([3, 2, 2, 2])
+            with col_sort:
+                sort_column = st.selectbox("정렬 기준", ["거래 순서"] + list(trades_display_df.columns), key=f"{key}_sort")
+            with col_order:
+                descending = st.toggle("내림차순", key=f"{key}_desc")
+            with col_size:
+                page_size = st.selectbox("페이지당 거래 수", TRADE_PAGE_SIZES, index=1, key=f"{key}_page_size")
+            pages = max((len(trades_display_df) + page_size - 1) // page_size, 1)
+            with col_page:
+                page = st.number_input(f"페이지 (/{pages})", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+
+            if sort_column == "거래 순서":
+                sorted_df = trades_display_df.iloc[::-1] if descending else trades_display_df
             else:
-                avg_holding_txt = "—"
-
-            # 데이터 정렬 및 포맷팅
-            trades_df['buy_date'] = pd.to_datetime(trades_df['buy_date'])
-            trades_df['sell_date'] = pd.to_datetime(trades_df['sell_date'])
-            trades_df = trades_df.sort_values(by='sell_date', ignore_index=True)
-            trades_df.index = pd.RangeIndex(start=1, stop=len(trades_df)+1)
-            trades_df.index.name = "거래 순서"
-
-            # 컬럼명 변경
-            trades_display_df = trades_df.rename(columns={
-                "buy_date": "매수일 (Buy Date)",
-                "buy_price": "매수 가격 (Buy Price)",
-                "sell_date": "매도일 (Sell Date)",
-                "sell_price": "매도 가격 (Sell Price)",
-                "profit_loss": "손익 (Profit/Loss)",
-                "return_pct": "수익률 (Return %)",
-                "buy_qty": "매수 수량 (Quantity)",
-                "buy_fee": "매수 수수료 (Buy Fee)",
-                "total_buy_amount": "매수 총액 (수수료 포함)",
-                "sell_fee": "매도 수수료 (Sell Fee)",
-                "sell_tax": "매도 세금 (Sell Tax)",
-                "total_sell_amount": "매도 총액 (수수료, 세금 포함)",
-                "exit_type": "매도 형태 (Sell Type)",
-                "holding_period": "보유 기간 (Holding Days)"
-            })
-
-            # 날짜 포맷팅
-            trades_display_df["매수일 (Buy Date)"] = trades_display_df["매수일 (Buy Date)"].dt.strftime("%Y-%m-%d")
-            trades_display_df["매도일 (Sell Date)"] = trades_display_df["매도일 (Sell Date)"].dt.strftime("%Y-%m-%d")
-
-            # 수치 포맷팅
-            numeric_columns = [
-                "매수 가격 (Buy Price)", "매도 가격 (Sell Price)", "손익 (Profit/Loss)",
-                "매수 수수료 (Buy Fee)", "매수 총액 (수수료 포함)", "매도 수수료 (Sell Fee)",
-                "매도 세금 (Sell Tax)", "매도 총액 (수수료, 세금 포함)", "보유 기간 (Holding Days)"
-            ]
-            
-            for col in numeric_columns:
-                if col in trades_display_df.columns:
-                    trades_display_df[col] = trades_display_df[col].map("{:,.0f}".format)
-            
-            trades_display_df["수익률 (Return %)"] = trades_display_df["수익률 (Return %)"].map("{:.2f}%".format)
-            trades_display_df["매도 형태 (Sell Type)"] = trades_display_df["매도 형태 (Sell Type)"].map({
-                "signal": "일반",
-                "stop_loss": "손절",
-                "final_close": "종료"
-            }).fillna("일반")
-
-            # 컬럼 순서 정렬
-            ordered_columns = [
-                "매수일 (Buy Date)", "매수 가격 (Buy Price)", "매수 수량 (Quantity)",
-                "매수 수수료 (Buy Fee)", "매수 총액 (수수료 포함)", "매도일 (Sell Date)",
-                "매도 가격 (Sell Price)", "매도 수수료 (Sell Fee)", "매도 세금 (Sell Tax)",
-                "매도 총액 (수수료, 세금 포함)", "매도 형태 (Sell Type)", "손익 (Profit/Loss)",
-                "수익률 (Return %)", "보유 기간 (Holding Days)"
-            ]
-
-            trades_display_df = trades_display_df[ordered_columns]
-            trades_display_df = trades_display_df.dropna(how='all')
+                sorted_df = trades_display_df.sort_values(sort_column, ascending=not descending, kind="stable")
+            page = min(int(page), pages)
 
             # 데이터프레임 표시
-            column_configs = {
-                col: st.column_config.TextColumn(label=col, width="medium", default="")
-                for col in trades_display_df.columns
-            }
-
             st.dataframe(
-                trades_display_df,
+                sorted_df.iloc[(page - 1) * page_size:page * page_size],
                 use_container_width=True,
                 hide_index=False,
-                column_config=column_configs
+                column_config=trade_column_config()
             )
+            st.caption(f"전체 {len(trades_display_df):,}건 중 {(page - 1) * page_size + 1:,}–{min(page * page_size, len(trades_display_df)):,}번째")
 
             # 통계 요약
             st.markdown("<br>", unsafe_allow_html=True)
@@ -719,121 +900,152 @@ def display_trade_history(trades, title_suffix=""):
         st.info("거래 내역이 없습니다.")
 
 
-# === 초기 전략 목록 로드 ===
-if 'saved_strategy_names' not in st.session_state or st.session_state.saved_strategy_names == ["직접 코드 입력/생성"]:
-    load_strategy_list()
-
-
-# === 메인 UI 레이아웃 ===
-
-# 사이드바 - 설정 패널
-with st.sidebar:
-    st.header("⚙️ 설정")
-
-    # 1. 종목 선택 섹션
-    st.subheader("종목 선택")
-
-    # 회사명 입력과 종목 추가 버튼을 같은 행에 배치
-    col_input, col_add = st.columns([3, 1])
-
-    with col_input:
-        # st.text_input(
-        #     "회사 이름 (예: 삼성전자, Apple)",
-        #     value=st.session_state.company_name_buffer,
-        #     on_change=company_name_input_on_change,
-        #     key="company_name_input_widget",
-        #     label_visibility="collapsed",
-        #     placeholder="회사 이름을 입력하세요",
-        # )
-        st.selectbox(
-            "회사 이름 (예: 삼성전자, Apple)",
-            options      = load_company_options(),        # 캐싱된 리스트
-            key          = "company_select_widget",        # 새 위젯 키
-            on_change    = company_select_on_change,       # 선택 시 상태 갱신
-            placeholder  = "회사 이름을 입력하세요",          # Streamlit ≥ 1.28
-            label_visibility = "collapsed",
-            format_func   = lambda item: item[0],   # � 화면엔 회사명만!
-        )
-
-    with col_add:
-        if st.button("➕", key="add_stock_btn", help="종목 추가", use_container_width=True):
-            add_stock_to_list()
-
-    # 조회 결과 표시
-    if "ticker_found" in st.session_state:
-        if st.session_state.ticker_found:
-            st.success(f"✅ 조회된 티커: {st.session_state.ticker}")
-        elif st.session_state.company_name_buffer.strip():
-            st.warning("⚠️ 해당 회사명의 티커를 찾을 수 없습니다.")
-
-    # 선택된 종목 목록 표시
-    if st.session_state.selected_stocks:
-        st.markdown("**선택된 종목:**")
+def display_backtest_detail(handle):
+    """결과 핸들 하나의 차트, 성과 지표, 거래 내역을 표시합니다. 주가와 거래 내역은 이때 조회합니다."""
+    ticker = handle['ticker']
+    trades = load_handle_trades(handle)
 
-        for i, stock in enumerate(st.session_state.selected_stocks):
-            col_stock, col_remove = st.columns([4, 1])
+    # 캔들차트 및 매매 시점
+    st.markdown("#### 캔들차트 및 매매 시점")
+    if trades is None:
+        st.error("차트 데이터가 없습니다.")
+    elif cached_chart_figure(ticker, handle.get('result_hash')) is not None:
+        display_candlestick_chart(None, ticker, trades, result_hash=handle.get('result_hash'))
+    else:
+        stock_data = fetch_data_cached(handle['ticker'], handle['start_date'], handle['end_date'])
+        display_candlestick_chart(stock_data, ticker, trades, result_hash=handle.get('result_hash'))
 
-            with col_stock:
-                st.markdown(f"""
-                <div class="selected-stock-item">
-                    <span class="stock-info">{stock['name']}</span>
-                    <span class="stock-ticker">({stock['ticker']})</span>
-                </div>
-                """, unsafe_allow_html=True)
+    st.markdown("<br>", unsafe_allow_html=True)
 
-            # with col_remove:
-            #     if st.button("❌", key=f"remove_stock_{i}", help=f"{stock['name']} 제거"):
-            #         remove_stock_from_list(i)
-            #         st.rerun()
-            with col_remove:
-                if st.button(
-                    "❌",
-                    key=f"remove_stock_{stock['ticker']}",    # � 고정 key!
-                    help=f"{stock['name']} 제거"
-                ):
-                    remove_stock_from_list(stock["ticker"])
-                    st.rerun()
-        # 전체 삭제 버튼
-        if len(st.session_state.selected_stocks) > 1:
-            if st.button("전체 삭제", key="clear_all_stocks"):
-                clear_all_stocks()
-                st.rerun()
+    # 성과 지표
+    st.markdown("#### 성과 지표")
+    if handle.get('metrics'):
+        display_performance_metrics(handle['metrics'])
+    else:
+        st.warning("성과 지표가 없습니다.")
 
-        # 다중 모드 표시
-        if st.session_state.is_multi_mode:
-            st.info(f"다중 종목 모드 ({len(st.session_state.selected_stocks)}개 종목)")
+    st.markdown("<br>", unsafe_allow_html=True)
 
-    st.divider()
+    # 거래 내역
+    st.markdown("#### 거래 내역")
+    if trades is not None:
+        display_trade_history(trades, key=f"trades_{ticker}", cache_key=handle.get('result_hash'))
+        display_monte_carlo(trades, st.session_state.initial_capital, ticker)
+    else:
+        st.info("거래 내역이 없습니다.")
 
-    # 2. 기간 설정
-    st.subheader("기간 설정")
-    col_date1, col_date2 = st.columns(2)
 
-    with col_date1:
-        st.session_state["start_date"] = st.date_input(
-            "시작일",
-            value=st.session_state["start_date"],
-            key="start_date_input",
-        )
-    with col_date2:
-        st.session_state["end_date"] = st.date_input(
-            "종료일",
-            value=st.session_state["end_date"],
-            key="end_date_input",
-        )
+def display_multi_summary(stocks, results):
+    """다중 종목 결과의 주요 지표를 한 표로 표시합니다."""
+    rows = []
+    for stock in stocks:
+        metrics = results[stock['ticker']].get('metrics', {})
+        rows.append({
+            "종목": f"{stock['name']} ({stock['ticker']})",
+            "수익률 (%)": metrics.get('total_return'),
+            "승률 (%)": metrics.get('win_rate'),
+            "거래 수": metrics.get('num_trades'),
+            "MDD (%)": metrics.get('max_drawdown_pct'),
+            "Sharpe": metrics.get('sharpe_ratio'),
+        })
+    st.dataframe(
+        pd.DataFrame(rows),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "수익률 (%)": st.column_config.NumberColumn(format="%.2f"),
+            "승률 (%)": st.column_config.NumberColumn(format="%.2f"),
+            "거래 수": st.column_config.NumberColumn(format="%d"),
+            "MDD (%)": st.column_config.NumberColumn(format="%.2f"),
+            "Sharpe": st.column_config.NumberColumn(format="%.2f"),
+        }
+    )
 
-    # 날짜 범위 검증
-    if st.session_state.start_date >= st.session_state.end_date:
-        st.error("오류: 시작일은 종료일보다 이전이어야 합니다.")
-        start_button_disabled = True
-    else:
-        start_button_disabled = False
 
-    st.divider()
+def run_monte_carlo(trades, initial_capital, simulations, method):
+    """백엔드에서 거래 수익률 몬테카를로 시뮬레이션을 실행합니다."""
+    api_path = "/api/backtest/monte_carlo"
+    payload = {
+        "trades": [{"return_pct": trade["return_pct"]} for trade in trades], # 수익률만 전송
+        "initial_capital": initial_capital,
+        "simulations": simulations,
+        "method": method,
+    }
+    try:
+        response = http_client.post(api_path, json=payload)
+        result = response.json()
+        if response.status_code != 200 or "error" in result:
+            st.error(f"몬테카를로 시뮬레이션 실패: {result.get('error', '알 수 없는 오류')}")
+            return None
+        return result
+    except requests.exceptions.RequestException as e:
+        st.error(f"몬테카를로 시뮬레이션 요청 실패: {e}")
+        return None
 
-    # 3. 백테스트 설정
-    st.subheader("백테스트 설정")
 
+def display_monte_carlo(trades, initial_capital, key):
+    """거래 수익률을 재표본추출해 최종 자산/MDD의 신뢰 구간과 파산 확률을 표시합니다."""
+    if not trades:
+        return
+    with st.expander("🎲 몬테카를로 시뮬레이션 (거래 재표본추출)"):
+        cols = st.columns([1, 1, 1])
+        with cols[0]:
+            simulations = st.number_input("시뮬레이션 횟수", min_value=100, max_value=100000, value=10000, step=1000, key=f"mc_sims_{key}")
+        with cols[1]:
+            method = st.selectbox(
+                "방식", ["bootstrap", "permutation"], key=f"mc_method_{key}",
+                format_func=lambda m: "부트스트랩 (복원추출)" if m == "bootstrap" else "순서 섞기 (최종 자산 동일)"
+            )
+        with cols[2]:
+            st.markdown("<br>", unsafe_allow_html=True)
+            if st.button("시뮬레이션 실행", key=f"mc_run_{key}", use_container_width=True):
+                st.session_state.setdefault("monte_carlo_results", {})[key] = run_monte_carlo(trades, initial_capital, int(simulations), method)
+
+        result = st.session_state.get("monte_carlo_results", {}).get(key)
+        if result:
+            bands = pd.DataFrame({
+                "최종 자산": result["final_equity"],
+                "총 수익률 (%)": result["total_return_pct"],
+                "최대 낙폭 MDD (%)": result["max_drawdown_pct"],
+            }).T[["p5", "p25", "p50", "p75", "p95"]]
+            st.dataframe(bands.style.format("{:,.2f}"), use_container_width=True)
+            colored_metric(
+                f"파산 확률 (자산 {result['ruin_threshold_pct']:.0f}% 이상 손실)",
+                f"{result['probability_of_ruin'] * 100:.2f}%",
+                color="#FDEDEC",
+                help_text=f"{result['simulations']:,}회 시뮬레이션 중 자산이 한 번이라도 기준 이하로 떨어진 비율"
+            )
+            equity_bands = pd.DataFrame(result["equity_bands"]).set_index("trade")
+            st.line_chart(equity_bands[["p5", "p50", "p95"]])
+
+
+# === 프래그먼트 영역 ===
+# 각 영역은 st.fragment로 독립적으로 재실행됩니다 (채팅 입력이나 코드 편집 시 결과 차트를 다시 그리지 않음).
+def show_rerun_timing(region, started):
+    """영역 실행 시간을 기록하고 작게 표시합니다."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    st.session_state.setdefault("rerun_timings", {})[region] = elapsed_ms
+    if SHOW_RERUN_TIMINGS:
+        st.caption(f"⏱ {region} {elapsed_ms:,.0f} ms")
+
+
+def timed_fragment(region):
+    """함수를 st.fragment로 만들고 실행할 때마다 소요 시간을 표시합니다."""
+    def decorator(func):
+        @st.fragment
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            show_rerun_timing(region, started)
+            return result
+        return wrapper
+    return decorator
+
+
+@timed_fragment("백테스트 설정")
+def render_backtest_settings():
+    """초기 자본금, 손절, 수수료, 거래세 입력 영역입니다."""
     # 초기 자본금 입력창
     input_str = st.text_input(
         "초기 자본금",
@@ -859,9 +1071,9 @@ with st.sidebar:
         "매매 수수료 (%)", value="0.015", help="키움증권 영웅문 기준, 0.015%입니다."
     )
     try:
-        trade_fee_pct = float(trade_fee_str)
+        st.session_state.trade_fee_pct = float(trade_fee_str)
     except ValueError:
-        trade_fee_pct = 0.0
+        st.session_state.trade_fee_pct = 0.0
 
     # 매도세
     sell_tax = st.number_input(
@@ -869,12 +1081,12 @@ with st.sidebar:
         min_value=0.0, max_value=100.0, value=0.2, step=0.1,
         help="매도 거래에만 발생합니다."
     )
+    st.session_state.sell_tax_pct = sell_tax
 
-    st.divider()
-
-    # 4. 전략 설정
-    st.subheader("📊 전략 설정")
 
+@timed_fragment("AI 대화")
+def render_chat_panel():
+    """LLM 전략 대화 영역입니다."""
     # LLM Chat Expander
     chat_expander = st.expander("🤖 AI와 전략 대화하기", expanded=st.session_state.show_chat)
     with chat_expander:
@@ -882,10 +1094,13 @@ with st.sidebar:
         for message in st.session_state.llm_chat_history:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
+                if message.get("meta"):
+                    display_code_validation(message["meta"])
+                    st.caption(format_llm_stats(message["meta"]))
 
         uploaded_file = st.file_uploader(
             "차트 이미지 첨부 (선택 사항)",
-            type=["png", "jpg", "jpeg"],
+            type=["png", "jpg", "jpeg", "webp"],
             key=f"chat_image_uploader_{st.session_state.chat_image_uploader_key}"
         )
         if uploaded_file is not None:
@@ -910,27 +1125,42 @@ with st.sidebar:
             st.session_state.uploaded_image = None
             st.session_state.chat_image_uploader_key += 1
 
-            with st.spinner("AI 응답 생성 중..."):
-                llm_result = call_llm_api(st.session_state.llm_chat_history, user_message_content, image_bytes_to_send)
-
-            if llm_result and "response" in llm_result:
-                response_content = llm_result["response"]
-                assistant_message_payload = {"role": "assistant", "content": response_content}
+            # 토큰이 도착하는 대로 표시 (첫 토큰까지만 기다림)
+            with st.chat_message("assistant"):
+                response_area = st.container()
+                # 응답에 코드가 있으면 백엔드가 샘플 데이터로 검증/자동 수정하는 동안 응답 아래에 진행 상황 표시
+                validation_status = st.empty()
+                outcome = {"on_validation": lambda round_result: validation_status.caption(format_validation_round(round_result))}
+                with response_area:
+                    st.write_stream(stream_llm_api(st.session_state.llm_chat_history, user_message_content, image_bytes_to_send, outcome))
+
+            if "response" in outcome:
+                response_content = outcome["response"]
+                # meta(토큰 수, 지연 시간)는 표시용이며 백엔드는 role/content만 사용
+                assistant_message_payload = {
+                    "role": "assistant",
+                    "content": response_content,
+                    "meta": {key: outcome.get(key) for key in ("usage", "ttft_ms", "elapsed_ms", "context", "validation", "code")},
+                }
                 st.session_state.llm_chat_history.append(assistant_message_payload)
 
-                code_blocks = [block.strip("python\n ") for block in response_content.split("```") if block.startswith("python")]
-                if code_blocks:
-                    st.session_state.strategy_code = code_blocks[-1]
-                    st.toast("✅ AI가 제안한 전략 코드로 업데이트되었습니다.")
+                # 검증을 통과한 코드만 편집기에 반영 (실패하면 응답 아래에 오류 표시)
+                if outcome.get("code"):
+                    st.session_state.strategy_code = outcome["code"]
+                    st.toast("✅ AI가 제안한 전략 코드(자동 검증 통과)로 업데이트되었습니다.")
                     st.session_state.strategy_selector = "직접 코드 입력/생성"
+                    # 전략 편집기(다른 프래그먼트)에도 새 코드를 반영하려면 전체를 다시 실행
+                    st.rerun()
 
-                st.rerun()
+                st.rerun(scope="fragment")
 
-            elif llm_result:
-                st.error(f"AI 응답 오류: {llm_result.get('error', '알 수 없는 오류')}")
             else:
-                st.error("AI 챗봇으로부터 유효한 응답을 받지 못했습니다.")
+                st.error(f"AI 응답 오류: {outcome.get('error', '알 수 없는 오류')}")
 
+
+@timed_fragment("전략 편집")
+def render_strategy_editor():
+    """저장된 전략 선택/삭제, 코드 편집, 저장 영역입니다."""
     # 저장된 전략 선택
     st.selectbox(
         "저장된 전략 선택 또는 직접 입력",
@@ -950,8 +1180,7 @@ with st.sidebar:
                     st.session_state.strategy_selector = "직접 코드 입력/생성"
                     st.session_state.strategy_code = """# 여기에 직접 전략 코드를 입력하세요."""
                     load_strategy_list()
-                    time.sleep(0.5)
-                    st.rerun()
+                    st.rerun(scope="fragment")
 
     # 전략 코드 영역
     st.text_area(
@@ -981,8 +1210,237 @@ with st.sidebar:
                     if save_result and "error" not in save_result:
                         st.toast(f"'{strategy_name_to_save}' 저장 완료.", icon="✅")
                         load_strategy_list()
-                        time.sleep(0.5)
-                        st.rerun()
+                        st.rerun(scope="fragment")
+
+
+@timed_fragment("결과")
+def render_results_panel():
+    """백테스트 결과 영역입니다."""
+    # 메인 결과 표시 로직
+    if st.session_state.is_multi_mode and st.session_state.multi_backtest_results:
+        # 다중 종목 모드 - 요약표 + 선택한 종목 상세
+        st.info(f"다중 종목 백테스트 결과 ({len(st.session_state.selected_stocks)}개 종목)")
+
+        # 성공한 종목들만 표시
+        successful_stocks = []
+        for stock in st.session_state.selected_stocks:
+            ticker = stock['ticker']
+            if ticker in st.session_state.multi_backtest_results:
+                result = st.session_state.multi_backtest_results[ticker]
+                if 'error' not in result:
+                    successful_stocks.append(stock)
+
+        if successful_stocks:
+            # 전체 종목 요약 (지표만 사용하므로 가벼움)
+            st.markdown("#### 종목별 요약")
+            display_multi_summary(successful_stocks, st.session_state.multi_backtest_results)
+
+            # 선택한 종목 하나만 차트/지표/거래 내역을 렌더링 (탭은 보이지 않는 종목까지 매번 모두 그림)
+            stock_labels = {stock['ticker']: f"{stock['name']} ({stock['ticker']})" for stock in successful_stocks}
+            if st.session_state.get("active_result_ticker") not in stock_labels:
+                st.session_state.active_result_ticker = successful_stocks[0]['ticker']
+            ticker = st.selectbox(
+                "상세 결과를 볼 종목",
+                options=list(stock_labels),
+                format_func=stock_labels.get,
+                key="active_result_ticker"
+            )
+
+            st.subheader(f"{stock_labels[ticker]} 백테스트 결과")
+            display_backtest_detail(st.session_state.multi_backtest_results[ticker])
+
+        # 오류가 발생한 종목들 표시
+        error_stocks = []
+        for stock in st.session_state.selected_stocks:
+            ticker = stock['ticker']
+            if ticker in st.session_state.multi_backtest_results:
+                result = st.session_state.multi_backtest_results[ticker]
+                if 'error' in result:
+                    error_stocks.append((stock, result['error']))
+
+        if error_stocks:
+            st.markdown("---")
+            st.error("⚠️ 다음 종목들에서 오류가 발생했습니다:")
+            for stock, error in error_stocks:
+                st.markdown(f"- **{stock['name']} ({stock['ticker']})**: {error}")
+
+    elif st.session_state.backtest_handle:
+        # 단일 종목 모드 또는 기본 결과 표시
+        st.markdown("### 백테스트 결과")
+        display_backtest_detail(st.session_state.backtest_handle)
+
+    else:
+        # 기본 안내 메시지
+        if st.session_state.is_multi_mode and st.session_state.selected_stocks:
+            st.info(f"다중 종목 모드: {len(st.session_state.selected_stocks)}개 종목이 선택되었습니다.")
+
+            # 선택된 종목 목록 표시
+            cols = st.columns(min(len(st.session_state.selected_stocks), 4))
+            for i, stock in enumerate(st.session_state.selected_stocks):
+                with cols[i % 4]:
+                    st.metric(
+                        label=stock['name'],
+                        value=stock['ticker'],
+                        help=f"선택된 종목: {stock['name']} ({stock['ticker']})"
+                    )
+
+            st.markdown("---")
+            st.info("⬅️ 왼쪽 사이드바에서 '백테스트 시작' 버튼을 클릭하여 다중 종목 백테스트를 실행하세요.")
+        else:
+            # 기본 안내 메시지
+            st.markdown("""
+            ### 백테스트 결과
+
+            #### 캔들차트 및 매매 시점
+            백테스트를 시작하면 여기에 차트가 표시됩니다.
+
+            #### 성과 지표
+            상세 지표를 표시하려면 백테스트를 시작하세요.
+
+                    
+            #### 거래 내역
+            백테스트를 시작하면 여기에 거래 내역이 표시됩니다.
+            """)
+            st.info("⬅️ 왼쪽 사이드바에서 종목을 선택하고 설정을 조정한 후 백테스트를 시작하세요.")
+
+
+# === 초기 전략 목록 로드 ===
+if 'saved_strategy_names' not in st.session_state or st.session_state.saved_strategy_names == ["직접 코드 입력/생성"]:
+    load_strategy_list()
+
+
+# === 메인 UI 레이아웃 ===
+
+# 사이드바 - 설정 패널
+with st.sidebar:
+    st.header("⚙️ 설정")
+
+    # 1. 종목 선택 섹션
+    st.subheader("종목 선택")
+
+    # 회사명/티커/초성 검색 (백엔드 종목 검색 인덱스)
+    company_query = st.text_input(
+        "종목 검색",
+        key="company_query",
+        placeholder="회사명, 티커 또는 초성 (예: 삼성, 005930, ㅅㅅㅈㅈ)",
+        label_visibility="collapsed",
+    )
+    # 검색어가 바뀐 재실행에서만 검색 (실패한 요청은 캐시되지 않으므로 재실행마다 다시 보내지 않도록)
+    company_search = st.session_state.company_search
+    if company_search["query"] != company_query:
+        try:
+            company_search.update(results=search_companies(company_query), error=None)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            company_search.update(results=[], error=str(e))
+        company_search["query"] = company_query
+    if company_search["error"]:
+        st.error(f"종목 검색 실패: {company_search['error']}")
+    company_options = company_search["results"]
+
+    # 검색 결과 선택과 종목 추가 버튼을 같은 행에 배치
+    col_input, col_add = st.columns([3, 1])
+
+    with col_input:
+        st.selectbox(
+            "회사 이름 (예: 삼성전자, Apple)",
+            options      = company_options,                # 검색 결과
+            index        = None,
+            key          = "company_select_widget",        # 새 위젯 키
+            on_change    = company_select_on_change,       # 선택 시 상태 갱신
+            placeholder  = "검색 결과에서 선택하세요",
+            label_visibility = "collapsed",
+            format_func   = lambda item: f"{item[0]} ({item[1]})",
+        )
+
+    with col_add:
+        if st.button("➕", key="add_stock_btn", help="종목 추가", use_container_width=True):
+            add_stock_to_list()
+
+    # 조회 결과 표시
+    if "ticker_found" in st.session_state:
+        if st.session_state.ticker_found:
+            st.success(f"✅ 조회된 티커: {st.session_state.ticker}")
+        elif st.session_state.company_name_buffer.strip():
+            st.warning("⚠️ 해당 회사명의 티커를 찾을 수 없습니다.")
+
+    # 선택된 종목 목록 표시
+    if st.session_state.selected_stocks:
+        st.markdown("**선택된 종목:**")
+
+        for i, stock in enumerate(st.session_state.selected_stocks):
+            col_stock, col_remove = st.columns([4, 1])
+
+            with col_stock:
+                st.markdown(f"""
+                <div class="selected-stock-item">
+                    <span class="stock-info">{stock['name']}</span>
+                    <span class="stock-ticker">({stock['ticker']})</span>
+                </div>
+                """, unsafe_allow_html=True)
+
+            # with col_remove:
+            #     if st.button("❌", key=f"remove_stock_{i}", help=f"{stock['name']} 제거"):
+            #         remove_stock_from_list(i)
+            #         st.rerun()
+            with col_remove:
+                if st.button(
+                    "❌",
+                    key=f"remove_stock_{stock['ticker']}",    # � 고정 key!
+                    help=f"{stock['name']} 제거"
+                ):
+                    remove_stock_from_list(stock["ticker"])
+                    st.rerun()
+        # 전체 삭제 버튼
+        if len(st.session_state.selected_stocks) > 1:
+            if st.button("전체 삭제", key="clear_all_stocks"):
+                clear_all_stocks()
+                st.rerun()
+
+        # 다중 모드 표시
+        if st.session_state.is_multi_mode:
+            st.info(f"다중 종목 모드 ({len(st.session_state.selected_stocks)}개 종목)")
+
+    st.divider()
+
+    # 2. 기간 설정
+    st.subheader("기간 설정")
+    col_date1, col_date2 = st.columns(2)
+
+    with col_date1:
+        st.session_state["start_date"] = st.date_input(
+            "시작일",
+            value=st.session_state["start_date"],
+            key="start_date_input",
+        )
+    with col_date2:
+        st.session_state["end_date"] = st.date_input(
+            "종료일",
+            value=st.session_state["end_date"],
+            key="end_date_input",
+        )
+
+    # 날짜 범위 검증
+    if st.session_state.start_date >= st.session_state.end_date:
+        st.error("오류: 시작일은 종료일보다 이전이어야 합니다.")
+        start_button_disabled = True
+    else:
+        start_button_disabled = False
+
+    st.divider()
+
+    # 3. 백테스트 설정
+    st.subheader("백테스트 설정")
+
+    render_backtest_settings()
+
+    st.divider()
+
+    # 4. 전략 설정
+    st.subheader("📊 전략 설정")
+
+    render_chat_panel()
+
+    render_strategy_editor()
 
     st.divider()
 
@@ -1017,10 +1475,11 @@ with st.sidebar:
                 'start_date': st.session_state.start_date,
                 'end_date': st.session_state.end_date,
                 'strategy_code': st.session_state.strategy_code,
+                'strategy_name': None if st.session_state.strategy_selector == "직접 코드 입력/생성" else st.session_state.strategy_selector,
                 'initial_capital': st.session_state.initial_capital,
                 'stop_loss_pct': st.session_state.stop_loss_pct,
-                'trade_fee_pct': trade_fee_pct,
-                'sell_tax_pct': sell_tax
+                'trade_fee_pct': st.session_state.trade_fee_pct,
+                'sell_tax_pct': st.session_state.sell_tax_pct
             }
 
             if st.session_state.is_multi_mode:
@@ -1045,8 +1504,6 @@ with st.sidebar:
                         error_count += 1
                     else:
                         success_count += 1
-                        # 개별 종목 데이터도 저장
-                        st.session_state.multi_stock_data[ticker] = result.get('stock_data')
 
                 # 결과 요약 표시
                 if success_count > 0:
@@ -1054,12 +1511,6 @@ with st.sidebar:
                 if error_count > 0:
                     st.warning(f"⚠️ {error_count}개 종목에서 오류 발생")
 
-                # 첫 번째 성공한 종목을 현재 표시용으로 설정
-                for ticker, result in results.items():
-                    if 'error' not in result:
-                        st.session_state.stock_data = result.get('stock_data')
-                        st.session_state.backtest_results = result.get('backtest_results')
-                        break
 
             else:
                 # 단일 종목 백테스트 실행 (기존 로직)
@@ -1077,10 +1528,14 @@ with st.sidebar:
                 if 'error' in result:
                     st.error(f"백테스트 실행 실패: {result['error']}")
                 else:
-                    st.session_state.stock_data = result.get('stock_data')
-                    st.session_state.backtest_results = result.get('backtest_results')
+                    st.session_state.backtest_handle = result
                     st.success("✅ 백테스트 완료!")
 
+            # 이전 결과로 만든 차트와 몬테카를로 시뮬레이션은 더 이상 유효하지 않음
+            st.session_state.monte_carlo_results = {}
+            st.session_state.chart_figures = OrderedDict()
+            st.session_state.trade_tables = OrderedDict()
+
             # 페이지 새로고침하여 결과 표시
             st.rerun()
     else:
@@ -1091,134 +1546,20 @@ with st.sidebar:
 
 # === 메인 콘텐츠 영역 ===
 
-# 메인 결과 표시 로직
-if st.session_state.is_multi_mode and st.session_state.multi_backtest_results:
-    # 다중 종목 모드 - 탭으로 표시
-    st.info(f"다중 종목 백테스트 결과 ({len(st.session_state.selected_stocks)}개 종목)")
-
-    # 성공한 종목들만 탭으로 표시
-    successful_stocks = []
-    for stock in st.session_state.selected_stocks:
-        ticker = stock['ticker']
-        if ticker in st.session_state.multi_backtest_results:
-            result = st.session_state.multi_backtest_results[ticker]
-            if 'error' not in result:
-                successful_stocks.append(stock)
-
-    if successful_stocks:
-        # 탭 생성
-        tab_names = [f"{stock['name']} ({stock['ticker']})" for stock in successful_stocks]
-        tabs = st.tabs(tab_names)
-
-        for i, (tab, stock) in enumerate(zip(tabs, successful_stocks)):
-            with tab:
-                ticker = stock['ticker']
-                result = st.session_state.multi_backtest_results[ticker]
-                stock_data = result.get('stock_data')
-                backtest_results = result.get('backtest_results')
-
-                # 각 탭에서 개별 결과 표시
-                st.subheader(f"{stock['name']} ({ticker}) 백테스트 결과")
-
-                # 캔들차트
-                st.markdown("#### 캔들차트 및 매매 시점")
-                if stock_data is not None and backtest_results:
-                    display_candlestick_chart(
-                        stock_data,
-                        ticker,
-                        backtest_results.get("trades", [])
-                    )
-                else:
-                    st.error("차트 데이터가 없습니다.")
-
-                st.markdown("<br>", unsafe_allow_html=True)
-
-                # 성과 지표
-                st.markdown("#### 성과 지표")
-                if backtest_results and "metrics" in backtest_results:
-                    display_performance_metrics(backtest_results["metrics"])
-                else:
-                    st.warning("성과 지표가 없습니다.")
-
-                st.markdown("<br>", unsafe_allow_html=True)
-
-                # 거래 내역
-                st.markdown("#### 거래 내역")
-                if backtest_results and "trades" in backtest_results:
-                    display_trade_history(backtest_results["trades"])
-                else:
-                    st.info("거래 내역이 없습니다.")
-
-    # 오류가 발생한 종목들 표시
-    error_stocks = []
-    for stock in st.session_state.selected_stocks:
-        ticker = stock['ticker']
-        if ticker in st.session_state.multi_backtest_results:
-            result = st.session_state.multi_backtest_results[ticker]
-            if 'error' in result:
-                error_stocks.append((stock, result['error']))
-
-    if error_stocks:
-        st.markdown("---")
-        st.error("⚠️ 다음 종목들에서 오류가 발생했습니다:")
-        for stock, error in error_stocks:
-            st.markdown(f"- **{stock['name']} ({stock['ticker']})**: {error}")
-
-elif st.session_state.stock_data is not None and st.session_state.backtest_results:
-    # 단일 종목 모드 또는 기본 결과 표시
-    st.markdown("### 백테스트 결과")
-    
-    # 캔들차트 및 매매 시점
-    st.markdown("#### 캔들차트 및 매매 시점")
-    trades = st.session_state.backtest_results.get('trades', [])
-    ticker = st.session_state.ticker or "UNKNOWN"
-    display_candlestick_chart(st.session_state.stock_data, ticker, trades)
-    
-    # 성과 지표
-    st.markdown("#### 성과 지표")
-    metrics = st.session_state.backtest_results.get('metrics', {})
-    display_performance_metrics(metrics)
-
-    st.markdown("<br>", unsafe_allow_html=True)    
-    # 거래 내역
-    st.markdown("#### 거래 내역")
-    display_trade_history(trades)
-
-else:
-    # 기본 안내 메시지
-    if st.session_state.is_multi_mode and st.session_state.selected_stocks:
-        st.info(f"다중 종목 모드: {len(st.session_state.selected_stocks)}개 종목이 선택되었습니다.")
-
-        # 선택된 종목 목록 표시
-        cols = st.columns(min(len(st.session_state.selected_stocks), 4))
-        for i, stock in enumerate(st.session_state.selected_stocks):
-            with cols[i % 4]:
-                st.metric(
-                    label=stock['name'],
-                    value=stock['ticker'],
-                    help=f"선택된 종목: {stock['name']} ({stock['ticker']})"
-                )
-
-        st.markdown("---")
-        st.info("⬅️ 왼쪽 사이드바에서 '백테스트 시작' 버튼을 클릭하여 다중 종목 백테스트를 실행하세요.")
-    else:
-        # 기본 안내 메시지
-        st.markdown("""
-        ### 백테스트 결과
-
-        #### 캔들차트 및 매매 시점
-        백테스트를 시작하면 여기에 차트가 표시됩니다.
-
-        #### 성과 지표
-        상세 지표를 표시하려면 백테스트를 시작하세요.
-
-                    
-        #### 거래 내역
-        백테스트를 시작하면 여기에 거래 내역이 표시됩니다.
-        """)
-        st.info("⬅️ 왼쪽 사이드바에서 종목을 선택하고 설정을 조정한 후 백테스트를 시작하세요.")
+render_results_panel()
 
 # Footer
 st.markdown("---")
 st.caption("본 사이트는 교육 및 데모 목적으로 제작되었습니다. 실제 투자 결정에 사용하지 마십시오.")
 
+# 전체 재실행 시간 오버레이 (영역별 시간은 각 영역 아래에 표시)
+if SHOW_RERUN_TIMINGS:
+    full_rerun_ms = (time.perf_counter() - rerun_started) * 1000
+    st.session_state.setdefault("rerun_timings", {})["전체"] = full_rerun_ms
+    st.markdown(f"""
+    <div style="position: fixed; bottom: 0.5rem; right: 0.75rem; z-index: 1000; padding: 0.2rem 0.5rem;
+                border-radius: 4px; background: rgba(0, 0, 0, 0.6); color: #fff; font-size: 0.75rem;">
+        ⏱ 전체 재실행 {full_rerun_ms:,.0f} ms
+    </div>
+    """, unsafe_allow_html=True)
+
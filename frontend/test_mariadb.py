@@ -5,6 +5,9 @@ import requests
 from datetime import datetime, timedelta # timedelta 추가
 from threading import Timer
 
+# 백엔드 API URL (일일 업데이트 완료 알림용)
+BACKEND_URL = "http://127.0.0.1:5001"
+
 class DBUpdater:
     def __init__(self):
         """생성자: MariaDB 연결 및 종목코드 딕셔너리 생성"""
@@ -79,6 +82,7 @@ class DBUpdater:
                         f"VALUES ({code}, {company}, {today})")
                 self.conn.commit()
                 print('')
+                self.notify_company_update()
 
     def fetch_daily_price_fdr(self, code, start_date, end_date):
         """FinanceDataReader를 사용하여 주식 시세를 읽어서 데이터프레임으로 반환"""
@@ -159,6 +163,7 @@ class DBUpdater:
 
         total_codes = len(self.codes)
         print(f"Updating daily price for {total_codes} companies...")
+        updated_codes = []
 
         for idx, code in enumerate(self.codes):
             company = self.codes[code]
@@ -188,13 +193,34 @@ class DBUpdater:
             if df is None or df.empty: # 데이터가 없거나 비어있으면 건너뛰기
                 continue
             self.replace_into_db(df, idx, code, self.codes[code])
+            updated_codes.append(code)
+
+        return updated_codes
+
+    def notify_backend(self, updated_codes):
+        """일일 업데이트 완료를 백엔드에 알려 신호 스캔 등 후속 작업을 실행"""
+        try:
+            requests.post(f"{BACKEND_URL}/api/data/updated",
+                json={"tickers": updated_codes}, timeout=30)
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to notify backend of daily update: {e}")
+
+
+    def notify_company_update(self):
+        """company_info 갱신을 백엔드에 알려 종목 검색 인덱스를 다시 만들게 함"""
+        try:
+            requests.post(f"{BACKEND_URL}/api/companies/refresh", timeout=30)
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to notify backend of company update: {e}")
 
 
     def execute_daily(self):
         """실행 즉시 및 매일 오후 여덟시에 daily_price 테이블 업데이트"""
         self.update_comp_info()
 
-        self.update_daily_price() # pages_to_fetch 인자 제거
+        updated_codes = self.update_daily_price() # pages_to_fetch 인자 제거
+        if updated_codes:
+            self.notify_backend(updated_codes)
 
         tmnow = datetime.now()
         lastday = calendar.monthrange(tmnow.year, tmnow.month)[1]
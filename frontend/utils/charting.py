@@ -1,100 +1,190 @@
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
 
-def create_candlestick_chart(data: pd.DataFrame, ticker: str, trades: list = None):
-    """Creates an interactive Plotly candlestick chart with MA lines."""
+# 이 봉 수를 넘으면 긴 기간 모드: 봉을 주봉/월봉으로 묶고 이동평균선은 LTTB로 줄여 WebGL로 그림
+MAX_CHART_BARS = 1500
+# 긴 기간 모드에서 이동평균선 하나당 최대 점 수
+MAX_LINE_POINTS = 2000
+# 긴 기간 모드에서 시도하는 집계 주기 (앞에서부터 MAX_CHART_BARS 이하가 되는 첫 주기를 사용)
+AGGREGATION_RULES = [("D", "일봉"), ("W-FRI", "주봉"), ("ME", "월봉")]
+
+
+def aggregate_ohlc(data: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """OHLCV 봉을 `rule` 주기(pandas resample 규칙)로 묶습니다. 봉이 없는 구간은 제외합니다."""
+    agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last"}
+    if "Volume" in data.columns:
+        agg["Volume"] = "sum"
+    return data[list(agg)].resample(rule).agg(agg).dropna(subset=["Close"])
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """Largest-Triangle-Three-Buckets 다운샘플링. 선의 모양(고점/저점)을 유지하며 n_out개 점을 고릅니다.
+
+    Returns:
+        np.ndarray: 선택된 점들의 위치 (오름차순).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # 처음/마지막 점을 제외한 나머지를 n_out - 2개 버킷으로 나눔
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # 각 버킷의 평균 (다음 버킷 평균 계산용), 누적합으로 한 번에 계산
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.maximum(edges[1:] - edges[:-1], 1)
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+    # 마지막 버킷 다음은 마지막 점
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        bx, by = x[start:end], y[start:end]
+        # 이전 선택점, 버킷 내 후보, 다음 버킷 평균이 이루는 삼각형 넓이가 가장 큰 점
+        area = np.abs((x[prev] - next_x[i]) * (by - y[prev]) - (x[prev] - bx) * (next_y[i] - y[prev]))
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def _downsample_line(series: pd.Series, n_out: int) -> pd.Series:
+    series = series.dropna()
+    if len(series) <= n_out:
+        return series
+    x = series.index.asi8.astype(np.float64)
+    return series.iloc[lttb(x, series.to_numpy(dtype=np.float64), n_out)]
+
+
+def _trade_markers(data: pd.DataFrame, trades: list, bars: pd.DataFrame, aggregated: bool):
+    """매수/일반 매도/손절 매도 마커 좌표를 인덱스 조인으로 계산합니다.
+
+    집계된 경우 거래일은 그 날짜를 포함하는 `bars`의 봉(기간 끝 날짜가 라벨)에 표시됩니다.
+    """
+    trades_df = pd.DataFrame(trades)
+    empty = (bars.index[:0], np.empty(0))
+    markers = {"buy": empty, "sell": empty, "stop_loss": empty}
+    if trades_df.empty:
+        return markers
+
+    def locate(column):
+        dates = pd.DatetimeIndex(pd.to_datetime(trades_df[column], errors="coerce"))
+        # 원본 데이터에 있는 거래일만 표시
+        valid = data.index.get_indexer(dates) >= 0
+        positions = bars.index.searchsorted(dates[valid].normalize() if aggregated else dates[valid])
+        return valid, bars.index[positions], positions
+
+    _, x, positions = locate("buy_date")
+    markers["buy"] = (x, bars["Low"].to_numpy()[positions] * 0.99)
+
+    valid, x, positions = locate("sell_date")
+    y = bars["High"].to_numpy()[positions] * 1.01
+    if "stop_loss" in trades_df:
+        is_stop = trades_df["stop_loss"].eq(True).to_numpy()[valid]
+    else:
+        is_stop = np.zeros(len(x), dtype=bool)
+    markers["sell"] = (x[~is_stop], y[~is_stop])
+    markers["stop_loss"] = (x[is_stop], y[is_stop])
+    return markers
+
+
+def create_candlestick_chart(data: pd.DataFrame, ticker: str, trades: list = None, max_bars: int = MAX_CHART_BARS):
+    """Creates an interactive Plotly candlestick chart with MA lines.
+
+    봉이 max_bars보다 많으면 조회 기간에 맞춰 주봉/월봉으로 묶고, 이동평균선은 원래 해상도로
+    계산한 뒤 LTTB로 줄여 WebGL(Scattergl)로 그립니다. WebGL 트레이스는 rangebreaks를 지원하지
+    않으므로 이 모드에서는 주말/공휴일 구간 제거를 하지 않습니다 (주봉/월봉에서는 의미가 없음).
+    """
     fig = go.Figure()
 
+    # 분봉 여부: 같은 날짜에 봉이 두 개 이상이면 장중 데이터
+    sessions   = data.index.normalize()
+    is_intraday = sessions.has_duplicates
+
+    bars = data
+    bar_label = None
+    if len(data) > max_bars:
+        for rule, label in AGGREGATION_RULES:
+            if rule == "D" and not is_intraday:
+                continue
+            bars, bar_label = aggregate_ohlc(data, rule), label
+            if len(bars) <= max_bars:
+                break
+    long_history = bar_label is not None
+    Line = go.Scattergl if long_history else go.Scatter
+
     # 1. Candlestick
     fig.add_trace(go.Candlestick(
-        x=data.index,
-        open=data["Open"],
-        high=data["High"],
-        low=data["Low"],
-        close=data["Close"],
+        x=bars.index,
+        open=bars["Open"],
+        high=bars["High"],
+        low=bars["Low"],
+        close=bars["Close"],
         increasing_line_color='#e71909',
         decreasing_line_color='#115bcb',
         increasing_fillcolor='#e71909',
-        decreasing_fillcolor='#115bcb',        
-        name="가격"
+        decreasing_fillcolor='#115bcb',
+        name=f"가격 ({bar_label})" if long_history else "가격"
     ))
 
-    # 2. 이동평균선 추가 (20, 60, 120)
-    data = data.copy()
-    data["MA20"] = data["Close"].rolling(window=20, min_periods=1).mean()
-    data["MA60"] = data["Close"].rolling(window=60, min_periods=1).mean()
-    data["MA120"] = data["Close"].rolling(window=120, min_periods=1).mean()
+    # 2. 이동평균선 추가 (20, 60, 120) - 백엔드 피처 저장소의 SMA 컬럼이 있으면 그대로 사용
+    for window, width, color, dash in ((20, 1.5, 'royalblue', 'dot'), (60, 2.0, 'orange', 'dash'), (120, 2.5, 'green', 'solid')):
+        if f"SMA_{window}" in data.columns:
+            ma = data[f"SMA_{window}"]
+        else:
+            ma = data["Close"].rolling(window=window, min_periods=1).mean()
+        if long_history:
+            ma = _downsample_line(ma, MAX_LINE_POINTS)
+        fig.add_trace(Line(
+            x=ma.index, y=ma, mode='lines', name=f"MA{window}",
+            line=dict(width=width, color=color, dash=dash)
+        ))
 
-    fig.add_trace(go.Scatter(
-        x=data.index, y=data["MA20"], mode='lines', name="MA20",
-        line=dict(width=1.5, color='royalblue', dash='dot')
-    ))
-    fig.add_trace(go.Scatter(
-        x=data.index, y=data["MA60"], mode='lines', name="MA60",
-        line=dict(width=2.0, color='orange', dash='dash')
-    ))
-    fig.add_trace(go.Scatter(
-        x=data.index, y=data["MA120"], mode='lines', name="MA120",
-        line=dict(width=2.5, color='green', dash='solid')
-    ))
-
-    # 3. Buy/Sell Markers (기존과 동일)
+    # 3. Buy/Sell Markers
     if trades:
-        buy_dates = []
-        buy_prices = []
-        sell_dates_normal = []
-        sell_prices_normal = []
-        sell_dates_stoploss = []
-        sell_prices_stoploss = []
-
-        for trade in trades:
-            if trade["buy_date"] in data.index:
-                buy_dates.append(trade["buy_date"])
-                buy_prices.append(data.loc[trade["buy_date"], "Low"] * 0.99)
-            if trade["sell_date"] in data.index:
-                if trade.get("stop_loss"):
-                    sell_dates_stoploss.append(trade["sell_date"])
-                    sell_prices_stoploss.append(data.loc[trade["sell_date"], "High"] * 1.01)
-                else:
-                    sell_dates_normal.append(trade["sell_date"])
-                    sell_prices_normal.append(data.loc[trade["sell_date"], "High"] * 1.01)
-
-        if buy_dates:
-            fig.add_trace(go.Scatter(x=buy_dates, y=buy_prices, mode='markers',
-                                     marker_symbol='triangle-up', marker_color='blue', marker_size=10,
-                                     name='매수 신호', hoverinfo='x+name'))
-        if sell_dates_normal:
-            fig.add_trace(go.Scatter(x=sell_dates_normal, y=sell_prices_normal, mode='markers',
-                                     marker_symbol='triangle-down', marker_color='black', marker_size=12,
-                                     name='일반 매도', hoverinfo='x+name'))
-        if sell_dates_stoploss:
-            fig.add_trace(go.Scatter(x=sell_dates_stoploss, y=sell_prices_stoploss, mode='markers',
-                                     marker_symbol='x', marker_color='red', marker_size=14,
-                                     name='손절 매도', hoverinfo='x+name'))
-
-    # 누락된 날짜(공휴일) 계산
-    all_days   = pd.date_range(data.index.min(), data.index.max(), freq="D")
-    missing    = all_days.difference(data.index)          # data에 없는 모든 날짜
-    holidays   = [d for d in missing if d.weekday() < 5]   # 평일(월~금)만 추려 공휴일 목록
+        markers = _trade_markers(data, trades, bars, long_history)
+        for kind, symbol, color, size, name in (
+            ("buy", 'triangle-up', 'blue', 10, '매수 신호'),
+            ("sell", 'triangle-down', 'black', 12, '일반 매도'),
+            ("stop_loss", 'x', 'red', 14, '손절 매도'),
+        ):
+            x, y = markers[kind]
+            if len(x):
+                fig.add_trace(Line(x=x, y=y, mode='markers',
+                                   marker_symbol=symbol, marker_color=color, marker_size=size,
+                                   name=name, hoverinfo='x+name'))
 
     # 4. Layout
     fig.update_layout(
-        xaxis_title="날짜",
+        xaxis_title="날짜/시간" if is_intraday and not long_history else "날짜",
         yaxis_title="가격",
         xaxis_rangeslider_visible=False,
         hovermode="x unified",
         height=700
     )
 
-    # 여기 ↓ 추가 -------------------------------------------------
-    fig.update_xaxes(
-        rangebreaks=[
-            dict(bounds=["sat", "mon"]),      # 주말 제거
-            dict(values=holidays),            # 평일 공휴일 제거
-        ],
-        matches="x"                           # 두 x-축 동기화
-    )
-    # ------------------------------------------------------------
+    if not long_history:
+        # 누락된 날짜(공휴일) 계산: data에 없는 평일
+        all_days = pd.date_range(sessions.min(), sessions.max(), freq="D")
+        missing  = all_days.difference(sessions)
+        holidays = missing[missing.weekday < 5]
+
+        rangebreaks = [
+            dict(bounds=["sat", "mon"]),          # 주말 제거
+            dict(values=holidays.tolist()),       # 평일 공휴일 제거
+        ]
+        if is_intraday:
+            # 장 마감 후 ~ 다음 장 시작 전 시간대 제거 (KRX 09:00~15:30)
+            rangebreaks.append(dict(bounds=[15.5, 9], pattern="hour"))
+
+        fig.update_xaxes(
+            rangebreaks=rangebreaks,
+            matches="x"                           # 두 x-축 동기화
+        )
 
     fig.update_xaxes(rangeslider_visible=False)
 
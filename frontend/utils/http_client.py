@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 백엔드 API URL
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:5001")
+
+# 연결 풀 크기 (다중 종목 병렬 요청 수보다 커야 연결을 재사용함)
+POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "16"))
+
+# 엔드포인트별 타임아웃(초), 가장 긴 접두사가 일치하는 값을 사용
+ENDPOINT_TIMEOUTS = {
+    "/api/capacity": 5,
+    "/api/companies": 5,
+    "/api/strategies": 10,
+    "/api/stock_data": 20,
+    "/api/runs": 20,
+    "/api/backtest": 60,
+    "/api/backtest/monte_carlo": 30,
+    "/api/llm_chat": 120,
+    "/api/llm_chat/stream": 120,       # 스트리밍: 첫 토큰, 토큰 사이, 코드 자동 수정 라운드의 최대 대기 시간
+}
+DEFAULT_TIMEOUT = 30
+
+# 백엔드 처리 용량 조회 결과를 다시 쓰는 시간(초)
+CAPACITY_TTL = 10
+# 용량을 알 수 없을 때의 다중 종목 동시 실행 수 (기존 고정값)
+DEFAULT_FANOUT = 3
+
+_session = None
+_session_lock = threading.Lock()
+_capacity = None
+_capacity_checked_at = 0.0
+
+
+def get_session() -> requests.Session:
+    """keep-alive 연결 풀을 공유하는 프로세스 전역 세션을 반환합니다.
+
+    연결 오류는 지수 백오프(0.5, 1, 2초)로, Retry-After 헤더가 있는 429/503 등의 응답
+    (백엔드 동시 실행 제한 `limit_concurrency`)은 헤더의 시간만큼 기다려 최대 3번 재시도합니다.
+    Retry-After가 없는 429/503 (예: /api/llm_chat의 OpenAI 요청 한도 초과)은 재시도하지 않습니다.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=3,
+                connect=3,
+                read=0,                          # 읽기 타임아웃은 재시도하지 않음 (백테스트 중복 실행 방지)
+                status_forcelist=None,           # 상태 코드는 Retry-After가 있을 때만 재시도 (429/503/413)
+                allowed_methods=None,            # POST도 재시도 (Retry-After 응답은 요청이 처리되기 전에 거절된 경우)
+                backoff_factor=0.5,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def endpoint_timeout(path: str) -> float:
+    """경로에 맞는 타임아웃을 반환합니다."""
+    matches = [prefix for prefix in ENDPOINT_TIMEOUTS if path.startswith(prefix)]
+    return ENDPOINT_TIMEOUTS[max(matches, key=len)] if matches else DEFAULT_TIMEOUT
+
+
+def request(method: str, path: str, **kwargs) -> requests.Response:
+    """백엔드 `path` (예: "/api/backtest")로 요청을 보냅니다. timeout을 주지 않으면 엔드포인트별 값을 사용합니다."""
+    kwargs.setdefault("timeout", endpoint_timeout(path))
+    return get_session().request(method, f"{BACKEND_URL}{path}", **kwargs)
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return request("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return request("POST", path, **kwargs)
+
+
+def delete(path: str, **kwargs) -> requests.Response:
+    return request("DELETE", path, **kwargs)
+
+
+def backend_capacity():
+    """백엔드가 알려주는 동시 백테스트 처리 용량 (GET /api/capacity), 실패 시 None."""
+    global _capacity, _capacity_checked_at
+    if _capacity is not None and time.monotonic() - _capacity_checked_at < CAPACITY_TTL:
+        return _capacity
+    try:
+        response = get("/api/capacity")
+        response.raise_for_status()
+        _capacity = response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        _capacity = None
+    _capacity_checked_at = time.monotonic()
+    return _capacity
+
+
+def fanout_workers(num_tasks: int) -> int:
+    """다중 종목 요청을 몇 개씩 동시에 보낼지 백엔드 용량에 맞춰 정합니다."""
+    capacity = backend_capacity()
+    if capacity:
+        workers = capacity.get("available") or capacity.get("max_concurrent_backtests") or DEFAULT_FANOUT
+    else:
+        workers = DEFAULT_FANOUT
+    return max(1, min(num_tasks, workers, POOL_SIZE))
@@ -0,0 +1,34 @@
+# /home/ubuntu/backtest_app/tests/conftest.py
+import os
+import sys
+
+import openai
+import pytest
+
+# Run from anywhere: the tests import the app as the `backend` package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core import llm_service  # noqa: E402
+from mock_openai import serve_mock_openai  # noqa: E402
+
+
+@pytest.fixture
+def mock_openai(monkeypatch):
+    """Starts a mock OpenAI server and points the shared client at it.
+
+    Call it with serve_mock_openai options (reply, status, drop_after_chunks); returns the server.
+    """
+    servers = []
+
+    def start(**options):
+        server, base_url = serve_mock_openai(**options)
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+        monkeypatch.setattr(openai, "api_key", "mock-key")
+        monkeypatch.setattr(llm_service, "_client", None) # Rebuilt with the mock base URL
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
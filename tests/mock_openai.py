@@ -0,0 +1,153 @@
+# /home/ubuntu/backtest_app/tests/mock_openai.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.core.chat_budget import count_tokens, message_tokens
+from backend.core.llm_service import MODEL, REPAIR_PROMPT
+
+# Local mock of the OpenAI chat.completions API, so the LLM tests need no API key or network
+MOCK_RESPONSE = "모의 응답입니다. 20일/50일 단순 이동평균 교차 전략을 제안합니다."
+MOCK_CHUNK_DELAY_S = 0.05
+# Strategy code for the validation/repair scenario: MOCK_CODE passes validation,
+# MOCK_LOOKAHEAD_CODE peeks at the next close (shift(-1))
+MOCK_CODE = """def generate_signals(data):
+    signals = pd.Series('hold', index=data.index)
+    fast = data['Close'].rolling(20).mean()
+    slow = data['Close'].rolling(50).mean()
+    signals[(fast > slow) & (fast.shift(1) <= slow.shift(1))] = 'buy'
+    signals[(fast < slow) & (fast.shift(1) >= slow.shift(1))] = 'sell'
+    signals.iloc[:50] = 'hold'
+    return signals"""
+MOCK_LOOKAHEAD_CODE = MOCK_CODE.replace(
+    "    signals.iloc[:50] = 'hold'", "    signals[data['Close'].shift(-1) > data['Close'] * 1.02] = 'buy'")
+MOCK_CODE_RESPONSE = "20일/50일 이동평균 교차 전략 코드입니다.\n```python\n{code}\n```"
+# Fixed opening of a repair request
+REPAIR_MARKER = REPAIR_PROMPT.split("{")[0]
+
+
+def _last_text(messages: list) -> str:
+    last = messages[-1]["content"] if messages else ""
+    if not isinstance(last, str):
+        last = " ".join(part.get("text", "") for part in last)
+    return last
+
+
+def mock_reply(messages: list) -> str:
+    return MOCK_RESPONSE
+
+
+def lookahead_then_repair_reply(messages: list) -> str:
+    """Answers with look-ahead code first and with the fixed code to a repair request."""
+    if REPAIR_MARKER in _last_text(messages):
+        return MOCK_CODE_RESPONSE.format(code=MOCK_CODE)
+    return MOCK_CODE_RESPONSE.format(code=MOCK_LOOKAHEAD_CODE)
+
+
+def never_repaired_reply(messages: list) -> str:
+    """Answers every request, repair requests included, with the same look-ahead code."""
+    return MOCK_CODE_RESPONSE.format(code=MOCK_LOOKAHEAD_CODE)
+
+
+def serve_mock_openai(reply=mock_reply, status: int = 200, drop_after_chunks: int = None, port: int = 0):
+    """Starts an OpenAI-compatible /v1/chat/completions server in a background thread.
+
+    Streaming requests get the reply word by word as SSE chunks, MOCK_CHUNK_DELAY_S apart,
+    so time-to-first-token and total time differ the way they do against the real API.
+    Usage reports estimated token counts, and cached_tokens mimics OpenAI prefix caching: the
+    leading messages identical to the previous request, in 128-token steps from 1024 tokens.
+
+    Args:
+        reply: fn(messages) -> assistant text.
+        status (int): HTTP status of every response; anything but 200 returns an OpenAI error body.
+        drop_after_chunks (int, optional): Close the connection after this many streamed chunks,
+                                           before the response is complete.
+        port (int): Port to listen on (0 picks a free one).
+
+    Returns:
+        tuple: (server, base_url) - point OPENAI_BASE_URL at base_url, call server.shutdown() when done.
+    """
+    previous_messages = []
+    requests = []
+
+    def mock_usage(messages, text):
+        prompt_tokens = sum(message_tokens(message) for message in messages)
+        shared = 0
+        for message, previous in zip(messages, previous_messages):
+            if message != previous:
+                break
+            shared += message_tokens(message)
+        previous_messages[:] = messages
+        cached = shared // 128 * 128 if shared >= 1024 else 0
+        completion_tokens = count_tokens(text)
+        return {
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, code, payload):
+            payload = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            requests.append(body)
+            if status != 200:
+                self._send_json(status, {"error": {"message": f"mock error {status}", "type": "mock", "code": None}})
+                return
+
+            model = body.get("model", MODEL)
+            text = reply(body.get("messages", []))
+            usage = mock_usage(body.get("messages", []), text)
+            if not body.get("stream"):
+                self._send_json(200, {
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            if drop_after_chunks is not None:
+                # Promise more bytes than are sent, so the client sees an incomplete body
+                self.send_header("Content-Length", str(1024 * 1024))
+            self.end_headers()
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                if drop_after_chunks is not None and i >= drop_after_chunks:
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                time.sleep(MOCK_CHUNK_DELAY_S)
+                chunk = {
+                    "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                 "finish_reason": "stop" if i == len(words) - 1 else None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.requests = requests # Request bodies received, for assertions
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
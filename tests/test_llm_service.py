@@ -0,0 +1,193 @@
+# /home/ubuntu/backtest_app/tests/test_llm_service.py
+import json
+from collections import OrderedDict
+
+import openai
+import pytest
+from flask import Flask
+
+from backend.api.llm_chat import llm_chat_bp
+from backend.core import llm_service
+from backend.core.chat_budget import LLM_CONTEXT_TOKENS, TRIM_BLOCK_MESSAGES
+from backend.core.llm_service import (
+    LLM_MAX_REPAIR_ROUNDS, SYSTEM_MESSAGE, SYSTEM_PROMPT, _build_messages, stream_llm_response, validate_and_repair,
+)
+from mock_openai import (
+    MOCK_CODE, MOCK_CODE_RESPONSE, MOCK_LOOKAHEAD_CODE, MOCK_RESPONSE, lookahead_then_repair_reply, never_repaired_reply,
+)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(llm_chat_bp, url_prefix="/api")
+    return app.test_client()
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """Empty summary cache, so every test calls the (mock) summary model."""
+    monkeypatch.setattr(llm_service, "LLM_SUMMARIZE_HISTORY", True)
+    monkeypatch.setattr(llm_service, "_summaries", OrderedDict())
+
+
+def _long_history(turns: int) -> list:
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"{turn}번째 질문: RSI 기간과 손절 비율을 바꿔 보면 어떨까요? " * 5})
+        history.append({"role": "assistant", "content": f"{turn}번째 답변: 기간을 늘리면 신호가 줄어듭니다. " * 10})
+    return history
+
+
+def _sse_events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_yields_deltas_then_done(mock_openai):
+    mock_openai()
+    events = list(stream_llm_response([], "이동평균 전략을 추천해 주세요."))
+
+    assert [event["type"] for event in events[:-1]] == ["delta"] * (len(events) - 1)
+    done = events[-1]
+    assert done["type"] == "done"
+    assert "".join(event["text"] for event in events[:-1]) == MOCK_RESPONSE == done["response"]
+    assert 0 < done["ttft_ms"] < done["elapsed_ms"]
+    assert done["usage"]["completion_tokens"] > 0
+
+
+def test_stream_dropped_mid_response_emits_error(mock_openai):
+    mock_openai(drop_after_chunks=2)
+    events = list(stream_llm_response([], "이동평균 전략을 추천해 주세요."))
+
+    assert [event["type"] for event in events] == ["delta", "delta", "error"]
+    assert events[-1]["error"]
+
+
+def test_stream_route_sends_server_sent_events(client, mock_openai):
+    mock_openai()
+    response = client.post("/api/llm_chat/stream", json={"history": [], "message": "전략을 추천해 주세요."})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = _sse_events(response.get_data(as_text=True))
+    assert events[-1][0] == "done"
+    assert "".join(data["text"] for name, data in events if name == "delta") == MOCK_RESPONSE
+
+
+def test_stream_route_returns_json_error_without_api_key(client, monkeypatch):
+    monkeypatch.setattr(openai, "api_key", None)
+    response = client.post("/api/llm_chat/stream", json={"message": "전략을 추천해 주세요."})
+
+    assert response.status_code == 503
+    assert response.is_json
+    assert "API key" in response.get_json()["error"]
+
+
+def test_stream_route_returns_json_error_before_first_token(client, mock_openai):
+    mock_openai(status=401)
+    response = client.post("/api/llm_chat/stream", json={"message": "전략을 추천해 주세요."})
+
+    assert response.status_code == 503
+    assert response.is_json
+    assert "authentication failed" in response.get_json()["error"]
+
+
+def test_long_history_is_trimmed_and_summarized_within_budget(mock_openai, summaries):
+    mock_openai()
+    messages, context = _build_messages(_long_history(40), "다음 단계는?")
+
+    assert context["estimated_prompt_tokens"] <= LLM_CONTEXT_TOKENS
+    assert context["dropped_messages"] > 0
+    assert context["dropped_messages"] % TRIM_BLOCK_MESSAGES == 0
+    assert context["summarized"]
+    assert messages[1]["role"] == "system" and MOCK_RESPONSE in messages[1]["content"]
+    assert len(messages) == 2 + context["history_messages"] - context["dropped_messages"] + 1
+
+
+def test_trim_point_moves_in_blocks(mock_openai, summaries):
+    mock_openai()
+    history = _long_history(40)
+    dropped_counts = []
+    for length in range(2, len(history) + 1, 2):
+        _, context = _build_messages(history[:length], "다음 단계는?")
+        assert context["estimated_prompt_tokens"] <= LLM_CONTEXT_TOKENS
+        dropped_counts.append(context["dropped_messages"])
+
+    assert all(count % TRIM_BLOCK_MESSAGES == 0 for count in dropped_counts)
+    assert dropped_counts == sorted(dropped_counts)
+    trimmed = [count for count in dropped_counts if count]
+    # Several consecutive requests share a cut, so they send the same prompt prefix
+    assert len(set(trimmed)) < len(trimmed)
+
+
+def test_system_message_stays_first_and_byte_identical(mock_openai, summaries):
+    mock_openai()
+    for history in ([], _long_history(3), _long_history(40)):
+        messages, _ = _build_messages(history, "다음 단계는?")
+        assert messages[0] is SYSTEM_MESSAGE
+        assert messages[0]["content"].encode("utf-8") == SYSTEM_PROMPT.encode("utf-8")
+        assert all(message["role"] != "system" for message in messages[2:])
+
+
+def test_failed_summary_still_trims(mock_openai, summaries):
+    mock_openai(status=400)
+    messages, context = _build_messages(_long_history(40), "다음 단계는?")
+
+    assert not context["summarized"]
+    assert context["dropped_messages"] > 0
+    assert context["dropped_messages"] % TRIM_BLOCK_MESSAGES == 0
+    assert context["estimated_prompt_tokens"] <= LLM_CONTEXT_TOKENS
+    assert [message["role"] for message in messages].count("system") == 1
+
+
+def test_oversized_summary_is_left_out(mock_openai, summaries):
+    mock_openai(reply=lambda messages: "요약이 너무 깁니다. " * 500)
+    messages, context = _build_messages(_long_history(40), "다음 단계는?")
+
+    assert not context["summarized"]
+    assert context["estimated_prompt_tokens"] <= LLM_CONTEXT_TOKENS
+    assert [message["role"] for message in messages].count("system") == 1
+
+
+def test_repair_returns_only_validated_code(mock_openai, monkeypatch):
+    monkeypatch.setattr(llm_service, "LLM_VALIDATE_CODE", True)
+    server = mock_openai(reply=lookahead_then_repair_reply)
+    messages, _ = _build_messages([], "이동평균 교차 전략 코드를 작성해 주세요.")
+    events = list(validate_and_repair(messages, MOCK_CODE_RESPONSE.format(code=MOCK_LOOKAHEAD_CODE)))
+
+    rounds, final = events[:-1], events[-1]
+    assert [event["ok"] for event in rounds] == [False, True]
+    assert any("future data" in error for error in rounds[0]["errors"])
+    assert final["type"] == "code"
+    assert final["code"] == MOCK_CODE
+    assert final["validation"]["ok"] and final["validation"]["repair_rounds"] == 1
+    assert final["repair_usage"]["total_tokens"] > 0
+    assert len(server.requests) == 1
+
+
+def test_repair_rounds_are_bounded(mock_openai, monkeypatch):
+    monkeypatch.setattr(llm_service, "LLM_VALIDATE_CODE", True)
+    server = mock_openai(reply=never_repaired_reply)
+    messages, _ = _build_messages([], "이동평균 교차 전략 코드를 작성해 주세요.")
+    events = list(validate_and_repair(messages, MOCK_CODE_RESPONSE.format(code=MOCK_LOOKAHEAD_CODE)))
+
+    final = events[-1]
+    assert final["code"] is None # Code that never passed validation is not offered to the editor
+    assert not final["validation"]["ok"]
+    assert final["validation"]["repair_rounds"] == LLM_MAX_REPAIR_ROUNDS
+    assert len(events) == LLM_MAX_REPAIR_ROUNDS + 2
+    assert len(server.requests) == LLM_MAX_REPAIR_ROUNDS
+
+
+def test_stream_validates_code_before_done(mock_openai, monkeypatch):
+    monkeypatch.setattr(llm_service, "LLM_VALIDATE_CODE", True)
+    mock_openai(reply=lookahead_then_repair_reply)
+    events = list(stream_llm_response([], "이동평균 교차 전략 코드를 작성해 주세요."))
+
+    assert [event["type"] for event in events if event["type"] != "delta"] == ["validation", "validation", "done"]
+    assert events[-1]["code"] == MOCK_CODE
+    assert MOCK_LOOKAHEAD_CODE in events[-1]["response"]
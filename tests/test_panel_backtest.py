@@ -0,0 +1,81 @@
+# /home/ubuntu/backtest_app/tests/test_panel_backtest.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.core.backtesting import PANEL_COLUMNS, generate_signal_series, run_backtest, run_panel_backtest
+from backend.core.indicators import compute_indicators
+from backend.core.strategy_spec import compile_strategy_spec
+from backend.core.strategy_validation import sample_ohlcv
+
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "strategies")
+
+# Python strategy with both entry points, rolling windows over the bars it is given
+PANEL_CODE = """def generate_signals(data):
+    signals = pd.Series('hold', index=data.index)
+    upper = data['High'].rolling(20, min_periods=20).max().shift(1)
+    lower = data['Low'].rolling(20, min_periods=20).min().shift(1)
+    signals[data['Close'] < lower] = 'sell'
+    signals[data['Close'] > upper] = 'buy'
+    return signals
+
+def generate_panel_signals(data):
+    close = data['Close']
+    upper = data['High'].rolling(20, min_periods=20).max().shift(1)
+    lower = data['Low'].rolling(20, min_periods=20).min().shift(1)
+    signals = pd.DataFrame('hold', index=close.index, columns=close.columns)
+    signals[close < lower] = 'sell'
+    signals[close > upper] = 'buy'
+    return signals"""
+
+
+def _strategy(name: str) -> str:
+    with open(os.path.join(STRATEGY_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def tickers():
+    full = sample_ohlcv()
+    # Second ticker: listed 40 bars later, with trading halts of 30 and 10 bars
+    other = (sample_ohlcv().iloc[::-1].set_axis(full.index) * 0.5).round()
+    gapped = other.iloc[40:].drop(other.index[300:330].append(other.index[500:510]))
+    return {"FULL": full.copy(), "GAPPED": gapped}
+
+
+@pytest.mark.parametrize("strategy", [
+    _strategy("Donchain_Spec.json"), _strategy("MACD_Sig_XOver_Spec.json"), PANEL_CODE,
+], ids=["Donchain_Spec", "MACD_Sig_XOver_Spec", "python panel"])
+def test_panel_matches_run_backtest_for_a_ticker_with_gaps(tickers, strategy):
+    results = run_panel_backtest(tickers, strategy)
+
+    for ticker, data in tickers.items():
+        single = run_backtest(data, strategy)
+        assert "error" not in results[ticker], results[ticker]
+        assert results[ticker]["trades"] == single["trades"], ticker
+        for key, value in single["metrics"].items():
+            assert np.isclose(results[ticker]["metrics"][key], value, equal_nan=True), (ticker, key)
+
+
+@pytest.mark.parametrize("name", ["Donchain_Spec.json", "MACD_Sig_XOver_Spec.json", "SimpleMA_50_200_Spec.json"])
+def test_spec_panel_signals_skip_padded_dates(tickers, name):
+    spec = compile_strategy_spec(_strategy(name))
+    panel = {col: pd.concat({t: data[col] for t, data in tickers.items()}, axis=1) for col in PANEL_COLUMNS}
+    wide = spec.panel_signals(panel)
+
+    for ticker, data in tickers.items():
+        assert wide[ticker].reindex(data.index).equals(spec.signals(data)), ticker
+    padded = panel["Close"]["GAPPED"].isna()
+    assert (wide.loc[padded, "GAPPED"] == "hold").all()
+
+
+@pytest.mark.parametrize("name", ["SimpleMA_50_200.py", "MACD_Sig_XOver.py", "Donchain.py", "RSI_14.py"])
+def test_bundled_strategy_runs_with_and_without_indicators(name):
+    data = sample_ohlcv()
+    code = _strategy(name)
+    computed = generate_signal_series(data, code)
+
+    assert (computed != "hold").any()
+    assert generate_signal_series(data, code, indicators=compute_indicators(data)).equals(computed)
@@ -0,0 +1,43 @@
+# /home/ubuntu/backtest_app/tests/test_run_history.py
+import sqlite3
+
+import pytest
+
+from backend.core import run_history
+from backend.core.run_history import CREATE_RUNS_TABLE_SQL, get_run, query_runs, record_run
+
+TRADES = [
+    {"entry_date": "2024-01-02", "exit_date": "2024-01-10", "profit_loss": 1500.0, "exit_type": "signal"},
+    {"entry_date": "2024-02-01", "exit_date": "2024-02-05", "profit_loss": -700.0, "exit_type": "stop_loss"},
+]
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "run_history.db")
+    monkeypatch.setattr(run_history, "RUN_HISTORY_DB", path)
+    return path
+
+
+def test_run_round_trips_trades_and_indicator_source(history_db):
+    run_id = record_run({"trades": TRADES, "metrics": {"sharpe_ratio": 1.2}}, ticker="005930",
+                        indicator_source="feature_store")
+
+    assert get_run(run_id)["trades"] == TRADES
+    assert query_runs(ticker="005930")[0]["indicator_source"] == "feature_store"
+
+
+def test_database_without_indicator_source_is_migrated(history_db):
+    conn = sqlite3.connect(history_db)
+    conn.execute(CREATE_RUNS_TABLE_SQL.replace("    indicator_source TEXT,\n", ""))
+    conn.commit()
+    conn.close()
+
+    run_id = record_run({"trades": TRADES, "metrics": {}}, ticker="005930", indicator_source="computed")
+    assert get_run(run_id)["indicator_source"] == "computed"
+
+
+def test_run_without_trades_round_trips(history_db):
+    run_id = record_run({"trades": [], "metrics": {}}, ticker="005930")
+
+    assert get_run(run_id)["trades"] == []
@@ -0,0 +1,42 @@
+# /home/ubuntu/backtest_app/tests/test_signal_scan_api.py
+import threading
+
+import pandas as pd
+import pytest
+
+from backend.api import signal_scan
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Scan job whose first run blocks until `release` is set; records the date of every run."""
+    runs = []
+    release = threading.Event()
+    finished = threading.Semaphore(0)
+
+    def blocking_scan(strategies, tickers, as_of):
+        runs.append(as_of)
+        if len(runs) == 1:
+            release.wait(5)
+        finished.release()
+        return {"date": as_of}
+
+    monkeypatch.setattr(signal_scan, "list_strategy_names", lambda: [])
+    monkeypatch.setattr(signal_scan, "load_company_list", lambda: pd.DataFrame({"code": []}))
+    monkeypatch.setattr(signal_scan, "run_signal_scan", blocking_scan)
+    yield runs, release, finished
+    release.set()
+    # Wait for the last job to let go of the lock
+    assert signal_scan._scan_lock.acquire(timeout=5)
+    signal_scan._scan_lock.release()
+
+
+def test_data_update_during_a_scan_queues_a_rerun(scans):
+    runs, release, finished = scans
+    assert signal_scan.start_signal_scan("2024-01-02")
+    signal_scan._on_data_updated(["005930"])
+
+    assert signal_scan._scan_state["pending"]
+    release.set()
+    assert finished.acquire(timeout=5) and finished.acquire(timeout=5)
+    assert runs == ["2024-01-02", None] # The rerun scans the latest date
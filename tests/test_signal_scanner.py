@@ -0,0 +1,116 @@
+# /home/ubuntu/backtest_app/tests/test_signal_scanner.py
+import os
+
+import numpy as np
+import pytest
+
+from backend.core import signal_scanner
+from backend.core.signal_scanner import DEFAULT_LOOKBACK, LOOKBACK_MARGIN, _scan_chunk, estimate_lookback
+from backend.core.strategy_validation import sample_ohlcv
+
+STRATEGY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "strategies")
+
+# Buys on every bar, so every scanned ticker yields a row
+ALWAYS_BUY = """LOOKBACK = 5
+def generate_signals(data):
+    return pd.Series('buy', index=data.index)"""
+
+POSITION_LOOP = """def generate_signals(data):
+    signals = pd.Series('hold', index=data.index)
+    position = False
+    for i in range(len(data)):
+        if not position and data['Close'].iloc[i] > data['Open'].iloc[i]:
+            signals.iloc[i] = 'buy'
+            position = True
+    return signals"""
+
+
+@pytest.mark.parametrize("window, expected", [
+    ("period * 5", 100),
+    ("period + 10", 30),
+    ("period // 2", 10),
+    ("period / 3", 7),
+    ("-period", 20),
+])
+def test_lookback_evaluates_window_arithmetic(window, expected):
+    code = f"""def generate_signals(data, period=20):
+    return data['Close'].rolling({window}).mean()"""
+
+    assert estimate_lookback(code) == expected + LOOKBACK_MARGIN
+
+
+def test_lookback_falls_back_when_a_window_is_computed_at_run_time():
+    code = """def generate_signals(data):
+    window = len(data) // 10
+    return data['Close'].rolling(window).mean()"""
+
+    assert estimate_lookback(code) == DEFAULT_LOOKBACK
+
+
+def test_declared_lookback_wins():
+    code = """LOOKBACK = 42
+def generate_signals(data):
+    return data['Close'].rolling(len(data)).mean()"""
+
+    assert estimate_lookback(code) == 42
+
+
+def test_row_loop_needs_the_full_history():
+    assert estimate_lookback(POSITION_LOOP) is None
+    assert estimate_lookback("LOOKBACK = 30\n" + POSITION_LOOP) == 30
+
+
+@pytest.fixture
+def loaders(monkeypatch):
+    """daily_price stand-in: BAD raises on load, NAN has no close on the last bar."""
+    calls = []
+
+    def load(ticker, bars=None):
+        calls.append((ticker, bars))
+        if ticker == "BAD":
+            raise ConnectionError("lost connection")
+        data = sample_ohlcv().copy()
+        if ticker == "NAN":
+            data.iloc[-1, data.columns.get_loc("Close")] = np.nan
+        return data if bars is None else data.iloc[-bars:]
+
+    monkeypatch.setattr(signal_scanner, "load_ohlcv_tail", lambda ticker, bars, end_date: load(ticker, bars))
+    monkeypatch.setattr(signal_scanner, "load_ohlcv", lambda ticker, start_date=None, end_date=None: load(ticker))
+    return calls
+
+
+def test_scan_chunk_reports_failed_tickers(loaders):
+    as_of = sample_ohlcv().index[-1]
+    rows, failed = _scan_chunk(["OK", "BAD", "NAN"], {"always": ALWAYS_BUY}, {"always": 5}, as_of)
+
+    assert rows == [("OK", "always", "buy", int(sample_ohlcv()["Close"].iloc[-1]))]
+    assert failed == ["BAD", "NAN"]
+
+
+def test_scan_chunk_loads_full_history_for_row_loops(loaders):
+    as_of = sample_ohlcv().index[-1]
+    _scan_chunk(["OK"], {"loop": POSITION_LOOP}, {"loop": None}, as_of)
+
+    assert loaders == [("OK", None)]
+
+
+def test_failed_tickers_keep_their_stored_rows(loaders, monkeypatch):
+    saved = {}
+    monkeypatch.setattr(signal_scanner, "save_signals",
+                        lambda as_of, rows, lookbacks, keep_codes=None: saved.update(rows=rows, keep_codes=keep_codes))
+    summary = signal_scanner.run_signal_scan({"always": ALWAYS_BUY}, ["OK", "BAD"], as_of=sample_ohlcv().index[-1],
+                                             max_workers=1)
+
+    assert summary["buy_signals"] == 1
+    assert summary["failed_tickers"] == 1 and summary["failed_examples"] == ["BAD"]
+    assert saved["keep_codes"] == ["BAD"]
+    assert [row[0] for row in saved["rows"]] == ["OK"]
+
+
+def test_scan_without_strategies_is_an_error():
+    assert "error" in signal_scanner.run_signal_scan({}, ["OK"])
+
+
+def test_wyckoff_is_scanned_on_the_full_history():
+    with open(os.path.join(STRATEGY_DIR, "wyckoff.py"), encoding="utf-8") as f:
+        assert estimate_lookback(f.read()) is None
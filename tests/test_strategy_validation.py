@@ -0,0 +1,77 @@
+# /home/ubuntu/backtest_app/tests/test_strategy_validation.py
+import time
+
+import pytest
+
+from backend.core.strategy_validation import SAMPLE_ROWS, extract_strategy_code, validate_strategy_code
+from mock_openai import MOCK_CODE, MOCK_CODE_RESPONSE, MOCK_LOOKAHEAD_CODE
+
+WHILE_LOOP = """def generate_signals(data):
+    signals = pd.Series('hold', index=data.index)
+    i = 0
+    while i < len(data):
+        i += 1
+    return signals"""
+
+ITERROWS = """def generate_signals(data):
+    signals = pd.Series('hold', index=data.index)
+    for date, row in data.iterrows():
+        if row['Close'] > row['Open']:
+            signals[date] = 'buy'
+    return signals"""
+
+APPLY_AXIS_1 = """def generate_signals(data):
+    return data.apply(lambda row: 'buy' if row['Close'] > row['Open'] else 'hold', axis=1)"""
+
+WRONG_LENGTH = """def generate_signals(data):
+    return pd.Series('hold', index=data.index[:-1])"""
+
+NAN_SIGNALS = """def generate_signals(data):
+    signals = pd.Series('hold', index=data.index)
+    signals[data['Close'].rolling(20).mean().isna()] = None
+    return signals"""
+
+# range() over a constant is not a row loop, so only the run time limit catches it
+INFINITE_LOOP = """def generate_signals(data):
+    for i in range(10 ** 15):
+        pass
+    return pd.Series('hold', index=data.index)"""
+
+
+def test_valid_code_passes():
+    result = validate_strategy_code(MOCK_CODE)
+
+    assert result["ok"], result["errors"]
+    assert sum(result["signal_counts"].values()) == SAMPLE_ROWS
+    assert result["signal_counts"]["buy"] > 0
+
+
+@pytest.mark.parametrize("code, message", [
+    (MOCK_LOOKAHEAD_CODE, "future data"),
+    (WHILE_LOOP, "while loops are not allowed"),
+    (ITERROWS, "iterrows() iterates rows"),
+    (APPLY_AXIS_1, "apply(axis=1)"),
+    (WRONG_LENGTH, f"{SAMPLE_ROWS - 1} values for {SAMPLE_ROWS} rows"),
+    (NAN_SIGNALS, "signals are NaN/None"),
+], ids=["shift(-1)", "while", "iterrows", "apply(axis=1)", "wrong length", "NaN"])
+def test_invalid_code_is_rejected(code, message):
+    result = validate_strategy_code(code)
+
+    assert not result["ok"]
+    assert any(message in error for error in result["errors"]), result["errors"]
+
+
+def test_runaway_code_is_killed_after_the_timeout():
+    started = time.perf_counter()
+    result = validate_strategy_code(INFINITE_LOOP, timeout=1)
+
+    assert not result["ok"]
+    assert result["errors"] == [f"generate_signals did not finish within 1 s on {SAMPLE_ROWS} rows."]
+    assert time.perf_counter() - started < 5
+
+
+def test_extract_strategy_code_takes_the_generate_signals_block():
+    text = "설명입니다.\n```python\nx = 1\n```\n" + MOCK_CODE_RESPONSE.format(code=MOCK_CODE)
+
+    assert extract_strategy_code(text) == MOCK_CODE
+    assert extract_strategy_code("코드 없는 답변입니다.") is None